@@ -0,0 +1,75 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+# Compare building per-parameter plans with add_plan/add_action against PlanBuilder
+
+import time
+
+from multio.plans import Client, Plan, PlanBuilder, Print, Select, Sink
+from multio.plans.sinks import File
+
+SIZES = (10, 100, 1000, 10000)
+
+
+def actions(param):
+    return [
+        {"type": "select", "match": [{"param": param}]},
+        {"type": "print", "stream": "cout"},
+        {"type": "sink", "sinks": [{"type": "file", "path": f"{param}.grib", "append": False}]},
+    ]
+
+
+def model_actions(param):
+    return [
+        Select(match=[{"param": param}]),
+        Print(stream="cout"),
+        Sink(sinks=[File(path=f"{param}.grib", append=False)]),
+    ]
+
+
+def incremental(n):
+    config = Client()
+    for param in range(n):
+        plan = Plan(name=f"plan-{param}")
+        for action in actions(param):
+            plan.add_action(action)
+        config.add_plan(plan)
+    return config
+
+
+def builder(n):
+    plans = PlanBuilder()
+    for param in range(n):
+        plans.add_plan(f"plan-{param}", actions(param))
+    return plans.build()
+
+
+def trusted(n):
+    plans = PlanBuilder()
+    for param in range(n):
+        plans.add_plan(f"plan-{param}", model_actions(param))
+    return plans.build(validate=False)
+
+
+def timed(fn, n, repeat=3):
+    best_build = best_dump = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        config = fn(n)
+        built = time.perf_counter()
+        config.dump_json()
+        best_build = min(best_build, built - start)
+        best_dump = min(best_dump, time.perf_counter() - built)
+    return best_build, best_dump
+
+
+if __name__ == "__main__":
+    print(f"{'plans':>8} {'method':>12} {'build [s]':>10} {'dump [s]':>10}")
+    for n in SIZES:
+        for fn in (incremental, builder, trusted):
+            build, dump = timed(fn, n)
+            print(f"{n:>8} {fn.__name__:>12} {build:>10.4f} {dump:>10.4f}")
@@ -5,9 +5,27 @@ Multiopython
 """
 
 from . import plans
+from .aggregate import GlobalAssembler
+from .audit import CopyAudit, CopyWarning
+from .dataset import DatasetMapping, DatasetWriter
+from .domains import DecompositionCache, local_to_global
+from .fanin import FanIn
+from .ingest import GribIngester
+from .lanes import PriorityLanes
 from .lib import MultioException
+from .masks import MaskCompaction, PackedMask
 from .metadata import Metadata
+from .metrics import Metrics, PrometheusExporter, StepTracker
 from .multio import Multio
+from .precision import PrecisionPolicy
+from .reader import RawFieldReader
+from .reduce import StreamingStatistics
+from .reorder import ReorderBuffer
+from .sharded import ShardedMultio
+from .spool import Spool
+from .stream import StreamReceiver
+from .supervisor import ServerSupervisor
+from .trace import Tracer
 from .utils import MultioPlan
 
 try:
@@ -0,0 +1,152 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Client-side aggregation of partitioned fields.
+
+Uses the same local-to-global index maps as are written with `Multio.write_domain`.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Hashable, Mapping, Sequence, Union
+
+import numpy as np
+
+DomainMaps = Union[Mapping[Hashable, Any], Sequence[Any]]
+
+
+class GlobalAssembler:
+    """
+    Assemble local parts of fields into global fields.
+
+    The index maps are converted and checked once. Each partition is then
+    placed with a single fancy-indexed assignment into a preallocated array.
+
+    Examples
+    --------
+    ```python
+    assembler = GlobalAssembler({0: indices_rank0, 1: indices_rank1})
+    out = np.empty(assembler.global_size)
+    assembler.assemble({0: local_rank0, 1: local_rank1}, out=out)
+    ```
+    """
+
+    def __init__(self, maps: DomainMaps, global_size: int | None = None):
+        """
+        Create a GlobalAssembler
+
+        Parameters
+        ----------
+        maps : Mapping[Hashable, Any] | Sequence[Any]
+            Global index of every local point, per partition.
+            A sequence is keyed by position.
+        global_size : int, optional
+            Number of global points, defaults to one more than the largest index
+
+        Raises
+        ------
+        ValueError
+            If no maps are given, or a global point is covered by several partitions
+        """
+        if not isinstance(maps, Mapping):
+            maps = dict(enumerate(maps))
+        if not maps:
+            raise ValueError("Can not assemble fields without domain maps")
+
+        self.indices = {partition: np.asarray(indices, dtype=np.intp).ravel() for partition, indices in maps.items()}
+        self._order = np.concatenate(list(self.indices.values()))
+        self._offsets = np.cumsum([0] + [indices.size for indices in self.indices.values()])
+
+        self.global_size = int(self._order.max()) + 1 if global_size is None else global_size
+        coverage = np.bincount(self._order, minlength=self.global_size)
+        if coverage.size > self.global_size or np.any(coverage > 1):
+            raise ValueError("Domain maps overlap or exceed the global size")
+        self.complete = bool(np.all(coverage == 1))
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    @property
+    def partitions(self) -> list[Hashable]:
+        return list(self.indices)
+
+    def _output(self, dtype: Any, out: np.ndarray | None) -> np.ndarray:
+        if out is None:
+            return np.empty(self.global_size, dtype=dtype)
+        if out.shape != (self.global_size,):
+            raise ValueError(f"Output must have shape ({self.global_size},), not {out.shape}")
+        return out
+
+    def assemble(self, parts: DomainMaps, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Assemble the parts of a field
+
+        Parameters
+        ----------
+        parts : Mapping[Hashable, Any] | Sequence[Any]
+            Local values of every partition, keyed as the maps
+        out : np.ndarray, optional
+            Global array to write into, allocated if not given
+
+        Returns
+        -------
+        np.ndarray
+            Global field, points not covered by any partition are left untouched
+        """
+        if not isinstance(parts, Mapping):
+            parts = dict(enumerate(parts))
+
+        values = [np.asarray(parts[partition]) for partition in self.indices]
+        out = self._output(np.result_type(*values), out)
+        for indices, local in zip(self.indices.values(), values):
+            out[indices] = local
+        return out
+
+    def assemble_concatenated(self, local: Any, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Assemble a field from the parts of every partition concatenated in order
+
+        Parameters
+        ----------
+        local : Any
+            Local values of all partitions, one after the other
+        out : np.ndarray, optional
+            Global array to write into, allocated if not given
+
+        Returns
+        -------
+        np.ndarray
+            Global field
+        """
+        local = np.asarray(local)
+        out = self._output(local.dtype, out)
+        out[self._order] = local
+        return out
+
+    def scatter(self, field: Any) -> dict[Hashable, np.ndarray]:
+        """
+        Split a global field into the parts of every partition
+
+        Parameters
+        ----------
+        field : Any
+            Global field
+
+        Returns
+        -------
+        dict[Hashable, np.ndarray]
+            Local values of every partition
+        """
+        local = np.asarray(field)[self._order]
+        return {
+            partition: local[start:end]
+            for partition, start, end in zip(self.indices, self._offsets[:-1], self._offsets[1:])
+        }
+
+
+__all__ = ["GlobalAssembler"]
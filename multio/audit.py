@@ -0,0 +1,142 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Audit of the data copied on the way to the C library.
+
+Data is passed to the library without copy only if it is a contiguous numpy array
+of the C type expected, anything else is converted into a new buffer first.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import warnings
+from dataclasses import dataclass
+
+COPY_AUDIT_ENVIRON_VAR = "MULTIO_COPY_AUDIT"
+
+_PACKAGE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+class CopyWarning(RuntimeWarning):
+    """Data was copied before being passed to the C library"""
+
+
+@dataclass
+class CopyRecord:
+    """Copies made for a single call site, method and reason"""
+
+    filename: str
+    lineno: int
+    method: str
+    reason: str
+    count: int = 0
+    bytes: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.filename}:{self.lineno}: {self.method} copied {self.count} time(s), "
+            f"{self.bytes} bytes, because of {self.reason}"
+        )
+
+
+def _call_site() -> tuple[str, int]:
+    """File and line of the first frame outside of multio"""
+    frame = sys._getframe(1)
+    while frame is not None and os.path.abspath(frame.f_code.co_filename).startswith(_PACKAGE_DIRECTORY + os.sep):
+        frame = frame.f_back
+    if frame is None:
+        return "<unknown>", 0
+    return frame.f_code.co_filename, frame.f_lineno
+
+
+class CopyAudit:
+    """
+    Count the copies made by `Multio` write methods, per call site and reason.
+
+    Optionally warns with a `CopyWarning` the first time each call site copies for a reason.
+    Enabled with `Multio(copy_audit=...)`, or for every handle by setting
+    $MULTIO_COPY_AUDIT to `warn`, or `count` to only count.
+
+    Examples
+    --------
+    ```python
+    audit = CopyAudit(warn=False)
+    with Multio(copy_audit=audit) as mio:
+        mio.write_field(metadata, values.tolist())
+    print(audit.report())
+    ```
+    """
+
+    def __init__(self, warn: bool = True):
+        """
+        Create a CopyAudit
+
+        Parameters
+        ----------
+        warn : bool, optional
+            Warn once per call site and reason, defaults to True
+        """
+        self.warn = warn
+        self.records: dict[tuple[str, int, str, str], CopyRecord] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_environ(cls) -> CopyAudit | None:
+        """CopyAudit configured by $MULTIO_COPY_AUDIT, if set"""
+        mode = os.environ.get(COPY_AUDIT_ENVIRON_VAR, "").lower()
+        if mode in ("", "0", "off"):
+            return None
+        if mode == "count":
+            return cls(warn=False)
+        return cls(warn=True)
+
+    @property
+    def copies(self) -> int:
+        return sum(record.count for record in self.records.values())
+
+    @property
+    def bytes(self) -> int:
+        return sum(record.bytes for record in self.records.values())
+
+    def copy(self, method: str, reason: str, nbytes: int):
+        """
+        Record a copy
+
+        Parameters
+        ----------
+        method : str
+            Method of `Multio` making the copy
+        reason : str
+            Why the data could not be passed without copy
+        nbytes : int
+            Size of the copy in bytes
+        """
+        filename, lineno = _call_site()
+        key = (filename, lineno, method, reason)
+
+        with self._lock:
+            record = self.records.get(key)
+            new = record is None
+            if new:
+                record = self.records[key] = CopyRecord(filename, lineno, method, reason)
+            record.count += 1
+            record.bytes += nbytes
+
+        if new and self.warn:
+            warnings.warn_explicit(f"{method} copied {nbytes} bytes because of {reason}", CopyWarning, filename, lineno)
+
+    def report(self) -> str:
+        """All call sites that copied, largest copies first"""
+        records = sorted(self.records.values(), key=lambda record: record.bytes, reverse=True)
+        return "\n".join(str(record) for record in records)
+
+
+__all__ = ["CopyAudit", "CopyRecord", "CopyWarning"]
@@ -0,0 +1,290 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Write `xarray.Dataset`s with a `Multio` handle.
+
+xarray, and Dask for chunked datasets, are only needed by the caller, and are not
+imported unless a path is given instead of a dataset.
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+Coordinate = Union[str, tuple[str, Callable[[Any], Any]]]
+
+
+@dataclass
+class DatasetMapping:
+    """
+    How the variables of a dataset are written as fields.
+
+    Every field of a variable gets the constant `metadata`, the metadata of its variable,
+    its attributes renamed by `attrs`, and the value of each of its coordinates renamed by `coords`,
+    optionally converted by a function. Only the variables in `variables` are written, unless empty,
+    and a field spans the `field_dims` of a variable, by default its last dimension. When writing
+    every variable, those without all of the `field_dims`, e.g. bounds, are skipped.
+
+    Examples
+    --------
+    ```python
+    DatasetMapping(
+        metadata={"category": "ml", "gridType": "reduced_gg"},
+        variables={"t2m": {"param": "2t"}, "tp": {"param": "tp"}},
+        coords={"step": ("step", lambda step: int(step // np.timedelta64(1, "h"))), "level": "level"},
+        attrs={"units": "units"},
+        field_dims=("values",),
+    )
+    ```
+    """
+
+    metadata: dict[str, Any] = field(default_factory=dict)
+    variables: dict[str, Optional[dict[str, Any]]] = field(default_factory=dict)
+    coords: dict[str, Coordinate] = field(default_factory=dict)
+    attrs: dict[str, str] = field(default_factory=dict)
+    field_dims: Optional[tuple[str, ...]] = None
+
+    def __post_init__(self):
+        if self.field_dims is not None:
+            self.field_dims = tuple(self.field_dims)
+
+    def includes(self, name: str) -> bool:
+        """Check if a variable is written"""
+        if not self.variables:
+            return True
+        return self.variables.get(name) is not None
+
+    def coordinate(self, dim: str, value: Any) -> tuple[str, Any] | None:
+        """Metadata key and value of a coordinate value, None if not mapped"""
+        key = self.coords.get(dim)
+        if key is None:
+            return None
+        if isinstance(key, tuple):
+            key, convert = key
+            return key, convert(value)
+        return key, value.item() if isinstance(value, np.generic) else value
+
+
+class DatasetWriter:
+    """
+    Write the variables of `xarray.Dataset`s as fields, block by block.
+
+    A dataset is written in blocks given by its chunks along the dimensions that are not
+    field dimensions, so that a Dask-backed dataset is never loaded whole. The next blocks
+    are computed in a background thread while the current one is written. When flushing by
+    a dimension chunked by more than one value, the blocks of a chunk of that dimension are
+    held until all of them are loaded, so that the fields of each value are flushed together.
+
+    Examples
+    --------
+    ```python
+    with Multio() as mio:
+        writer = DatasetWriter(mio, mapping)
+        writer.write(dataset.chunk({"step": 1}), flush_dim="step")
+    ```
+    """
+
+    def __init__(self, mio: Any, mapping: DatasetMapping | Mapping[str, Any] | None = None, prefetch: int = 1):
+        """
+        Create a DatasetWriter
+
+        Parameters
+        ----------
+        mio : Multio
+            Handle to write the fields with
+        mapping : DatasetMapping | Mapping[str, Any], optional
+            How variables are written as fields, or the arguments of a `DatasetMapping`
+        prefetch : int, optional
+            Blocks computed ahead of the one being written
+        """
+        if mapping is None:
+            mapping = DatasetMapping()
+        elif not isinstance(mapping, DatasetMapping):
+            mapping = DatasetMapping(**mapping)
+        self.mio = mio
+        self.mapping = mapping
+        self.prefetch = max(prefetch, 0)
+        self.fields = 0
+
+    def _field_dims(self, variable: Any) -> tuple[str, ...]:
+        if self.mapping.field_dims is not None:
+            return self.mapping.field_dims
+        return tuple(variable.dims[-1:])
+
+    def _names(self, dataset: Any) -> list[str]:
+        """Variables written, every one spanning the field dimensions unless listed"""
+        names = []
+        for name in dataset.data_vars:
+            if not self.mapping.includes(name):
+                continue
+            missing = [dim for dim in self._field_dims(dataset[name]) if dim not in dataset[name].dims]
+            if missing and self.mapping.variables:
+                raise ValueError(f"Variable {name} does not have the field dimensions {missing}")
+            if not missing:
+                names.append(name)
+        return names
+
+    def _outer_dims(self, dataset: Any, names: Sequence[str], flush_dim: str | None) -> list[str]:
+        dims = []
+        for name in names:
+            field_dims = self._field_dims(dataset[name])
+            dims += [dim for dim in dataset[name].dims if dim not in field_dims and dim not in dims]
+        if flush_dim is not None:
+            if flush_dim not in dims:
+                raise ValueError(f"Can not flush by {flush_dim}, not a dimension of the variables written")
+            dims.remove(flush_dim)
+            dims.insert(0, flush_dim)
+        return dims
+
+    @staticmethod
+    def _ranges(dataset: Any, dim: str) -> list[range]:
+        chunks = dict(dataset.chunks).get(dim) or (dataset.sizes[dim],)
+        bounds = np.cumsum((0,) + tuple(chunks))
+        return [range(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+    def _load(self, dataset: Any, names: Sequence[str], dims: Sequence[str], block: Sequence[range]) -> dict:
+        """Values of every variable in a block, with the outer dimensions first"""
+        arrays = {}
+        for name in names:
+            variable = dataset[name]
+            selection = {dim: slice(r.start, r.stop) for dim, r in zip(dims, block) if dim in variable.dims}
+            outer = [dim for dim in dims if dim in variable.dims]
+            variable = variable.isel(selection).transpose(*outer, *self._field_dims(variable))
+            arrays[name] = np.asarray(variable.values)
+        return arrays
+
+    def _blocks(self, dataset: Any, names: Sequence[str], dims: Sequence[str]) -> Iterator[tuple[tuple, dict]]:
+        """Every block with its values, computing the next ones in the background"""
+        blocks = itertools.product(*(self._ranges(dataset, dim) for dim in dims))
+        if self.prefetch == 0:
+            for block in blocks:
+                yield block, self._load(dataset, names, dims, block)
+            return
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="multio-dataset") as executor:
+            pending = deque()
+            try:
+                for block in blocks:
+                    pending.append((block, executor.submit(self._load, dataset, names, dims, block)))
+                    if len(pending) > self.prefetch:
+                        block, future = pending.popleft()
+                        yield block, future.result()
+                while pending:
+                    block, future = pending.popleft()
+                    yield block, future.result()
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+    @staticmethod
+    def _positions(blocks: Iterator[tuple[tuple, dict]], by_first: bool) -> Iterator[tuple[tuple, tuple, dict]]:
+        """
+        Every position of the outer dimensions with its block and values
+
+        With `by_first`, the positions of a value of the first dimension are all given before the next
+        value, holding the blocks that share a chunk of that dimension spanning several values.
+        """
+        group: list[tuple[tuple, dict]] = []
+
+        def positions():
+            for value in group[0][0][0]:
+                for block, arrays in group:
+                    for index in itertools.product((value,), *block[1:]):
+                        yield index, block, arrays
+
+        for block, arrays in blocks:
+            if group and group[0][0][0] != block[0]:
+                yield from positions()
+                group = []
+            if not by_first or len(block[0]) == 1:
+                yield from ((index, block, arrays) for index in itertools.product(*block))
+            else:
+                group.append((block, arrays))
+        if group:
+            yield from positions()
+
+    def _metadata(self, dataset: Any, name: str) -> dict[str, Any]:
+        variable = dataset[name]
+        metadata = dict(self.mapping.metadata)
+        for attr, key in self.mapping.attrs.items():
+            value = variable.attrs.get(attr, dataset.attrs.get(attr))
+            if value is not None:
+                metadata[key] = value
+        metadata.update(self.mapping.variables.get(name) or {})
+        return metadata
+
+    def _coordinates(self, dataset: Any, dims: Sequence[str]) -> dict[str, Any]:
+        return {dim: dataset[dim].values if dim in dataset.coords else np.arange(dataset.sizes[dim]) for dim in dims}
+
+    def _flush(self, dim: str, value: Any):
+        metadata = dict(self.mapping.metadata)
+        coordinate = self.mapping.coordinate(dim, value)
+        if coordinate is not None:
+            metadata[coordinate[0]] = coordinate[1]
+        self.mio.flush(metadata)
+
+    def write(self, dataset: Any, flush_dim: str | None = None):
+        """
+        Write every variable of a dataset
+
+        Parameters
+        ----------
+        dataset : xarray.Dataset | str | os.PathLike
+            Dataset to write, or a file to open lazily with `xarray.open_dataset`
+        flush_dim : str, optional
+            Dimension to flush after each value of, e.g. the step. The flush gets the constant
+            metadata and the coordinate value of that dimension.
+        """
+        if isinstance(dataset, (str, os.PathLike)):
+            import xarray as xr
+
+            dataset = xr.open_dataset(dataset, chunks={})
+
+        names = self._names(dataset)
+        dims = self._outer_dims(dataset, names, flush_dim)
+        coordinates = self._coordinates(dataset, dims)
+        metadata = {name: self._metadata(dataset, name) for name in names}
+        variable_dims = {name: [dim for dim in dims if dim in dataset[name].dims] for name in names}
+
+        flushing = None
+        for index, block, arrays in self._positions(self._blocks(dataset, names, dims), flush_dim is not None):
+            position = dict(zip(dims, index))
+            if flush_dim is not None and position[flush_dim] != flushing:
+                if flushing is not None:
+                    self._flush(flush_dim, coordinates[flush_dim][flushing])
+                flushing = position[flush_dim]
+
+            for name in names:
+                # Variables without a dimension are written once, with its first value
+                if any(position[dim] != 0 for dim in dims if dim not in variable_dims[name]):
+                    continue
+                local = tuple(position[dim] - block[dims.index(dim)].start for dim in variable_dims[name])
+                values = arrays[name][local].reshape(-1)
+
+                field_metadata = dict(metadata[name])
+                for dim in variable_dims[name]:
+                    coordinate = self.mapping.coordinate(dim, coordinates[dim][position[dim]])
+                    if coordinate is not None:
+                        field_metadata[coordinate[0]] = coordinate[1]
+                field_metadata.setdefault("globalSize", values.size)
+
+                self.mio.write_field(field_metadata, values)
+                self.fields += 1
+
+        if flushing is not None:
+            self._flush(flush_dim, coordinates[flush_dim][flushing])
+
+
+__all__ = ["DatasetMapping", "DatasetWriter"]
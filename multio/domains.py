@@ -0,0 +1,232 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Local-to-global index maps of common grid decompositions.
+
+The maps are what `Multio.write_domain` expects, global indices following
+the usual scanning of rows north to south, and points west to east in each row.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import tempfile
+from typing import Any, Literal, Union
+
+import numpy as np
+
+Grid = Union[str, tuple[int, int], Any]
+Scheme = Literal["bands", "checkerboard"]
+
+CACHE_ENVIRON_VAR = "MULTIO_DECOMPOSITION_CACHE"
+
+
+def grid_pl(grid: Grid) -> tuple[str, np.ndarray]:
+    """
+    Number of points in each row of a grid
+
+    Parameters
+    ----------
+    grid : str | tuple[int, int] | array
+        - `O<N>` for an octahedral reduced Gaussian grid
+        - `F<N>` for a regular Gaussian grid
+        - `(nlat, nlon)` for a regular lat/lon grid
+        - the number of points of each row of any other reduced grid
+
+    Returns
+    -------
+    tuple[str, np.ndarray]
+        Name identifying the grid, and the number of points of each row
+    """
+    if isinstance(grid, str):
+        match = re.fullmatch(r"([OF])(\d+)", grid.upper())
+        if match is None:
+            raise ValueError(f"Unknown grid {grid!r}, expected O<N> or F<N>")
+        kind, n = match.group(1), int(match.group(2))
+        if kind == "O":
+            north = 20 + 4 * np.arange(n)
+            return f"O{n}", np.concatenate([north, north[::-1]])
+        return f"F{n}", np.full(2 * n, 4 * n)
+
+    if isinstance(grid, tuple) and len(grid) == 2:
+        nlat, nlon = grid
+        return f"LL{nlat}x{nlon}", np.full(nlat, nlon)
+
+    pl = np.asarray(grid, dtype=np.int64)
+    return f"PL{hashlib.sha1(pl.tobytes()).hexdigest()[:16]}", pl
+
+
+def _ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Concatenation of `arange(start, end)` for every pair, without a python loop"""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.intc)
+    shifts = starts - np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    return (np.repeat(shifts, lengths) + np.arange(total)).astype(np.intc)
+
+
+def _split(weights: np.ndarray, parts: np.ndarray) -> np.ndarray:
+    """Row boundaries splitting rows into consecutive groups with points proportional to `parts`"""
+    cumulative = np.concatenate([[0], np.cumsum(weights)])
+    targets = np.cumsum(parts)[:-1] / parts.sum() * cumulative[-1]
+    inner = np.searchsorted(cumulative, targets)
+    # Closest boundary to each target, rather than the first one past it
+    inner -= (targets - cumulative[inner - 1]) < (cumulative[inner] - targets)
+    return np.concatenate([[0], inner, [weights.size]])
+
+
+def decompose(grid: Grid, nparts: int, rank: int, scheme: Scheme = "bands") -> np.ndarray:
+    """
+    Global indices of the points of a partition
+
+    Parameters
+    ----------
+    grid : str | tuple[int, int] | array
+        Grid to decompose, see `grid_pl`
+    nparts : int
+        Number of partitions
+    rank : int
+        Partition to compute, from 0 to nparts - 1
+    scheme : Literal['bands', 'checkerboard'], optional
+        - `bands`: whole latitude rows, with about the same number of points per partition
+        - `checkerboard`: about sqrt(nparts) latitude bands, each split in longitude,
+          with about the same number of points per partition
+
+    Returns
+    -------
+    np.ndarray
+        Global indices, as C ints ready for `Multio.write_domain`
+    """
+    if not 0 <= rank < nparts:
+        raise ValueError(f"Rank {rank} out of range for {nparts} partitions")
+    _, pl = grid_pl(grid)
+    offsets = np.concatenate([[0], np.cumsum(pl)])
+
+    if scheme == "bands":
+        rows = _split(pl, np.ones(nparts))
+        return np.arange(offsets[rows[rank]], offsets[rows[rank + 1]], dtype=np.intc)
+
+    if scheme == "checkerboard":
+        nbands = max(1, min(int(round(np.sqrt(nparts))), pl.size))
+        per_band = np.full(nbands, nparts // nbands)
+        per_band[: nparts % nbands] += 1
+
+        rows = _split(pl, per_band)
+        band = int(np.searchsorted(np.cumsum(per_band), rank, side="right"))
+        column = rank - int(per_band[:band].sum())
+        columns = per_band[band]
+
+        band_pl = pl[rows[band] : rows[band + 1]]
+        band_offsets = offsets[rows[band] : rows[band + 1]]
+        starts = band_offsets + (column * band_pl) // columns
+        ends = band_offsets + ((column + 1) * band_pl) // columns
+        return _ranges(starts, ends)
+
+    raise ValueError(f"Unknown decomposition scheme {scheme!r}")
+
+
+class DecompositionCache:
+    """
+    On-disk cache of decompositions.
+
+    Each map is stored as a `.npy` file keyed by grid, scheme, partition count and rank,
+    and written atomically so that many ranks can share the directory.
+    """
+
+    def __init__(self, directory: str | os.PathLike | None = None):
+        """
+        Create a DecompositionCache
+
+        Parameters
+        ----------
+        directory : str | os.PathLike, optional
+            Cache directory, defaults to $MULTIO_DECOMPOSITION_CACHE
+            or ~/.cache/multio/decompositions
+        """
+        if directory is None:
+            directory = os.environ.get(
+                CACHE_ENVIRON_VAR, os.path.join(os.path.expanduser("~"), ".cache", "multio", "decompositions")
+            )
+        self.directory = os.fspath(directory)
+
+    def path(self, grid: Grid, nparts: int, rank: int, scheme: Scheme = "bands") -> str:
+        """Path of the file caching a decomposition"""
+        name, _ = grid_pl(grid)
+        return os.path.join(self.directory, f"{name}-{scheme}-{nparts}-{rank}.npy")
+
+    def get(self, grid: Grid, nparts: int, rank: int, scheme: Scheme = "bands") -> np.ndarray:
+        """
+        Global indices of the points of a partition, computed and stored if not cached
+
+        Parameters are as for `decompose`.
+        """
+        path = self.path(grid, nparts, rank, scheme)
+        try:
+            return np.load(path)
+        except (OSError, ValueError):
+            pass
+
+        indices = decompose(grid, nparts, rank, scheme)
+
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".npy.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, indices)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return indices
+
+
+def local_to_global(
+    grid: Grid, nparts: int, rank: int, scheme: Scheme = "bands", cache: DecompositionCache | bool | None = None
+) -> np.ndarray:
+    """
+    Global indices of the points of a partition, for `Multio.write_domain`
+
+    Parameters
+    ----------
+    grid : str | tuple[int, int] | array
+        Grid to decompose, see `grid_pl`
+    nparts : int
+        Number of partitions
+    rank : int
+        Partition to compute
+    scheme : Literal['bands', 'checkerboard'], optional
+        Decomposition, see `decompose`
+    cache : DecompositionCache | bool, optional
+        Cache to use, True for the default cache, False to always compute.
+        By default, the cache is only used if $MULTIO_DECOMPOSITION_CACHE is set.
+
+    Returns
+    -------
+    np.ndarray
+        Global indices, as C ints
+
+    Examples
+    --------
+    ```python
+    indices = local_to_global("O1280", nparts=size, rank=rank, scheme="checkerboard")
+    mio.write_domain({"name": "grid", "category": "ocean-domain-map", "domainCount": size}, indices)
+    ```
+    """
+    if cache is None:
+        cache = CACHE_ENVIRON_VAR in os.environ
+    if cache is False:
+        return decompose(grid, nparts, rank, scheme)
+    if cache is True:
+        cache = DecompositionCache()
+    return cache.get(grid, nparts, rank, scheme)
+
+
+__all__ = ["DecompositionCache", "decompose", "grid_pl", "local_to_global"]
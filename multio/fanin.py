@@ -0,0 +1,334 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Fan-in of fields computed in `multiprocessing` workers to a single `Multio` handle.
+
+Workers write fields into the slots of a shared-memory ring, and a writer thread in the
+parent passes each slot to the library as a view of the shared memory, so fields are
+neither pickled nor copied on their way to the handle.
+"""
+
+from __future__ import annotations
+
+import json
+import multiprocessing
+import struct
+import threading
+import traceback
+from contextlib import contextmanager
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Iterator, Mapping
+
+import numpy as np
+
+DEFAULT_SLOTS = 8
+DEFAULT_SLOT_BYTES = 64 * 1024**2
+
+# metadata length, data length, dtype
+_HEADER = struct.Struct("<IQ8s")
+_ALIGNMENT = 64
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+@dataclass
+class FanInStatistics:
+    """Running totals of the fields written by a `FanIn`"""
+
+    fields: int = 0
+    bytes: int = 0
+    flushes: int = 0
+    notifications: int = 0
+
+
+class _SharedMemory(shared_memory.SharedMemory):
+    """Shared memory that can be closed while arrays still view it"""
+
+    def close(self):
+        try:
+            super().close()
+        except BufferError:
+            # Drop the mapping, which is unmapped once the last array viewing it is released,
+            # so that it is not closed again, and fails again, when garbage collected
+            self._buf = None
+            self._mmap = None
+            super().close()
+
+
+class FanInWorker:
+    """
+    Write fields into the ring of a `FanIn` from a worker process.
+
+    Created with `FanIn.worker()` and passed to the workers when they are started,
+    e.g. as an argument of `multiprocessing.Process` or the initializer of a `multiprocessing.Pool`.
+    """
+
+    def __init__(self, name: str, slots: int, slot_bytes: int, free: Any, ready: Any):
+        self.name = name
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self._free = free
+        self._ready = ready
+        self._memory: shared_memory.SharedMemory | None = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_memory"] = None
+        return state
+
+    def _buffer(self) -> memoryview:
+        if self._memory is None:
+            self._memory = _SharedMemory(name=self.name)
+        return self._memory.buf
+
+    def _slot(self, index: int) -> memoryview:
+        return self._buffer()[index * self.slot_bytes : (index + 1) * self.slot_bytes]
+
+    @contextmanager
+    def reserve(
+        self, metadata: Mapping[str, Any], shape: int | tuple[int, ...], dtype: Any = np.float64
+    ) -> Iterator[np.ndarray]:
+        """
+        Reserve a slot to compute a field into, written once the block exits without error
+
+        Parameters
+        ----------
+        metadata : Mapping[str, Any]
+            Metadata of the field
+        shape : int | tuple[int, ...]
+            Shape of the field
+        dtype : Any, optional
+            Data type of the field, float32 or float64
+
+        Yields
+        ------
+        np.ndarray
+            Array in the slot, to fill with the values of the field
+        """
+        dtype = np.dtype(dtype)
+        if dtype not in (np.float32, np.float64):
+            raise TypeError(f"Fields must be float32 or float64, not {dtype}")
+        encoded = json.dumps(dict(metadata)).encode()
+        count = int(np.prod(shape))
+        offset = _aligned(_HEADER.size + len(encoded))
+        if offset + count * dtype.itemsize > self.slot_bytes:
+            raise ValueError(f"Field of {count * dtype.itemsize} bytes does not fit in a slot of {self.slot_bytes}")
+
+        index = self._free.get()
+        try:
+            slot = self._slot(index)
+            _HEADER.pack_into(slot, 0, len(encoded), count * dtype.itemsize, dtype.str.encode())
+            slot[_HEADER.size : _HEADER.size + len(encoded)] = encoded
+            yield np.frombuffer(slot, dtype=dtype, count=count, offset=offset).reshape(shape)
+        except BaseException:
+            self._free.put(index)
+            raise
+        self._ready.put(index)
+
+    def write_field(self, metadata: Mapping[str, Any], data: Any):
+        """
+        Write a field
+
+        Parameters
+        ----------
+        metadata : Mapping[str, Any]
+            Metadata of the field
+        data : Any
+            Values of the field, converted to float64 unless float32
+        """
+        data = np.asarray(data)
+        dtype = np.float32 if data.dtype == np.float32 else np.float64
+        with self.reserve(metadata, data.shape, dtype) as array:
+            array[...] = data
+
+    def close(self):
+        """Detach from the shared memory"""
+        if self._memory is not None:
+            self._memory.close()
+            self._memory = None
+
+
+class FanIn:
+    """
+    Write fields computed in `multiprocessing` workers with a single `Multio` handle.
+
+    The shared memory is split into `slots` slots, each holding the metadata and values
+    of a field. Workers wait for a free slot, fill it and queue its index, and the writer
+    thread calls `write_field` on a view of the slot before freeing it again. Only slot
+    indices go through the queues. `flush` and `notify` are queued after the fields
+    already written.
+
+    Examples
+    --------
+    ```python
+    def init(worker):
+        global fan_in
+        fan_in = worker
+
+    def derive(metadata):
+        with fan_in.reserve(metadata, npoints) as values:
+            compute(metadata, out=values)
+
+    with Multio() as mio, FanIn(mio, slots=16) as fan_in:
+        with multiprocessing.Pool(8, initializer=init, initargs=(fan_in.worker(),)) as pool:
+            pool.map(derive, fields)
+        fan_in.flush({"step": step})
+    ```
+    """
+
+    def __init__(
+        self,
+        mio: Any,
+        slots: int = DEFAULT_SLOTS,
+        slot_bytes: int = DEFAULT_SLOT_BYTES,
+        context: Any = None,
+    ):
+        """
+        Create a FanIn
+
+        Parameters
+        ----------
+        mio : Multio
+            Handle to write the fields with
+        slots : int, optional
+            Number of fields held in shared memory at once
+        slot_bytes : int, optional
+            Size of each slot, the largest field with its metadata
+        context : Any, optional
+            `multiprocessing` context or start method the workers are created with
+        """
+        if isinstance(context, str) or context is None:
+            context = multiprocessing.get_context(context)
+        self.mio = mio
+        self.slots = slots
+        self.slot_bytes = _aligned(slot_bytes)
+        self.statistics = FanInStatistics()
+
+        self._memory = _SharedMemory(create=True, size=self.slots * self.slot_bytes)
+        # Puts to simple queues are written to the pipe before returning, so flushes and
+        # notifications queued by the parent come after the fields the workers have written
+        self._free = context.SimpleQueue()
+        self._ready = context.SimpleQueue()
+        for index in range(self.slots):
+            self._free.put(index)
+
+        self._thread: threading.Thread | None = None
+        self._error: BaseException | None = None
+        self._condition = threading.Condition()
+        self._queued = 0
+        self._done = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def worker(self) -> FanInWorker:
+        """Handle for the workers to write fields with"""
+        return FanInWorker(self._memory.name, self.slots, self.slot_bytes, self._free, self._ready)
+
+    def start(self):
+        """Start the writer thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._write, name="multio-fanin", daemon=True)
+            self._thread.start()
+
+    def _write(self):
+        while True:
+            entry = self._ready.get()
+            if entry is None:
+                return
+
+            try:
+                if isinstance(entry, int):
+                    self._write_slot(entry)
+                else:
+                    self._control(*entry)
+            except BaseException as e:
+                # Release the views of the slot held by the frames of the traceback
+                traceback.clear_frames(e.__traceback__)
+                if self._error is None:
+                    self._error = e
+            finally:
+                if isinstance(entry, int):
+                    self._free.put(entry)
+                else:
+                    with self._condition:
+                        self._done += 1
+                        self._condition.notify_all()
+
+    def _write_slot(self, index: int):
+        slot = self._memory.buf[index * self.slot_bytes : (index + 1) * self.slot_bytes]
+        metadata_bytes, data_bytes, dtype = _HEADER.unpack_from(slot, 0)
+        metadata = json.loads(bytes(slot[_HEADER.size : _HEADER.size + metadata_bytes]))
+        dtype = np.dtype(dtype.rstrip(b"\0").decode())
+        offset = _aligned(_HEADER.size + metadata_bytes)
+        data = np.frombuffer(slot, dtype=dtype, count=data_bytes // dtype.itemsize, offset=offset)
+
+        # The library has copied the values once write_field returns, so the slot can be reused
+        self.mio.write_field(metadata, data)
+        self.statistics.fields += 1
+        self.statistics.bytes += data_bytes
+
+    def _control(self, kind: str, metadata: Any):
+        if kind == "flush":
+            self.mio.flush(metadata)
+            self.statistics.flushes += 1
+        else:
+            self.mio.notify(metadata)
+            self.statistics.notifications += 1
+
+    def _check(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError("Writing fields from the workers failed") from error
+
+    def _queue(self, kind: str, metadata: Any):
+        self._check()
+        with self._condition:
+            self._queued += 1
+            queued = self._queued
+        self._ready.put((kind, None if metadata is None else dict(metadata)))
+        return queued
+
+    def wait(self, queued: int | None = None):
+        """Block until the flushes and notifications queued so far have been made"""
+        queued = self._queued if queued is None else queued
+        with self._condition:
+            self._condition.wait_for(lambda: self._done >= queued or self._thread is None)
+        self._check()
+
+    def flush(self, metadata: Mapping[str, Any] | None = None):
+        """Flush once the fields written so far have been written, without waiting"""
+        self._queue("flush", metadata)
+
+    def notify(self, metadata: Mapping[str, Any]):
+        """Notify once the fields written so far have been written, without waiting"""
+        self._queue("notify", metadata)
+
+    def close(self):
+        """Write every queued field, stop the writer thread and free the shared memory"""
+        if self._thread is not None:
+            self._ready.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._memory is not None:
+            self._memory.unlink()
+            self._memory.close()
+            self._memory = None
+            self._free.close()
+            self._ready.close()
+        self._check()
+
+
+__all__ = ["FanIn", "FanInStatistics", "FanInWorker"]
@@ -0,0 +1,266 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Ingestion of GRIB files into a `Multio` handle, e.g. to backfill archives into new plans.
+"""
+
+from __future__ import annotations
+
+import glob
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, Mapping
+
+DEFAULT_CHUNK_BYTES = 64 * 1024**2
+
+_SCAN_BYTES = 64 * 1024
+
+
+@dataclass
+class IngestProgress:
+    """Running totals of a `GribIngester`"""
+
+    files: int = 0
+    messages: int = 0
+    bytes: int = 0
+    flushes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def messages_per_second(self) -> float:
+        return self.messages / self.seconds if self.seconds else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.files} file(s), {self.messages} message(s), {self.bytes / 1024**2:.1f} MiB in {self.seconds:.1f}s, "
+            f"{self.messages_per_second:.1f} messages/s, {self.bytes_per_second / 1024**2:.1f} MiB/s"
+        )
+
+
+def _paths(sources: str | os.PathLike | Iterable[str | os.PathLike]) -> list[str]:
+    """Files of paths and glob patterns, each pattern sorted"""
+    if isinstance(sources, (str, os.PathLike)):
+        sources = [sources]
+    paths = []
+    for source in map(os.fspath, sources):
+        if glob.has_magic(source):
+            matches = sorted(glob.glob(source))
+            if not matches:
+                raise FileNotFoundError(f"No file matches {source}")
+            paths += matches
+        else:
+            paths.append(source)
+    return paths
+
+
+def _length(header: bytes, path: str, offset: int) -> int:
+    """Length of a message from the first 16 bytes"""
+    edition = header[7]
+    if edition == 1:
+        length = int.from_bytes(header[4:7], "big")
+        if length & 0x800000:
+            raise ValueError(f"{path}: GRIB 1 message of more than 8 MiB at {offset} is not supported")
+        return length
+    if edition == 2:
+        return int.from_bytes(header[8:16], "big")
+    raise ValueError(f"{path}: unknown GRIB edition {edition} at {offset}")
+
+
+def _scan(path: str) -> Iterator[tuple[int, int]]:
+    """Offset and length of every message of a file, reading only their headers"""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        offset = 0
+        while offset < size:
+            f.seek(offset)
+            header = f.read(16)
+            if header[:4] != b"GRIB":
+                # Skip anything between messages
+                block = header + f.read(_SCAN_BYTES)
+                found = block.find(b"GRIB", 1)
+                if found < 0:
+                    offset += max(len(block) - 3, 1)
+                else:
+                    offset += found
+                continue
+            if len(header) < 16:
+                raise ValueError(f"{path}: truncated GRIB message at {offset}")
+            length = _length(header, path, offset)
+            if offset + length > size:
+                raise ValueError(f"{path}: truncated GRIB message at {offset}, {length} bytes expected")
+            yield offset, length
+            offset += length
+
+
+def _read(path: str, start: int, messages: list[tuple[int, int]]) -> list[memoryview]:
+    """Read consecutive messages of a file, each as a view of a single buffer"""
+    end = messages[-1][0] + messages[-1][1]
+    buffer = bytearray(end - start)
+    with open(path, "rb") as f:
+        f.seek(start)
+        if f.readinto(buffer) != len(buffer):
+            raise ValueError(f"{path}: file shrunk while reading")
+
+    view = memoryview(buffer)
+    split = []
+    for offset, length in messages:
+        message = view[offset - start : offset - start + length]
+        if message[-4:] != b"7777":
+            raise ValueError(f"{path}: GRIB message at {offset} does not end with 7777")
+        split.append(message)
+    return split
+
+
+class GribIngester:
+    """
+    Write the messages of GRIB files with `Multio.write_grib`, reading ahead in a thread pool.
+
+    Files are indexed by reading the header of each message, and runs of consecutive messages
+    of about `chunk_bytes` are read and split by the pool, at most `prefetch` runs ahead of the
+    one being written. The calling thread is the only one writing to the handle, passing each
+    message as a view of the buffer it was read into.
+
+    Examples
+    --------
+    ```python
+    with Multio() as mio:
+        ingester = GribIngester(mio, workers=8, flush_every=1000, progress=print)
+        ingester.run("/archive/2024-*/*.grib")
+    ```
+    """
+
+    def __init__(
+        self,
+        mio: Any,
+        workers: int = 4,
+        prefetch: int = 8,
+        chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+        flush_every: int | None = None,
+        flush_metadata: Mapping[str, Any] | None = None,
+        progress: Callable[[IngestProgress], None] | None = None,
+        interval: float = 10.0,
+    ):
+        """
+        Create a GribIngester
+
+        Parameters
+        ----------
+        mio : Multio
+            Handle to write the messages with
+        workers : int, optional
+            Threads reading the files
+        prefetch : int, optional
+            Runs of messages read ahead of the one being written
+        chunk_bytes : int, optional
+            Size of each run of messages read at once, a larger message is read on its own
+        flush_every : int, optional
+            Messages written between flushes, only flushing at the end if not given
+        flush_metadata : Mapping[str, Any], optional
+            Metadata of the flushes
+        progress : Callable[[IngestProgress], None], optional
+            Called with the totals every `interval` seconds and at the end
+        interval : float, optional
+            Seconds between calls of `progress`
+        """
+        self.mio = mio
+        self.workers = workers
+        self.prefetch = max(prefetch, 1)
+        self.chunk_bytes = chunk_bytes
+        self.flush_every = flush_every
+        self.flush_metadata = None if flush_metadata is None else dict(flush_metadata)
+        self.progress = progress
+        self.interval = interval
+
+    def _runs(self, paths: list[str]) -> Iterator[tuple[str, int, list[tuple[int, int]]]]:
+        for path in paths:
+            run: list[tuple[int, int]] = []
+            for offset, length in _scan(path):
+                if run and offset + length - run[0][0] > self.chunk_bytes:
+                    yield path, run[0][0], run
+                    run = []
+                run.append((offset, length))
+            if run:
+                yield path, run[0][0], run
+
+    def _flush(self, progress: IngestProgress):
+        self.mio.flush(self.flush_metadata)
+        progress.flushes += 1
+
+    def run(self, sources: str | os.PathLike | Iterable[str | os.PathLike]) -> IngestProgress:
+        """
+        Write every message of the files
+
+        Parameters
+        ----------
+        sources : str | os.PathLike | Iterable[str | os.PathLike]
+            Files or glob patterns, written in order
+
+        Returns
+        -------
+        IngestProgress
+            Totals of the messages written
+        """
+        paths = _paths(sources)
+        progress = IngestProgress()
+        start = reported = time.perf_counter()
+        since_flush = 0
+        current = None
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="multio-ingest") as executor:
+            pending = deque()
+            runs = self._runs(paths)
+            try:
+                while True:
+                    while len(pending) < self.prefetch:
+                        run = next(runs, None)
+                        if run is None:
+                            break
+                        pending.append((run[0], executor.submit(_read, *run)))
+                    if not pending:
+                        break
+
+                    path, future = pending.popleft()
+                    messages = future.result()
+                    if path != current:
+                        current = path
+                        progress.files += 1
+                    for message in messages:
+                        self.mio.write_grib(message)
+                        progress.messages += 1
+                        progress.bytes += len(message)
+                        since_flush += 1
+                        if self.flush_every is not None and since_flush >= self.flush_every:
+                            self._flush(progress)
+                            since_flush = 0
+                    del messages
+
+                    now = time.perf_counter()
+                    progress.seconds = now - start
+                    if self.progress is not None and now - reported >= self.interval:
+                        reported = now
+                        self.progress(progress)
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+        if since_flush:
+            self._flush(progress)
+        progress.seconds = time.perf_counter() - start
+        if self.progress is not None:
+            self.progress(progress)
+        return progress
+
+
+__all__ = ["GribIngester", "IngestProgress"]
@@ -0,0 +1,184 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Priority lanes for the fields written to a `Multio` handle.
+
+Products with tight deadlines, e.g. surface fields for early dissemination, are sent as soon
+as they are written, while the bulk of the output is held and sent after them.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Iterable, Mapping
+
+import numpy as np
+
+from .plans.actions import Select
+
+DEFAULT_MAX_BYTES = 1024**3
+
+
+@dataclass
+class LaneStatistics:
+    """Running totals of the fields written through `PriorityLanes`"""
+
+    priority: int = 0
+    bulk: int = 0
+    starved: int = 0
+    peak_bytes: int = 0
+
+
+class PriorityLanes:
+    """
+    Send matching fields ahead of the bulk of the fields written.
+
+    Fields matching the priority rules are sent as soon as they are written. Other fields
+    are copied, with their metadata, into the bulk lane, and sent in the order they were
+    written on `flush` and `notify`, before a mask or domain is written, and when the
+    handle is closed. So that the bulk lane is not starved, its oldest fields are also sent
+    once they have been held for longer than `max_delay`, or once the lane holds more than
+    `max_bytes`.
+
+    With a `ReorderBuffer`, bulk fields are held and sorted by the buffer instead.
+    Matching uses the same vocabulary as `multio.plans.Select`.
+
+    Examples
+    --------
+    ```python
+    lanes = PriorityLanes(params=["2t", "10u", "10v", "msl"], max_delay=30)
+    with Multio(lanes=lanes) as mio:
+        mio.write_field({"param": "t", "level": 137}, values)  # held
+        mio.write_field({"param": "2t"}, values)  # sent now
+        mio.flush({"step": 6})  # t sent, then the flush
+    ```
+    """
+
+    def __init__(
+        self,
+        match: Iterable[Mapping[str, Any]] | None = None,
+        params: Iterable[Any] | None = None,
+        max_bytes: int | None = DEFAULT_MAX_BYTES,
+        max_delay: float | None = None,
+    ):
+        """
+        Create PriorityLanes
+
+        Parameters
+        ----------
+        match : Iterable[Mapping[str, Any]], optional
+            Metadata of the priority fields
+        params : Iterable[Any], optional
+            Shorthand for matching on `param`
+        max_bytes : int, optional
+            Largest size of the bulk fields held, unlimited if None
+        max_delay : float, optional
+            Seconds a bulk field may be held, unlimited if None
+        """
+        rules = [dict(rule) for rule in match or []]
+        if params is not None:
+            rules.append({"param": list(params)})
+
+        self._select = Select(match=rules)
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.statistics = LaneStatistics()
+
+        self._bulk: deque[tuple[float, Any, np.ndarray]] = deque()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._bulk)
+
+    @property
+    def held_bytes(self) -> int:
+        """Size of the bulk fields held"""
+        return self._bytes
+
+    def applies(self, metadata: Mapping[str, Any]) -> bool:
+        """
+        Check if a field goes in the priority lane, counting it if so
+
+        Parameters
+        ----------
+        metadata : Mapping[str, Any]
+            Metadata of the field
+
+        Returns
+        -------
+        bool
+            True if the field should be sent now
+        """
+        if self._select.matches(metadata):
+            self.statistics.priority += 1
+            return True
+        self.statistics.bulk += 1
+        return False
+
+    def add(self, metadata: Any, data: Any) -> list[tuple[Any, np.ndarray]]:
+        """
+        Hold a copy of a bulk field
+
+        Parameters
+        ----------
+        metadata : Metadata | Mapping[str, Any]
+            Metadata of the field
+        data : Any
+            Values of the field
+
+        Returns
+        -------
+        list[tuple[Any, np.ndarray]]
+            Bulk fields to send now, oldest first
+        """
+        # The caller may reuse its metadata as well as its arrays
+        values = np.array(data, copy=True)
+        self._bulk.append((time.monotonic(), metadata.copy(), values))
+        self._bytes += values.nbytes
+        self.statistics.peak_bytes = max(self.statistics.peak_bytes, self._bytes)
+        return self.starved()
+
+    def starved(self) -> list[tuple[Any, np.ndarray]]:
+        """
+        Remove the bulk fields held for too long, or beyond the budget
+
+        Returns
+        -------
+        list[tuple[Any, np.ndarray]]
+            Metadata and values of the fields, oldest first
+        """
+        deadline = None if self.max_delay is None else time.monotonic() - self.max_delay
+        fields = []
+        while self._bulk and (
+            (deadline is not None and self._bulk[0][0] <= deadline)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            _, metadata, values = self._bulk.popleft()
+            self._bytes -= values.nbytes
+            fields.append((metadata, values))
+        self.statistics.starved += len(fields)
+        return fields
+
+    def drain(self) -> list[tuple[Any, np.ndarray]]:
+        """
+        Remove every bulk field held
+
+        Returns
+        -------
+        list[tuple[Any, np.ndarray]]
+            Metadata and values of the fields, oldest first
+        """
+        fields = [(metadata, values) for _, metadata, values in self._bulk]
+        self._bulk.clear()
+        self._bytes = 0
+        return fields
+
+
+__all__ = ["LaneStatistics", "PriorityLanes"]
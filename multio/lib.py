@@ -14,6 +14,7 @@
 # limitations under the License.
 
 import os
+import time
 
 import cffi
 import findlibs
@@ -43,6 +44,9 @@ class PatchedLib:
     def __init__(self):
         ffi.cdef(self.__read_header())
 
+        # Set by multio.trace.Tracer to time every call into the library
+        self.tracer = None
+
         libname = findlibs.find("multio-api")
         self.__lib = None
 
@@ -90,7 +94,13 @@ class PatchedLib:
         """
 
         def wrapped_fn(*args, **kwargs):
-            retval = fn(*args, **kwargs)
+            tracer = self.tracer
+            if tracer is None:
+                retval = fn(*args, **kwargs)
+            else:
+                start = time.perf_counter()
+                retval = fn(*args, **kwargs)
+                tracer.native(name, start, time.perf_counter())
             if retval not in (self.__lib.MULTIO_SUCCESS,):
                 error_str = "Error in function {}: {}".format(
                     name, ffi.string(self.__lib.multio_error_string(retval))
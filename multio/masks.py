@@ -0,0 +1,314 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Client-side handling of masks written with `Multio.write_mask`.
+
+Fields defined on a masked domain (e.g. ocean only) can be compacted to
+their valid points before transport, and expanded back on the receiving side.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Iterable, Mapping
+
+import numpy as np
+
+from .plans.actions import Select
+
+COMPACTED_KEY = "compacted"
+COMPACTED_SIZE_KEY = "compactedSize"
+
+
+def compact(data: Any, mask: np.ndarray) -> np.ndarray:
+    """
+    Compact field values to the valid points of a mask
+
+    Parameters
+    ----------
+    data : Any
+        Full grid field values
+    mask : np.ndarray
+        Boolean array, True where points are valid
+
+    Returns
+    -------
+    np.ndarray
+        Values at the valid points
+    """
+    return np.asarray(data)[mask]
+
+
+def expand(values: Any, mask: np.ndarray, missing_value: float = np.nan, out: np.ndarray | None = None) -> np.ndarray:
+    """
+    Rebuild a full grid field from compacted values
+
+    Parameters
+    ----------
+    values : Any
+        Values at the valid points, as sent by a compacting client
+    mask : np.ndarray
+        Boolean array, True where points are valid
+    missing_value : float, optional
+        Value for the masked points, defaults to NaN, so a missing value must be given for integer values
+    out : np.ndarray, optional
+        Array to write into, allocated if not given
+
+    Returns
+    -------
+    np.ndarray
+        Full grid field values
+
+    Raises
+    ------
+    ValueError
+        If the missing value can not be stored in the type of the output
+    """
+    values = np.asarray(values)
+    if out is None:
+        out = np.empty(mask.shape, dtype=values.dtype)
+    if not np.issubdtype(out.dtype, np.inexact):
+        info = np.iinfo(out.dtype) if np.issubdtype(out.dtype, np.integer) else None
+        representable = float(missing_value).is_integer() and (
+            info.min <= missing_value <= info.max if info is not None else missing_value in (0, 1)
+        )
+        if not representable:
+            raise ValueError(f"Missing value {missing_value} can not be stored as {out.dtype}")
+    out.fill(missing_value)
+    out[mask] = values
+    return out
+
+
+class PackedMask:
+    """
+    Boolean mask stored with one bit per point.
+
+    The single precision expansion sent to the server is built on first use
+    and kept, so a mask held by a `MaskCache` is only expanded once.
+    """
+
+    def __init__(self, data: Any):
+        """
+        Create a PackedMask
+
+        Parameters
+        ----------
+        data : Any
+            Mask values, non-zero where points are valid
+        """
+        data = np.asarray(data)
+        if data.dtype != np.bool_:
+            data = data != 0
+        self.shape = data.shape
+        self.size = data.size
+        self.bits = np.packbits(data.ravel())
+        self.digest = hashlib.blake2b(self.bits, digest_size=16).digest()
+        self._float: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return self.size
+
+    def valid(self) -> np.ndarray:
+        """Boolean array of the shape of the mask, True where points are valid"""
+        return np.unpackbits(self.bits, count=self.size).view(np.bool_).reshape(self.shape)
+
+    def as_float(self) -> np.ndarray:
+        """Flat single precision array of ones and zeros, as taken by the C API"""
+        if self._float is None:
+            self._float = np.unpackbits(self.bits, count=self.size).astype(np.float32)
+        return self._float
+
+
+class MaskCache:
+    """
+    Cache of packed masks, keyed on their content.
+
+    Resending a mask already in the cache reuses its packed form and its expansion.
+    """
+
+    def __init__(self, maxsize: int = 16):
+        """
+        Create a MaskCache
+
+        Parameters
+        ----------
+        maxsize : int, optional
+            Number of masks to keep, least recently used are dropped first
+        """
+        self.maxsize = maxsize
+        self._masks: OrderedDict[bytes, PackedMask] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._masks)
+
+    def get(self, data: Any) -> PackedMask:
+        """
+        Find or add the packed form of a mask
+
+        Parameters
+        ----------
+        data : Any
+            Mask values or a `PackedMask`
+
+        Returns
+        -------
+        PackedMask
+            Cached packed mask with the same content
+        """
+        mask = data if isinstance(data, PackedMask) else PackedMask(data)
+
+        cached = self._masks.get(mask.digest)
+        if cached is not None and cached.shape == mask.shape:
+            self._masks.move_to_end(mask.digest)
+            return cached
+
+        self._masks[mask.digest] = mask
+        if len(self._masks) > self.maxsize:
+            self._masks.popitem(last=False)
+        return mask
+
+
+@dataclass
+class CompactionStatistics:
+    """Running totals of the fields compacted by a `MaskCompaction`"""
+
+    fields: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_in - self.bytes_out
+
+
+class MaskCompaction:
+    """
+    Compact fields to the valid points of the masks written with `Multio.write_mask`.
+
+    Masks and fields are paired on the values of `keys` in their metadata, which must all
+    be set: a mask missing a key is not used, and a field missing one is not compacted.
+    Compacted fields are tagged with `compacted: mask` and `compactedSize`,
+    use `expand` with the same mask to rebuild the full grid.
+
+    Examples
+    --------
+    ```python
+    compaction = MaskCompaction(keys=("domain",))
+    with Multio(compaction=compaction) as mio:
+        mio.write_mask({"domain": "ocean"}, lsm)
+        mio.write_field({"domain": "ocean", "param": "sst"}, sst)
+    ```
+    """
+
+    def __init__(self, keys: Iterable[str] = ("domain",), match: Iterable[Mapping[str, Any]] | None = None):
+        """
+        Create a MaskCompaction
+
+        Parameters
+        ----------
+        keys : Iterable[str], optional
+            Metadata keys pairing fields with masks, defaults to `("domain",)`
+        match : Iterable[Mapping[str, Any]], optional
+            Only compact fields matching, same vocabulary as `multio.plans.Select`.
+            Defaults to every field with a mask.
+        """
+        self.keys = tuple(keys)
+        self._select = None if match is None else Select(match=[dict(rule) for rule in match])
+        # Boolean masks, unpacked once when registered rather than for every field
+        self._masks: dict[tuple, np.ndarray] = {}
+        self.statistics = CompactionStatistics()
+
+    def _key(self, metadata: Mapping[str, Any]) -> tuple | None:
+        if any(key not in metadata for key in self.keys):
+            return None
+        return tuple(metadata[key] for key in self.keys)
+
+    def register(self, metadata: Mapping[str, Any], data: Any) -> None:
+        """
+        Record a mask as written to the server
+
+        Parameters
+        ----------
+        metadata : Mapping[str, Any]
+            Metadata of the mask
+        data : Any
+            Mask values, non-zero where points are valid, or a `PackedMask`
+        """
+        key = self._key(metadata)
+        if key is not None:
+            if isinstance(data, PackedMask):
+                self._masks[key] = data.valid()
+            else:
+                # Copied, as the caller may reuse its array
+                self._masks[key] = np.array(data, dtype=np.bool_)
+
+    def mask(self, metadata: Mapping[str, Any]) -> np.ndarray | None:
+        """
+        Find the mask paired with a field
+
+        Parameters
+        ----------
+        metadata : Mapping[str, Any]
+            Metadata of the field
+
+        Returns
+        -------
+        np.ndarray | None
+            Boolean array, True where points are valid, None if no mask was written
+        """
+        return self._masks.get(self._key(metadata))
+
+    def applies(self, metadata: Mapping[str, Any], data: Any) -> bool:
+        """
+        Check if a field can be compacted
+
+        Parameters
+        ----------
+        metadata : Mapping[str, Any]
+            Metadata of the field
+        data : Any
+            Field values
+
+        Returns
+        -------
+        bool
+            True if a mask of the same size is known for the field
+        """
+        if self._select is not None and not self._select.matches(metadata):
+            return False
+        mask = self._masks.get(self._key(metadata))
+        return mask is not None and mask.shape == np.shape(data)
+
+    def compact(self, metadata: Mapping[str, Any], data: Any) -> tuple[np.ndarray, dict[str, Any]]:
+        """
+        Compact a field to the valid points of its mask
+
+        Parameters
+        ----------
+        metadata : Mapping[str, Any]
+            Metadata of the field
+        data : Any
+            Field values
+
+        Returns
+        -------
+        tuple[np.ndarray, dict[str, Any]]
+            Compacted values, and metadata to add to the field
+        """
+        data = np.asarray(data)
+        values = compact(data, self.mask(metadata))
+
+        self.statistics.fields += 1
+        self.statistics.bytes_in += data.nbytes
+        self.statistics.bytes_out += values.nbytes
+        return values, {COMPACTED_KEY: "mask", COMPACTED_SIZE_KEY: int(values.size)}
+
+
+__all__ = ["MaskCache", "MaskCompaction", "CompactionStatistics", "PackedMask", "compact", "expand"]
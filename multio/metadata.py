@@ -9,6 +9,10 @@ class Metadata:
         lib.multio_new_metadata(metadata, parent_multio._handle)
 
         self._handle = ffi.gc(metadata[0], lib.multio_delete_metadata)
+        self._parent = parent_multio
+
+        # The C API offers no getters, so keep a python-side copy of everything set
+        self._values = {}
 
         if md is not None:
             for key, value in md.items():
@@ -25,6 +29,43 @@ class Metadata:
             self._set_float(key, value)
         else:
             raise TypeError(f"{type(value).__name__} is not allowed for metadata")
+        self._values[key] = value
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def keys(self):
+        return self._values.keys()
+
+    def items(self):
+        return self._values.items()
+
+    def to_dict(self):
+        """Return a python dict of the metadata set so far"""
+        return dict(self._values)
+
+    def copy(self, extra=None):
+        """
+        Create a new Metadata object with the same values
+        Parameters:
+            extra(dict): Additional values to set on the copy
+        """
+        values = self.to_dict()
+        if extra is not None:
+            values.update(extra)
+        return Metadata(self._parent, md=values)
 
     def _set_int(self, key, value):
         key = ffi.new("char[]", key.encode("ascii"))
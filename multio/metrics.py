@@ -0,0 +1,491 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Throughput and latency metrics of a `Multio` handle.
+
+Every `Multio` keeps a `Metrics` instance, available with `Multio.metrics()`,
+which can be exported in the Prometheus text format with a `PrometheusExporter`.
+A `StepTracker` can be added as an observer to follow the latency of each step.
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import IO, Any, Iterable, Mapping, Optional, Sequence
+
+# Upper bounds of the latency buckets, in seconds
+DEFAULT_BUCKETS = (1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1.0, 5.0)
+LATENCY_METHODS = ("write_field", "flush", "notify")
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """Counts of observations in fixed buckets, as a Prometheus histogram"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[float, int]]:
+        """Number of observations up to each bucket bound, the last bound being infinity"""
+        totals, running = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            running += count
+            totals.append((bound, running))
+        return totals
+
+
+@dataclass
+class MethodMetrics:
+    """Counters of a single method of `Multio`"""
+
+    calls: int = 0
+    fields: int = 0
+    bytes: int = 0
+    copies: int = 0
+    zero_copies: int = 0
+    latency: Optional[Histogram] = field(default=None, repr=False)
+
+
+class Metrics:
+    """
+    Counters of the calls made to a `Multio` handle.
+
+    Recorded after every call with the time it took and the buffers passed to the library,
+    as a tuple of their size in bytes and whether they were passed without copy.
+    """
+
+    def __init__(self, latency_methods: Iterable[str] = LATENCY_METHODS, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Create a Metrics
+
+        Parameters
+        ----------
+        latency_methods : Iterable[str], optional
+            Methods to keep a latency histogram of, defaults to write_field, flush and notify
+        buckets : Sequence[float], optional
+            Upper bounds of the latency buckets in seconds
+        """
+        self.latency_methods = frozenset(latency_methods)
+        self.buckets = tuple(buckets)
+        self.methods: dict[str, MethodMetrics] = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, method: str, metadata: Any, seconds: float, sent: Iterable[tuple[int, bool]] = ()):
+        """
+        Record a call
+
+        Parameters
+        ----------
+        method : str
+            Name of the method called
+        metadata : Any
+            Metadata of the call, unused
+        seconds : float
+            Time taken by the call
+        sent : Iterable[tuple[int, bool]], optional
+            Size in bytes of every buffer passed to the library, and whether it was passed without copy
+        """
+        with self._lock:
+            metrics = self.methods.get(method)
+            if metrics is None:
+                latency = Histogram(self.buckets) if method in self.latency_methods else None
+                metrics = self.methods[method] = MethodMetrics(latency=latency)
+
+            metrics.calls += 1
+            for nbytes, zero_copy in sent:
+                metrics.fields += 1
+                metrics.bytes += nbytes
+                if zero_copy:
+                    metrics.zero_copies += 1
+                else:
+                    metrics.copies += 1
+            if metrics.latency is not None:
+                metrics.latency.observe(seconds)
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Current value of every counter
+
+        Returns
+        -------
+        dict[str, Any]
+            Uptime in seconds, and the counters and latency histogram of every method called
+        """
+        with self._lock:
+            methods = {}
+            for name, metrics in self.methods.items():
+                methods[name] = {
+                    "calls": metrics.calls,
+                    "fields": metrics.fields,
+                    "bytes": metrics.bytes,
+                    "copies": metrics.copies,
+                    "zero_copies": metrics.zero_copies,
+                }
+                if metrics.latency is not None:
+                    methods[name]["latency"] = {
+                        "count": metrics.latency.count,
+                        "sum": metrics.latency.sum,
+                        "buckets": dict(metrics.latency.cumulative()),
+                    }
+        return {"uptime": time.time() - self.started, "methods": methods}
+
+    def to_prometheus(self, prefix: str = "multio", labels: Mapping[str, str] | None = None) -> str:
+        """
+        Counters in the Prometheus text exposition format
+
+        Parameters
+        ----------
+        prefix : str, optional
+            Prefix of every metric name
+        labels : Mapping[str, str], optional
+            Labels added to every sample, e.g. the host or rank
+
+        Returns
+        -------
+        str
+            Text of all metrics
+        """
+        snapshot = self.snapshot()
+        base = "".join(f'{key}="{_escape(value)}",' for key, value in (labels or {}).items())
+
+        lines = [
+            f"# HELP {prefix}_uptime_seconds Time since the handle was created",
+            f"# TYPE {prefix}_uptime_seconds gauge",
+            f"{prefix}_uptime_seconds{{{base.rstrip(',')}}} {snapshot['uptime']}",
+        ]
+        for counter, description in (
+            ("calls", "Calls per method"),
+            ("fields", "Buffers passed to the library per method"),
+            ("bytes", "Bytes passed to the library per method"),
+        ):
+            lines.append(f"# HELP {prefix}_{counter}_total {description}")
+            lines.append(f"# TYPE {prefix}_{counter}_total counter")
+            for method, values in snapshot["methods"].items():
+                lines.append(f'{prefix}_{counter}_total{{{base}method="{method}"}} {values[counter]}')
+
+        lines.append(f"# HELP {prefix}_buffers_total Buffers passed to the library per method, by copy mode")
+        lines.append(f"# TYPE {prefix}_buffers_total counter")
+        for method, values in snapshot["methods"].items():
+            lines.append(f'{prefix}_buffers_total{{{base}method="{method}",mode="copy"}} {values["copies"]}')
+            lines.append(f'{prefix}_buffers_total{{{base}method="{method}",mode="zero_copy"}} {values["zero_copies"]}')
+
+        lines.append(f"# HELP {prefix}_latency_seconds Latency per method")
+        lines.append(f"# TYPE {prefix}_latency_seconds histogram")
+        for method, values in snapshot["methods"].items():
+            latency = values.get("latency")
+            if latency is None:
+                continue
+            for bound, count in latency["buckets"].items():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{prefix}_latency_seconds_bucket{{{base}method="{method}",le="{le}"}} {count}')
+            lines.append(f'{prefix}_latency_seconds_sum{{{base}method="{method}"}} {latency["sum"]}')
+            lines.append(f'{prefix}_latency_seconds_count{{{base}method="{method}"}} {latency["count"]}')
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class PrometheusExporter:
+    """
+    Export metrics in the Prometheus text format.
+
+    Either writes them periodically to a file, e.g. for the node-exporter textfile collector,
+    or serves them over HTTP on a local port, or both.
+
+    Examples
+    --------
+    ```python
+    with Multio() as mio:
+        exporter = mio.export_metrics(path="/var/lib/node_exporter/multio.prom", labels={"rank": "0"})
+        ...
+    ```
+    """
+
+    def __init__(
+        self,
+        metrics: Metrics,
+        *,
+        path: str | os.PathLike | None = None,
+        port: int | None = None,
+        host: str = "127.0.0.1",
+        interval: float = 15.0,
+        prefix: str = "multio",
+        labels: Mapping[str, str] | None = None,
+    ):
+        """
+        Create a PrometheusExporter
+
+        Parameters
+        ----------
+        metrics : Metrics
+            Metrics to export
+        path : str | os.PathLike, optional
+            File to write the metrics to every `interval`, replaced atomically
+        port : int, optional
+            Port to serve the metrics on, 0 for any free port
+        host : str, optional
+            Address to serve the metrics on, defaults to localhost only
+        interval : float, optional
+            Seconds between writes to `path`
+        prefix : str, optional
+            Prefix of every metric name
+        labels : Mapping[str, str], optional
+            Labels added to every sample
+        """
+        if path is None and port is None:
+            raise ValueError("Either a path or a port is required to export metrics")
+
+        self.metrics = metrics
+        self.path = None if path is None else os.fspath(path)
+        self.port = port
+        self.host = host
+        self.interval = interval
+        self.prefix = prefix
+        self.labels = dict(labels or {})
+
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._server: ThreadingHTTPServer | None = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def render(self) -> str:
+        return self.metrics.to_prometheus(self.prefix, self.labels)
+
+    @property
+    def address(self) -> tuple[str, int] | None:
+        """Address the metrics are served on"""
+        return None if self._server is None else self._server.server_address[:2]
+
+    def write(self):
+        """Write the metrics to `path` now"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self.render())
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def start(self) -> "PrometheusExporter":
+        """Start exporting in background threads"""
+        if self.port is not None and self._server is None:
+            exporter = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    body = exporter.render().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="multio-metrics-http", daemon=True).start()
+
+        if self.path is not None and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="multio-metrics-file", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def stop(self):
+        """Stop exporting, writing the file one last time"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.write()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+@dataclass
+class StepTimeline:
+    """
+    Timestamps and totals of a single step, as seconds since the epoch.
+
+    `other_seconds` is the time between the first write and the end of the flush
+    spent outside of `write_field` and `flush`, e.g. computing the next fields.
+    """
+
+    step: Any
+    first_write: float
+    last_write: float
+    fields: int = 0
+    bytes: int = 0
+    write_seconds: float = 0.0
+    flush_start: Optional[float] = None
+    flush_end: Optional[float] = None
+    notify: Optional[float] = None
+
+    @property
+    def latency(self) -> Optional[float]:
+        """Seconds from the first write to the end of the flush"""
+        return None if self.flush_end is None else self.flush_end - self.first_write
+
+    @property
+    def flush_seconds(self) -> Optional[float]:
+        return None if self.flush_end is None else self.flush_end - self.flush_start
+
+    @property
+    def other_seconds(self) -> Optional[float]:
+        return None if self.flush_end is None else self.latency - self.write_seconds - self.flush_seconds
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "step": self.step,
+            "first_write": self.first_write,
+            "last_write": self.last_write,
+            "flush_start": self.flush_start,
+            "flush_end": self.flush_end,
+            "notify": self.notify,
+            "fields": self.fields,
+            "bytes": self.bytes,
+            "latency": self.latency,
+            "write_seconds": self.write_seconds,
+            "flush_seconds": self.flush_seconds,
+            "other_seconds": self.other_seconds,
+        }
+
+
+class StepTracker:
+    """
+    Track the end-to-end latency of every step written to a `Multio` handle.
+
+    Fields are grouped by a metadata key. A step starts with its first `write_field`
+    and completes at the end of its `flush`, when its timeline is emitted as a JSON line.
+    A flush without the key completes every open step.
+
+    Examples
+    --------
+    ```python
+    tracker = StepTracker("step", output="steps.jsonl")
+    with Multio(observers=[tracker]) as mio:
+        for step in range(0, 241, 6):
+            mio.write_field({"step": step, "param": "2t"}, values)
+            mio.flush({"step": step})
+    ```
+    """
+
+    def __init__(self, key: str = "step", output: str | os.PathLike | IO[str] | None = None):
+        """
+        Create a StepTracker
+
+        Parameters
+        ----------
+        key : str, optional
+            Metadata key identifying a step, defaults to `step`
+        output : str | os.PathLike | IO[str], optional
+            File, or text stream, to append the timeline of each completed step to.
+            Completed timelines are always kept in `timelines`.
+        """
+        self.key = key
+        self.output = output
+        self.open: dict[Any, StepTimeline] = {}
+        self.timelines: list[StepTimeline] = []
+        self._stream: IO[str] | None = None
+        self._lock = threading.Lock()
+
+    def record(self, method: str, metadata: Any, seconds: float, sent: Iterable[tuple[int, bool]] = ()):
+        """Record a call, see `Metrics.record`"""
+        if method not in ("write_field", "flush", "notify"):
+            return
+        now = time.time()
+        step = None if metadata is None else metadata.get(self.key)
+
+        with self._lock:
+            if method == "write_field":
+                if step is None:
+                    return
+                timeline = self.open.get(step)
+                if timeline is None:
+                    timeline = self.open[step] = StepTimeline(step, now - seconds, now)
+                timeline.last_write = now
+                timeline.write_seconds += seconds
+                for nbytes, _ in sent:
+                    timeline.fields += 1
+                    timeline.bytes += nbytes
+
+            elif method == "notify":
+                for timeline in self._matching(step):
+                    timeline.notify = now
+
+            else:
+                for timeline in self._matching(step):
+                    timeline.flush_start = now - seconds
+                    timeline.flush_end = now
+                    del self.open[timeline.step]
+                    self._emit(timeline)
+
+    def _matching(self, step: Any) -> list[StepTimeline]:
+        if step is None:
+            return list(self.open.values())
+        timeline = self.open.get(step)
+        return [] if timeline is None else [timeline]
+
+    def _emit(self, timeline: StepTimeline):
+        self.timelines.append(timeline)
+        if self.output is None:
+            return
+        if self._stream is None:
+            if isinstance(self.output, (str, os.PathLike)):
+                self._stream = open(self.output, "a", buffering=1)
+            else:
+                self._stream = self.output
+        self._stream.write(json.dumps(timeline.to_dict(), default=str, separators=(",", ":")) + "\n")
+
+    def close(self):
+        """Emit the steps never flushed, and close the output file"""
+        with self._lock:
+            for timeline in self.open.values():
+                self._emit(timeline)
+            self.open.clear()
+            if self._stream is not None and self._stream is not self.output:
+                self._stream.close()
+            self._stream = None
+
+
+__all__ = ["Histogram", "MethodMetrics", "Metrics", "PrometheusExporter", "StepTimeline", "StepTracker"]
@@ -1,8 +1,11 @@
 import importlib.util
 import os
+import time
 
+from .audit import CopyAudit
 from .lib import ffi, lib
 from .metadata import Metadata
+from .metrics import Metrics, PrometheusExporter
 
 numpy_spec = importlib.util.find_spec("numpy")
 haveNumpy = numpy_spec is not None
@@ -10,6 +13,73 @@ haveNumpy = numpy_spec is not None
 if haveNumpy:
     import numpy as np
 
+    from .masks import MaskCache, PackedMask
+
+# numpy dtype passed to the library without copy, for each C type
+_DTYPES = {"int": "intc", "float": "float32", "double": "float64"}
+
+
+def _buffer(ctype, data):
+    """
+    Convert data to a C array for the library
+    Parameters:
+        ctype(str): C type of the array elements
+        data(array): Data to convert
+    Returns:
+        the C array, its size in bytes, and why the data was copied, None if it is shared
+    """
+    if not haveNumpy:
+        reason = "numpy not available"
+    elif not isinstance(data, np.ndarray):
+        reason = f"container {type(data).__name__}"
+    elif data.dtype != _DTYPES[ctype]:
+        reason = f"dtype {data.dtype} instead of {np.dtype(_DTYPES[ctype])}"
+    elif not data.flags.c_contiguous:
+        reason = "non-contiguous array"
+    else:
+        return ffi.from_buffer(f"{ctype}*", data), data.nbytes, None
+
+    if haveNumpy and isinstance(data, np.ndarray):
+        # cffi only initialises arrays from lists and tuples
+        data = np.ascontiguousarray(data, dtype=_DTYPES[ctype])
+        return ffi.from_buffer(f"{ctype}*", data), data.nbytes, reason
+    array = ffi.new(f"{ctype}[{len(data)}]", data)
+    return array, ffi.sizeof(array), reason
+
+
+def _bytes_buffer(data):
+    """
+    Convert encoded data to a C buffer for the library
+    Parameters:
+        data(bytes|bytearray|memoryview|array): Data to convert
+    Returns:
+        the C buffer, its size in bytes, and why the data was copied, None if it is shared
+    """
+    try:
+        view = memoryview(data)
+    except TypeError:
+        view = None
+
+    if view is not None and view.c_contiguous:
+        return ffi.from_buffer("void*", data), view.nbytes, None
+    reason = "non-contiguous buffer" if view is not None else f"container {type(data).__name__}"
+    data = bytes(data)
+    return ffi.from_buffer("void*", data), len(data), reason
+
+
+def _bytes_array(data):
+    """
+    View encoded data as an array of bytes, to be spooled
+    Parameters:
+        data(bytes|bytearray|memoryview|array): Data to view
+    Returns:
+        a flat uint8 array, copied only if the data is not contiguous
+    """
+    try:
+        return np.frombuffer(data, dtype=np.uint8)
+    except (BufferError, TypeError, ValueError):
+        return np.frombuffer(bytes(data), dtype=np.uint8)
+
 
 class _Config:
     """This is the main container class for Multio Configs"""
@@ -70,10 +140,36 @@ class Multio:
         parent_comm(array): Set MPI specific initalization parameters for parent comm.
         client_comm(array): Set MPI specific initalization parameters for client comm.
         server_comm(array): Set MPI specific initalization parameters for server comm.
+        precision_policy(PrecisionPolicy): Send matching double precision fields as single precision.
+        compaction(MaskCompaction): Send fields with a written mask as their valid points only.
+        reducer(StreamingStatistics): Send matching fields as statistics over output windows.
+        copy_audit(bool|CopyAudit): Count, and warn about, data copied before being passed to the library.
+                                    Defaults to the mode set by MULTIO_COPY_AUDIT.
+        spool(Spool): Spool fields, flushes and notifications to disk while the servers fall behind.
+        reorder(ReorderBuffer): Hold the fields of a step and send them sorted by metadata keys.
+        lanes(PriorityLanes): Send matching fields as soon as they are written, ahead of the other fields.
+        observers(list): Objects notified after every call, with a
+                         `record(method, metadata, seconds, sent)` method, e.g. a StepTracker.
+                         Observers with a `close` method are closed on exit. Metrics are always recorded.
 
     """
 
-    def __init__(self, config_path=None, allow_world=None, parent_comm=None, client_comm=None, server_comm=None):
+    def __init__(
+        self,
+        config_path=None,
+        allow_world=None,
+        parent_comm=None,
+        client_comm=None,
+        server_comm=None,
+        precision_policy=None,
+        compaction=None,
+        reducer=None,
+        copy_audit=None,
+        spool=None,
+        reorder=None,
+        lanes=None,
+        observers=None,
+    ):
         self.__conf = _Config(
             config_path=config_path,
             allow_world=allow_world,
@@ -93,12 +189,120 @@ class Multio:
         self.__dummy_metadata_flush = Metadata(self, md={})
         self.__dummy_metadata_notification = Metadata(self, md={})
 
+        self._precision_policy = precision_policy
+        self._compaction = compaction
+        self._reducer = reducer
+        if haveNumpy:
+            self.__masks = MaskCache()
+
+        if copy_audit is None:
+            copy_audit = CopyAudit.from_environ()
+        elif copy_audit is True:
+            copy_audit = CopyAudit()
+        self._copy_audit = copy_audit or None
+
+        self._spool = spool
+        if spool is not None:
+            spool.attach(self._replay)
+
+        self._reorder = reorder
+        self._lanes = lanes
+
+        self._metrics = Metrics()
+        self._observers = [self._metrics] + list(observers or [])
+        self._exporters = []
+
     def __enter__(self):
         lib.multio_open_connections(self._handle)
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        lib.multio_close_connections(self._handle)
+        try:
+            self._drain()
+            if haveNumpy and self._reducer is not None:
+                # Statistics of the windows still open, if partial windows are sent
+                for reduced_md, reduced in self._reducer.close():
+                    start = time.perf_counter()
+                    md = Metadata(self, md=reduced_md)
+                    self._observe("write_field", md, start, [self._write_field(md, reduced)])
+        finally:
+            try:
+                if self._spool is not None:
+                    self._spool.close()
+            finally:
+                # Shut down even if the spooled calls failed
+                lib.multio_close_connections(self._handle)
+                for exporter in self._exporters:
+                    exporter.stop()
+                for observer in self._observers:
+                    if hasattr(observer, "close"):
+                        observer.close()
+
+    def _observe(self, method, md, start, sent=()):
+        seconds = time.perf_counter() - start
+        for observer in self._observers:
+            observer.record(method, md, seconds, sent)
+
+    def _timed(self, call, *args):
+        if self._spool is None:
+            return call(*args)
+        start = time.perf_counter()
+        result = call(*args)
+        self._spool.observe(time.perf_counter() - start)
+        return result
+
+    def _drain(self):
+        if self._lanes is not None:
+            self._send_held(self._lanes.drain())
+        if self._reorder is not None:
+            self._send_held(self._reorder.drain())
+
+    def _send_held(self, fields):
+        # Held fields are recorded as they are sent
+        for md, data in fields:
+            self._emit_field(md, data, time.perf_counter())
+
+    def _replay(self, kind, metadata, data):
+        md = Metadata(self, md=metadata)
+        if kind == "write_field":
+            self._send_field(md, data)
+        elif kind == "write_grib":
+            self._send_grib(data)
+        elif kind == "flush":
+            lib.multio_flush(self._handle, md._handle)
+        else:
+            lib.multio_notify(self._handle, md._handle)
+
+    def _convert(self, method, ctype, data):
+        if ctype == "void":
+            array, nbytes, reason = _bytes_buffer(data)
+        else:
+            array, nbytes, reason = _buffer(ctype, data)
+        if reason is not None and self._copy_audit is not None:
+            self._copy_audit.copy(method, reason, nbytes)
+        return array, (nbytes, reason is None)
+
+    def metrics(self):
+        """
+        Counters of the calls made to this handle
+        Returns:
+            dict with the uptime, and the calls, fields, bytes, copies and latencies of each method
+        """
+        return self._metrics.snapshot()
+
+    def export_metrics(self, path=None, port=None, **kwargs):
+        """
+        Export the metrics of this handle in the Prometheus text format, until the handle is closed
+        Parameters:
+            path(str): File to write the metrics to periodically
+            port(int): Local port to serve the metrics on
+            kwargs: Other options of `PrometheusExporter`, e.g. interval and labels
+        Returns:
+            the started PrometheusExporter
+        """
+        exporter = PrometheusExporter(self._metrics, path=path, port=port, **kwargs).start()
+        self._exporters.append(exporter)
+        return exporter
 
     def __version__(self):
         tmp_str = ffi.new("char**")
@@ -120,7 +324,10 @@ class Multio:
             raise TypeError(f"Can not handle type {type(metadata)} as metadata")
 
     def start_server(self):
-        lib.multio_start_server(self.__conf)
+        """
+        Runs a server with the configuration of this handle, blocking until it is shut down
+        """
+        lib.multio_start_server(self.__conf.config_pointer)
 
     def flush(self, metadata=None):
         """
@@ -128,8 +335,12 @@ class Multio:
         Parameters:
             md(dict|Metadata): Either a dict to be converted to Metadata on the fly or an existing Metdata object
         """
+        self._drain()
+        start = time.perf_counter()
         md = self.__check_metadata(metadata, self.__dummy_metadata_flush)
-        lib.multio_flush(self._handle, md._handle)
+        if self._spool is None or self._spool.submit("flush", md) is None:
+            self._timed(lib.multio_flush, self._handle, md._handle)
+        self._observe("flush", md, start)
 
     def notify(self, metadata):
         """
@@ -138,8 +349,12 @@ class Multio:
         Parameters:
             md(dict|Metadata): Either a dict to be converted to Metadata on the fly or an existing Metdata object
         """
+        self._drain()
+        start = time.perf_counter()
         md = self.__check_metadata(metadata, self.__dummy_metadata_notification)
-        lib.multio_notify(self._handle, md._handle)
+        if self._spool is None or self._spool.submit("notify", md) is None:
+            self._timed(lib.multio_notify, self._handle, md._handle)
+        self._observe("notify", md, start)
 
     def write_domain(self, metadata, data):
         """
@@ -148,38 +363,56 @@ class Multio:
             md(dict|Metadata): Either a dict to be converted to Metadata on the fly or an existing Metdata object
             data(array): Data of a single type usable by multio in the form an array
         """
+        self._drain()
+        start = time.perf_counter()
         md = self.__check_metadata(metadata, self.__dummy_metadata_domain)
+        if self._spool is not None:
+            # Fields already spooled must be replayed with the previous domain
+            self._spool.wait()
 
         size = len(data)
         sizeInt = ffi.cast("int", size)
-        if haveNumpy and isinstance(data, np.ndarray) and (data.dtype == np.int_):
-            intArr = ffi.from_buffer("int*", data)
-            lib.multio_write_domain(self._handle, md._handle, intArr, sizeInt)
-        else:
-            intArr = ffi.new(f"int[{size}]", data)
-            lib.multio_write_domain(self._handle, md._handle, intArr, sizeInt)
+        intArr, sent = self._convert("write_domain", "int", data)
+        lib.multio_write_domain(self._handle, md._handle, intArr, sizeInt)
+        self._observe("write_domain", md, start, [sent])
 
     def write_mask(self, metadata, data):
         """
         Writes masking information (e.g. land-sea mask) to the server
         Parameters:
             md(dict|Metadata): Either a dict to be converted to Metadata on the fly or an existing Metdata object
-            data(array): Data of a single type usable by multio in the form an array
+            data(array|PackedMask): Data of a single type usable by multio in the form an array,
+                boolean and uint8 arrays are packed and cached
         """
+        self._drain()
+        start = time.perf_counter()
         md = self.__check_metadata(metadata, self.__dummy_metadata_mask)
+        if self._spool is not None:
+            # Fields already spooled must be replayed with the previous mask
+            self._spool.wait()
+
+        if haveNumpy and (
+            isinstance(data, PackedMask)
+            or (isinstance(data, np.ndarray) and ((data.dtype == np.bool_) or (data.dtype == np.uint8)))
+        ):
+            # Boolean masks are kept packed, one per distinct mask, and only expanded once
+            data = self.__masks.get(data)
+
+        if haveNumpy and self._compaction is not None:
+            self._compaction.register(md, data)
 
         size = len(data)
         sizeInt = ffi.cast("int", size)
-        if haveNumpy and isinstance(data, np.ndarray) and ((data.dtype == np.float32) or (data.dtype == np.float64)):
-            if data.dtype == np.float32:
-                floatArr = ffi.from_buffer("float*", data)
-                lib.multio_write_mask_float(self._handle, md._handle, floatArr, sizeInt)
-            else:
-                doubleArr = ffi.from_buffer("double*", data)
-                lib.multio_write_mask_double(self._handle, md._handle, doubleArr, sizeInt)
+        if haveNumpy and isinstance(data, PackedMask):
+            floatArr, sent = self._convert("write_mask", "float", data.as_float())
+            lib.multio_write_mask_float(self._handle, md._handle, floatArr, sizeInt)
+        elif haveNumpy and isinstance(data, np.ndarray) and (data.dtype == np.float32):
+            floatArr, sent = self._convert("write_mask", "float", data)
+            lib.multio_write_mask_float(self._handle, md._handle, floatArr, sizeInt)
         else:
-            doubleArr = ffi.new(f"double[{size}]", data)
+            doubleArr, sent = self._convert("write_mask", "double", data)
             lib.multio_write_mask_double(self._handle, md._handle, doubleArr, sizeInt)
+        self._observe("write_mask", md, start, [sent])
 
     def write_field(self, metadata, data):
         """
@@ -188,20 +421,57 @@ class Multio:
             md(dict|Metadata): Either a dict to be converted to Metadata on the fly or an existing Metdata object
             data(array): Data of a single type usable by multio in the form an array
         """
+        start = time.perf_counter()
         md = self.__check_metadata(metadata, self.__dummy_metadata_field)
+        if self._lanes is not None and self._lanes.applies(md):
+            self._emit_field(md, data, start)
+            # Bulk fields held for too long are sent after the priority field
+            self._send_held(self._lanes.starved())
+        elif self._reorder is not None:
+            self._send_held(self._reorder.add(md, data))
+        elif self._lanes is not None:
+            self._send_held(self._lanes.add(md, data))
+        else:
+            self._emit_field(md, data, start)
+
+    def _emit_field(self, md, data, start):
+        if haveNumpy and self._reducer is not None and self._reducer.applies(md):
+            sent = [
+                self._write_field(Metadata(self, md=reduced_md), reduced)
+                for reduced_md, reduced in self._reducer.update(md, data)
+            ]
+        else:
+            sent = [self._write_field(md, data)]
+        self._observe("write_field", md, start, sent)
+
+    def _write_field(self, md, data):
+        if self._spool is not None:
+            spooled = self._spool.submit("write_field", md, data)
+            if spooled is not None:
+                return spooled, False
+        return self._timed(self._send_field, md, data)
+
+    def _send_field(self, md, data):
+        if haveNumpy:
+            extra = {}
+            if self._compaction is not None and self._compaction.applies(md, data):
+                data, compacted = self._compaction.compact(md, data)
+                extra.update(compacted)
+            if self._precision_policy is not None and self._precision_policy.applies(md, data):
+                data = self._precision_policy.reduce(data)
+                extra.update(self._precision_policy.metadata)
+            if extra:
+                md = md.copy(extra)
 
         size = len(data)
         sizeInt = ffi.cast("int", size)
-        if haveNumpy and isinstance(data, np.ndarray) and ((data.dtype == np.float32) or (data.dtype == np.float64)):
-            if data.dtype == np.float32:
-                floatArr = ffi.from_buffer("float*", data)
-                lib.multio_write_field_float(self._handle, md._handle, floatArr, sizeInt)
-            else:
-                doubleArr = ffi.from_buffer("double*", data)
-                lib.multio_write_field_double(self._handle, md._handle, doubleArr, sizeInt)
+        if haveNumpy and isinstance(data, np.ndarray) and (data.dtype == np.float32):
+            floatArr, sent = self._convert("write_field", "float", data)
+            lib.multio_write_field_float(self._handle, md._handle, floatArr, sizeInt)
         else:
-            doubleArr = ffi.new(f"double[{size}]", data)
+            doubleArr, sent = self._convert("write_field", "double", data)
             lib.multio_write_field_double(self._handle, md._handle, doubleArr, sizeInt)
+        return sent
 
     def field_accepted(self, metadata):
         """
@@ -211,27 +481,35 @@ class Multio:
         Returns:
             boolean with True if accepted, otherwise False
         """
+        start = time.perf_counter()
         md = self.__check_metadata(metadata)
+        if self._spool is not None:
+            # The handle must not be used while spooled calls are replayed
+            self._spool.wait()
 
         accepted = False
         accept = ffi.new("bool*", accepted)
         lib.multio_field_accepted(self._handle, md._handle, accept)
+        self._observe("field_accepted", md, start)
         return bool(accept[0])
 
     def write_grib(self, data):
-        if type(data) is bytes:
-            size = len(data)
-            sizeInt = ffi.cast("int", size)
-            voidArr = ffi.from_buffer("void*", data)
-            lib.multio_write_grib_encoded(self._handle, voidArr, sizeInt)
-
-        elif haveNumpy and (type(data) is np.ndarray):
-            size = len(data) * np.dtype.itemsize
-            sizeInt = ffi.cast("int", size)
-            voidArr = ffi.from_buffer("void*", data)
-            lib.multio_write_grib_encoded(self._handle, voidArr, sizeInt)
-        else:
-            size = len(data)
-            sizeInt = ffi.cast("int", size)
-            charArr = ffi.new("char*", data)
-            lib.multio_write_grib_encoded(self._handle, ffi.cast("void*", charArr), sizeInt)
+        """
+        Writes already encoded GRIB messages
+        Parameters:
+            data(bytes|bytearray|memoryview|array): Encoded messages, shared without copy if contiguous
+        """
+        start = time.perf_counter()
+        if self._spool is not None:
+            spooled = self._spool.submit("write_grib", None, _bytes_array(data))
+            if spooled is not None:
+                self._observe("write_grib", None, start, [(spooled, False)])
+                return
+        sent = self._timed(self._send_grib, data)
+        self._observe("write_grib", None, start, [sent])
+
+    def _send_grib(self, data):
+        voidArr, sent = self._convert("write_grib", "void", data)
+        sizeInt = ffi.cast("int", sent[0])
+        lib.multio_write_grib_encoded(self._handle, voidArr, sizeInt)
+        return sent
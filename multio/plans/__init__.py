@@ -28,5 +28,9 @@ client = Client(
 
 from . import actions, sinks
 from .actions import Aggregation, Encode, Mask, Print, Select, Sink, Statistics, Transport
+from .builder import PlanBuilder
+from .estimate import Estimate, FieldSpec, estimate
+from .optimise import OptimisationReport, optimise
 from .plans import Client, Collection, Plan, Server
+from .simulate import Simulator, simulate
 from .sinks import FDB, File
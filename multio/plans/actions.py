@@ -13,7 +13,7 @@ Defined as Pydantic models for type validation.
 
 from __future__ import annotations
 
-from typing import Any, Literal, Union
+from typing import Any, Literal, Mapping, Union
 
 from pydantic import BaseModel, Field, ValidationInfo, field_validator, validate_call
 from typing_extensions import Annotated
@@ -22,6 +22,31 @@ from .sinks import SINKS
 
 SinksType = Annotated[SINKS, Field(discriminator="type", title="Sinks")]
 
+FREQUENCY_UNITS = {"s": 1, "h": 3600, "d": 86400, "w": 7 * 86400, "m": 30 * 86400}
+
+
+def frequency_to_seconds(frequency: str) -> int:
+    """
+    Convert a frequency such as `5h`, `10d` or `1w` to seconds
+
+    Units are `s`, `h`, `d`, `w` and `m`, months being taken as 30 days.
+
+    Parameters
+    ----------
+    frequency : str
+        Frequency to convert
+
+    Returns
+    -------
+    int
+        Length in seconds
+    """
+    frequency = frequency.strip()
+    try:
+        return int(frequency[:-1]) * FREQUENCY_UNITS[frequency[-1]]
+    except (KeyError, ValueError, IndexError) as e:
+        raise ValueError(f"Invalid frequency {frequency!r}") from e
+
 
 class Action(BaseModel):
     """Base Action class.
@@ -43,6 +68,37 @@ class Select(Action):
     type: Literal["select"] = Field("select", init=False)
     match: list[dict[str, Any]] = Field(description="List of dictionaries to match against")
 
+    def matches(self, metadata: Mapping[str, Any]) -> bool:
+        """
+        Check if metadata is selected by this action
+
+        A field is selected if any of the `match` dictionaries matches,
+        with a list value matching any of its entries.
+
+        Parameters
+        ----------
+        metadata : Mapping[str, Any]
+            Metadata of the field, a dict or `multio.Metadata`
+
+        Returns
+        -------
+        bool
+            True if selected
+        """
+        for match in self.match:
+            for key, value in match.items():
+                if key not in metadata:
+                    break
+                found = metadata[key]
+                if isinstance(value, (list, tuple)):
+                    if found not in value:
+                        break
+                elif found != value:
+                    break
+            else:
+                return True
+        return False
+
 
 class Statistics(Action):
     """Statistics Action.
@@ -54,6 +110,11 @@ class Statistics(Action):
     operations: list[Literal["average", "minimum", "maximum", "accumulate", "instant"]]
     output_frequency: str = Field(serialization_alias="output-frequency", examples=["5h", "10d", "1w"])
 
+    @property
+    def output_seconds(self) -> int:
+        """Length of the output window in seconds"""
+        return frequency_to_seconds(self.output_frequency)
+
 
 class Transport(Action):
     """Transport Action"""
@@ -0,0 +1,135 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Multio Plan Builder
+
+Builds large configs without validating every plan and action as it is added.
+"""
+
+from __future__ import annotations
+
+import gc
+from typing import Any, Iterable, Mapping
+
+from .actions import Action
+from .plans import BaseConfig, Client, Plan
+
+
+class PlanBuilder:
+    """
+    Bulk builder for `Client` and `Server` configs.
+
+    Plans are collected as plain data and validated in a single pass by `build`,
+    rather than on every call as with `add_plan` and `add_action`.
+
+    Examples:
+    ```python
+        builder = PlanBuilder()
+        for param in params:
+            builder.add_plan(
+                f"plan-{param}",
+                [
+                    {"type": "select", "match": [{"param": param}]},
+                    {"type": "sink", "sinks": [{"type": "file", "path": f"{param}.grib", "append": False}]},
+                ],
+            )
+        config = builder.build()
+    ```
+    """
+
+    def __init__(self, config: type[BaseConfig] = Client):
+        """
+        Create a PlanBuilder
+
+        Parameters
+        ----------
+        config : type[BaseConfig], optional
+            Config class to build, defaults to `Client`
+        """
+        self._config = config
+        self._plans: list[dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def add_plan(self, name: str, actions: Iterable[Action | Mapping[str, Any]]) -> "PlanBuilder":
+        """
+        Add a plan, without validation
+
+        Parameters
+        ----------
+        name : str
+            Name of the plan
+        actions : Iterable[Action | Mapping[str, Any]]
+            Actions of the plan, objects or dictionaries representing actions
+
+        Returns
+        -------
+        PlanBuilder
+            This builder
+        """
+        self._plans.append({"name": name, "actions": list(actions)})
+        return self
+
+    def add_rows(self, rows: Iterable[Mapping[str, Any]]) -> "PlanBuilder":
+        """
+        Add plans given as dictionaries with `name` and `actions`, without validation
+
+        Parameters
+        ----------
+        rows : Iterable[Mapping[str, Any]]
+            Plans to add
+
+        Returns
+        -------
+        PlanBuilder
+            This builder
+        """
+        for row in rows:
+            self.add_plan(row["name"], row.get("actions", []))
+        return self
+
+    def build(self, *, validate: bool = True, **kwargs: Any) -> BaseConfig:
+        """
+        Build the config
+
+        Parameters
+        ----------
+        validate : bool, optional
+            Validate all plans in a single pass, defaults to True.
+            If False, the config is built with `model_construct` and
+            every action must already be an `Action` object.
+        kwargs : Any
+            Other fields of the config, e.g. `transport` for a `Server`
+
+        Returns
+        -------
+        BaseConfig
+            Config holding the plans
+        """
+        # Building many small objects at once triggers repeated garbage collections
+        # of a graph that is all still alive, so pause collection while building.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            if validate:
+                return self._config.model_validate({"plans": self._plans, **kwargs})
+
+            plans = []
+            for plan in self._plans:
+                for action in plan["actions"]:
+                    if not isinstance(action, Action):
+                        raise TypeError(f"Can not construct plan {plan['name']!r} without validation from {action!r}")
+                plans.append(Plan.model_construct(name=plan["name"], actions=plan["actions"]))
+            return self._config.model_construct(plans=plans, **kwargs)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+
+__all__ = ["PlanBuilder"]
@@ -0,0 +1,246 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Multio Plan Estimates
+
+Static estimates of the server memory and output volume of plans,
+given the fields expected to be written to them.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Mapping, Union
+
+from .actions import (
+    Aggregation,
+    Encode,
+    Interpolate,
+    Select,
+    SingleField,
+    Sink,
+    Statistics,
+    Transport,
+    frequency_to_seconds,
+)
+
+# Values are held on the server in double precision
+SERVER_VALUE_BYTES = 8
+DEFAULT_BITS_PER_VALUE = 16
+
+
+@dataclass
+class FieldSpec:
+    """
+    A field expected to be written.
+
+    One field is written per level every `frequency`.
+    """
+
+    metadata: dict[str, Any]
+    points: int
+    levels: list[Any] = field(default_factory=lambda: [None])
+    frequency: str = "1h"
+    value_bytes: int = SERVER_VALUE_BYTES
+
+    def expand(self) -> list[dict[str, Any]]:
+        """Metadata of each level of the field"""
+        if self.levels == [None]:
+            return [dict(self.metadata)]
+        return [{**self.metadata, "level": level} for level in self.levels]
+
+
+FieldCatalogue = Iterable[Union[FieldSpec, Mapping[str, Any]]]
+
+
+@dataclass
+class _Stream:
+    """Fields flowing through a plan"""
+
+    metadata: dict[str, Any]
+    points: int
+    per_step: float
+    value_bytes: float
+
+    @property
+    def bytes_per_step(self) -> float:
+        return self.per_step * self.points * self.value_bytes
+
+
+@dataclass
+class ActionEstimate:
+    """Estimate for a single action of a plan"""
+
+    plan: str
+    index: int
+    type: str
+    fields_per_step: float
+    buffered_fields: int = 0
+    held_bytes: int = 0
+
+
+@dataclass
+class Estimate:
+    """
+    Estimate for a plan or config.
+
+    Attributes
+    ----------
+    actions : list[ActionEstimate]
+        Estimate for every action
+    sinks : dict[str, float]
+        Bytes written per step to each sink, and sent per step by each transport
+    """
+
+    actions: list[ActionEstimate] = field(default_factory=list)
+    sinks: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def buffered_fields(self) -> int:
+        """Number of fields held in server memory"""
+        return sum(action.buffered_fields for action in self.actions)
+
+    @property
+    def peak_bytes(self) -> int:
+        """Peak bytes held in server memory"""
+        return sum(action.held_bytes for action in self.actions)
+
+    def __add__(self, other: "Estimate") -> "Estimate":
+        if not isinstance(other, Estimate):
+            return NotImplemented
+        sinks = dict(self.sinks)
+        for name, written in other.sinks.items():
+            sinks[name] = sinks.get(name, 0.0) + written
+        return Estimate(actions=self.actions + other.actions, sinks=sinks)
+
+
+def _field_specs(catalogue: FieldCatalogue) -> list[FieldSpec]:
+    return [spec if isinstance(spec, FieldSpec) else FieldSpec(**spec) for spec in catalogue]
+
+
+def _sink_name(sink) -> str:
+    path = getattr(sink, "path", None)
+    return sink.type if path is None else f"{sink.type}:{path}"
+
+
+def estimate_plan(plan, catalogue: FieldCatalogue, step: str = "1h") -> Estimate:
+    """
+    Estimate the server memory and output volume of a plan
+
+    Parameters
+    ----------
+    plan : Plan
+        Plan to estimate
+    catalogue : FieldCatalogue
+        Fields expected to be written, `FieldSpec` or dictionaries of its arguments
+    step : str, optional
+        Step to report output volumes per, defaults to `1h`
+
+    Returns
+    -------
+    Estimate
+        Estimate of the plan
+    """
+    step_seconds = frequency_to_seconds(step)
+    streams = [
+        _Stream(metadata, spec.points, step_seconds / frequency_to_seconds(spec.frequency), spec.value_bytes)
+        for spec in _field_specs(catalogue)
+        for metadata in spec.expand()
+    ]
+
+    result = Estimate()
+    for index, action in enumerate(plan.actions):
+        action_estimate = ActionEstimate(plan.name, index, action.type, sum(stream.per_step for stream in streams))
+
+        if isinstance(action, Select):
+            streams = [stream for stream in streams if action.matches(stream.metadata)]
+        elif isinstance(action, Statistics):
+            # One running buffer per field and operation, emitted once per output window
+            action_estimate.buffered_fields = len(streams) * len(action.operations)
+            action_estimate.held_bytes = sum(stream.points * SERVER_VALUE_BYTES for stream in streams) * len(
+                action.operations
+            )
+            per_step = step_seconds / action.output_seconds
+            streams = [
+                _Stream(
+                    {**stream.metadata, "operation": operation},
+                    stream.points,
+                    min(per_step, stream.per_step),
+                    SERVER_VALUE_BYTES,
+                )
+                for stream in streams
+                for operation in action.operations
+            ]
+        elif isinstance(action, Aggregation):
+            # Partial fields are held until every part of the global field has arrived
+            action_estimate.buffered_fields = len(streams)
+            action_estimate.held_bytes = sum(stream.points * SERVER_VALUE_BYTES for stream in streams)
+        elif isinstance(action, Interpolate):
+            # Input and output of the field being interpolated
+            action_estimate.buffered_fields = 2 if streams else 0
+            action_estimate.held_bytes = 2 * max((stream.points * SERVER_VALUE_BYTES for stream in streams), default=0)
+        elif isinstance(action, Encode):
+            if action.format == "grib":
+                bits = action.additional_metadata.get("bitsPerValue", DEFAULT_BITS_PER_VALUE)
+                for stream in streams:
+                    stream.value_bytes = stream.metadata.get("bitsPerValue", bits) / 8
+        elif isinstance(action, Sink):
+            for sink in action.sinks:
+                name = _sink_name(sink)
+                result.sinks[name] = result.sinks.get(name, 0.0) + sum(stream.bytes_per_step for stream in streams)
+        elif isinstance(action, Transport):
+            name = f"transport:{action.target}"
+            result.sinks[name] = result.sinks.get(name, 0.0) + sum(stream.bytes_per_step for stream in streams)
+        elif isinstance(action, SingleField):
+            result.sinks[action.type] = result.sinks.get(action.type, 0.0) + sum(
+                stream.bytes_per_step for stream in streams
+            )
+
+        result.actions.append(action_estimate)
+    return result
+
+
+def estimate(config, catalogue: FieldCatalogue, step: str = "1h") -> Estimate | dict[str, Estimate]:
+    """
+    Estimate the server memory and output volume of a plan or config
+
+    Parameters
+    ----------
+    config : Plan | BaseConfig | Collection
+        Plan or config to estimate
+    catalogue : FieldCatalogue
+        Fields expected to be written, `FieldSpec` or dictionaries of its arguments
+    step : str, optional
+        Step to report output volumes per, defaults to `1h`
+
+    Returns
+    -------
+    Estimate | dict[str, Estimate]
+        Estimate of all plans, or of each config of a `Collection`
+
+    Examples
+    --------
+    ```python
+    catalogue = [
+        FieldSpec({"param": "2t", "levtype": "sfc"}, points=6_599_680),
+        FieldSpec({"param": "t", "levtype": "ml"}, points=6_599_680, levels=list(range(1, 138))),
+    ]
+    result = config.estimate(catalogue, step="1h")
+    print(result.peak_bytes, result.sinks)
+    ```
+    """
+    catalogue = _field_specs(catalogue)
+
+    if hasattr(config, "configs"):
+        return {name: estimate(sub_config, catalogue, step) for name, sub_config in config.configs.items()}
+    if hasattr(config, "plans"):
+        return sum((estimate_plan(plan, catalogue, step) for plan in config.plans), Estimate())
+    return estimate_plan(config, catalogue, step)
+
+
+__all__ = ["ActionEstimate", "Estimate", "FieldSpec", "estimate", "estimate_plan"]
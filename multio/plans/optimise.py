@@ -0,0 +1,218 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Multio Plan Optimiser
+
+Rewrites configs into equivalent ones with fewer actions for the server to run.
+
+Plans are linear, so only plans which differ in a single `Select` can be fused,
+the union of their matches replacing it. A field selected by several of the
+original plans then goes through the fused plan once, rather than once per plan.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+from .actions import Select, Sink
+from .plans import BaseConfig, Plan
+
+T = TypeVar("T", bound=BaseConfig)
+
+
+@dataclass
+class OptimisationReport:
+    """What was changed by `optimise`"""
+
+    fused_plans: list[list[str]] = field(default_factory=list)
+    merged_matches: int = 0
+    removed_sinks: int = 0
+    actions_before: int = 0
+    actions_after: int = 0
+
+    def __str__(self) -> str:
+        lines = [f"Actions: {self.actions_before} -> {self.actions_after}"]
+        lines.extend(f"Fused plans: {', '.join(names)}" for names in self.fused_plans)
+        lines.append(f"Merged match entries: {self.merged_matches}")
+        lines.append(f"Removed duplicate sinks: {self.removed_sinks}")
+        return "\n".join(lines)
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+def _action_key(action) -> str:
+    return _canonical(action.model_dump(serialize_as_any=True, by_alias=True))
+
+
+def _values(value: Any) -> dict[str, Any]:
+    """Values accepted by a match entry, keyed on their canonical form"""
+    values = value if isinstance(value, (list, tuple)) else [value]
+    return {_canonical(v): v for v in values}
+
+
+def _from_values(values: dict[str, Any]) -> Any:
+    values = list(values.values())
+    return values[0] if len(values) == 1 else values
+
+
+def _entry_key(entry: dict[str, dict]) -> str:
+    return _canonical(sorted((key, sorted(values)) for key, values in entry.items()))
+
+
+def _subsumes(general: dict[str, dict], specific: dict[str, dict]) -> bool:
+    return all(key in specific and specific[key].keys() <= values.keys() for key, values in general.items())
+
+
+def merge_matches(match: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    Merge the entries of a `Select.match` list
+
+    Removes duplicate entries and entries covered by a more general one,
+    and combines entries differing in the values of a single key.
+
+    Parameters
+    ----------
+    match : list[dict[str, Any]]
+        Match entries, any of which selects a field
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        Equivalent match entries
+    """
+    entries = {}
+    for entry in match:
+        normalised = {key: _values(value) for key, value in entry.items()}
+        entries.setdefault(_entry_key(normalised), normalised)
+    entries = list(entries.values())
+
+    # Combine entries sharing everything but one key, until nothing changes
+    changed = True
+    while changed and len(entries) > 1:
+        changed = False
+        for key in sorted({key for entry in entries for key in entry}):
+            merged, groups = [], {}
+            for entry in entries:
+                if key not in entry:
+                    merged.append(entry)
+                    continue
+                rest = _entry_key({k: v for k, v in entry.items() if k != key})
+                if rest in groups:
+                    groups[rest][key].update(entry[key])
+                    changed = True
+                else:
+                    groups[rest] = entry
+                    merged.append(entry)
+            entries = merged
+
+    entries = [
+        entry
+        for i, entry in enumerate(entries)
+        if not any(j != i and _subsumes(other, entry) for j, other in enumerate(entries))
+    ]
+    return [{key: _from_values(values) for key, values in entry.items()} for entry in entries]
+
+
+def _optimise_actions(plan: Plan, report: OptimisationReport) -> list:
+    actions = []
+    for action in plan.actions:
+        if isinstance(action, Select):
+            match = merge_matches(action.match)
+            report.merged_matches += len(action.match) - len(match)
+            action = action.model_copy(update={"match": match})
+        elif isinstance(action, Sink):
+            sinks = {}
+            for sink in action.sinks:
+                sinks.setdefault(_action_key(sink), sink)
+            report.removed_sinks += len(action.sinks) - len(sinks)
+            action = action.model_copy(update={"sinks": list(sinks.values())})
+        actions.append(action)
+    return actions
+
+
+def _shape(actions: list) -> tuple[str, ...]:
+    return tuple("select" if isinstance(action, Select) else _action_key(action) for action in actions)
+
+
+class _FusedPlan:
+    """Plans of the same shape fused together, differing only in the `Select` at `position`"""
+
+    def __init__(self, plan: Plan, actions: list):
+        self.names = [plan.name]
+        self.actions = actions
+        self.selects = {i: _action_key(action) for i, action in enumerate(actions) if isinstance(action, Select)}
+        self.position = None
+        self.matches = []
+
+    def fuse(self, plan: Plan, actions: list) -> bool:
+        differing = [i for i, key in self.selects.items() if _action_key(actions[i]) != key]
+        if self.position is not None:
+            differing = [i for i in differing if i != self.position]
+            if differing:
+                return False
+        elif len(differing) > 1:
+            return False
+        elif differing:
+            self.position = differing[0]
+
+        if self.position is not None:
+            self.matches.extend(actions[self.position].match)
+        self.names.append(plan.name)
+        return True
+
+    def plan(self, report: OptimisationReport) -> Plan:
+        actions = list(self.actions)
+        if self.position is not None:
+            select = actions[self.position]
+            match = merge_matches(select.match + self.matches)
+            report.merged_matches += len(select.match) + len(self.matches) - len(match)
+            actions[self.position] = select.model_copy(update={"match": match})
+        return Plan(name=self.names[0], actions=actions)
+
+
+def optimise(config: T) -> tuple[T, OptimisationReport]:
+    """
+    Optimise the plans of a config
+
+    - merges the match entries of every `Select`
+    - removes duplicate sinks from every `Sink`
+    - fuses plans which are identical but for a single `Select`
+
+    Parameters
+    ----------
+    config : BaseConfig
+        `Client` or `Server` config to optimise, left unchanged
+
+    Returns
+    -------
+    tuple[BaseConfig, OptimisationReport]
+        Equivalent config, and a report of what was changed
+    """
+    report = OptimisationReport(actions_before=sum(len(plan.actions) for plan in config.plans))
+
+    fused: list[_FusedPlan] = []
+    shapes: dict[tuple[str, ...], list[_FusedPlan]] = {}
+    for plan in config.plans:
+        actions = _optimise_actions(plan, report)
+        candidates = shapes.setdefault(_shape(actions), [])
+        if not any(candidate.fuse(plan, actions) for candidate in candidates):
+            candidates.append(_FusedPlan(plan, actions))
+            fused.append(candidates[-1])
+
+    plans = [plan.plan(report) for plan in fused]
+    report.fused_plans = [plan.names for plan in fused if len(plan.names) > 1]
+    report.actions_after = sum(len(plan.actions) for plan in plans)
+
+    return config.model_copy(update={"plans": plans}), report
+
+
+__all__ = ["OptimisationReport", "merge_matches", "optimise"]
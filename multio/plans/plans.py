@@ -14,7 +14,7 @@ Holds a collection of actions for use with Multio.
 from __future__ import annotations
 
 import os
-from typing import Any, Literal, Optional, TypeVar, Union
+from typing import Any, Iterable, Literal, Optional, TypeVar, Union
 
 from pydantic import BaseModel, ConfigDict, Discriminator, Field, Tag, model_serializer, model_validator, validate_call
 from typing_extensions import Annotated
@@ -52,7 +52,8 @@ class MultioBaseModel(BaseModel):
         MultioBaseModel
             Loaded BaseModel
         """
-        return cls.from_yaml(open(file))
+        with open(file) as f:
+            return cls.from_yaml(f)
 
     @classmethod
     def from_yaml(cls: T, yaml_str: str) -> T:
@@ -119,6 +120,26 @@ class MultioBaseModel(BaseModel):
 
         return yaml.safe_dump(self.dump(), sort_keys=False)
 
+    def estimate(self, catalogue: Iterable[Any], step: str = "1h") -> Any:
+        """
+        Estimate the server memory and output volume of the model
+
+        Parameters
+        ----------
+        catalogue : Iterable[FieldSpec | dict]
+            Fields expected to be written
+        step : str, optional
+            Step to report output volumes per, defaults to `1h`
+
+        Returns
+        -------
+        Estimate | dict[str, Estimate]
+            Estimate of all plans, or of each config of a `Collection`, see `estimate`
+        """
+        from .estimate import estimate
+
+        return estimate(self, catalogue, step)
+
 
 class Plan(MultioBaseModel):
     """
@@ -258,6 +279,44 @@ class BaseConfig(MultioBaseModel):
     def extend_plans(self, plans: list[Plan]):
         self.plans.extend(plans)
 
+    @classmethod
+    def build_from_rows(cls: T, rows: Iterable[dict[str, Any]], *, validate: bool = True, **kwargs: Any) -> T:
+        """
+        Build a config from many plans at once
+
+        Validates all plans in a single pass, see `PlanBuilder`.
+
+        Parameters
+        ----------
+        rows : Iterable[dict[str, Any]]
+            Plans, as dictionaries with `name` and `actions`
+        validate : bool, optional
+            Validate the plans, if False every action must already be an `Action` object
+        kwargs : Any
+            Other fields of the config
+
+        Returns
+        -------
+        BaseConfig
+            Config holding the plans
+        """
+        from .builder import PlanBuilder
+
+        return PlanBuilder(cls).add_rows(rows).build(validate=validate, **kwargs)
+
+    def optimise(self: T) -> tuple[T, Any]:
+        """
+        Optimise the plans of this config
+
+        Returns
+        -------
+        tuple[BaseConfig, OptimisationReport]
+            Equivalent config with fewer actions, and a report of what was changed, see `optimise`
+        """
+        from .optimise import optimise
+
+        return optimise(self)
+
 
 class Client(BaseConfig):
     """Client Specific Config"""
@@ -0,0 +1,537 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Multio Plan Simulator
+
+Pure python reference executor for plans, running on streams of
+(metadata, array) pairs without a multio server.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Mapping
+
+import numpy as np
+
+from ..aggregate import GlobalAssembler
+from .actions import (
+    FREQUENCY_UNITS,
+    Aggregation,
+    Encode,
+    Interpolate,
+    Mask,
+    Print,
+    Select,
+    SingleField,
+    Sink,
+    Statistics,
+    Transport,
+)
+from .sinks import File
+
+Field = tuple[dict[str, Any], np.ndarray]
+
+
+class StatisticsWindow:
+    """
+    Running statistics of a field over consecutive output windows.
+
+    Uses the vocabulary of `Statistics`, and keeps one preallocated buffer per operation.
+    """
+
+    def __init__(self, operations: Iterable[str], output_seconds: int, copy: bool = True):
+        """
+        Create a StatisticsWindow
+
+        Parameters
+        ----------
+        operations : Iterable[str]
+            Operations to compute, any of average, minimum, maximum, accumulate and instant
+        output_seconds : int
+            Length of each window in seconds
+        copy : bool, optional
+            Return copies of the statistics, if False the buffers themselves are returned
+            and are only valid until the next call to `add`
+        """
+        self.operations = list(operations)
+        self.output_seconds = output_seconds
+        self.copy = copy
+        self.count = 0
+        self.end = None
+        self._buffers: dict[str, np.ndarray] = {}
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held in the buffers"""
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+    def _window_end(self, seconds: float) -> int:
+        windows = max(int(np.ceil(seconds / self.output_seconds)), 1)
+        return windows * self.output_seconds
+
+    def _update(self, values: np.ndarray) -> None:
+        if not self._buffers:
+            for operation in self.operations:
+                self._buffers[operation] = np.empty(values.shape, dtype=np.float64)
+        first = self.count == 0
+        for operation, buffer in self._buffers.items():
+            if first or operation == "instant":
+                np.copyto(buffer, values)
+            elif operation in ("average", "accumulate"):
+                np.add(buffer, values, out=buffer)
+            elif operation == "minimum":
+                np.minimum(buffer, values, out=buffer)
+            elif operation == "maximum":
+                np.maximum(buffer, values, out=buffer)
+            else:
+                raise ValueError(f"Unknown statistics operation {operation!r}")
+        self.count += 1
+
+    def result(self, copy: bool | None = None) -> dict[str, np.ndarray]:
+        """
+        Statistics of the current window, and start a new one
+
+        Parameters
+        ----------
+        copy : bool, optional
+            Return copies of the buffers, defaults to the `copy` of the window
+
+        Returns
+        -------
+        dict[str, np.ndarray]
+            Values of each operation
+        """
+        copy = self.copy if copy is None else copy
+        results = {}
+        for operation, buffer in self._buffers.items():
+            if operation == "average":
+                results[operation] = np.divide(buffer, self.count, out=None if copy else buffer)
+            else:
+                results[operation] = buffer.copy() if copy else buffer
+        self.count = 0
+        self.end = None
+        return results
+
+    def add(self, seconds: float, values: Any) -> list[tuple[int, dict[str, np.ndarray]]]:
+        """
+        Add values of the field at a time
+
+        Parameters
+        ----------
+        seconds : float
+            Time of the values
+        values : Any
+            Field values
+
+        Returns
+        -------
+        list[tuple[int, dict[str, np.ndarray]]]
+            End time and statistics of each window closed by these values
+        """
+        closed = []
+        end = self._window_end(seconds)
+        if self.end is not None and end > self.end and self.count:
+            # The buffers are reused for these values, so this window is always copied
+            closed.append((self.end, self.result(copy=True)))
+
+        self.end = end
+        self._update(np.asarray(values))
+        if seconds >= end:
+            closed.append((end, self.result()))
+        return closed
+
+
+@dataclass
+class ActionReport:
+    """Counters of a simulated action"""
+
+    plan: str
+    index: int
+    type: str
+    fields_in: int = 0
+    fields_out: int = 0
+    bytes_in: int = 0
+    seconds: float = 0.0
+    peak_bytes: int = 0
+
+    @property
+    def throughput(self) -> float:
+        """Bytes processed per second"""
+        return self.bytes_in / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class SimulationReport:
+    """Counters of every simulated action"""
+
+    actions: list[ActionReport] = field(default_factory=list)
+
+    @property
+    def peak_bytes(self) -> int:
+        """Peak bytes held, summed over all actions"""
+        return sum(action.peak_bytes for action in self.actions)
+
+    def __str__(self) -> str:
+        lines = [f"{'plan':<20} {'action':<12} {'in':>8} {'out':>8} {'MB/s':>10} {'peak MB':>10}"]
+        for action in self.actions:
+            lines.append(
+                f"{action.plan:<20} {action.type:<12} {action.fields_in:>8} {action.fields_out:>8} "
+                f"{action.throughput / 1e6:>10.1f} {action.peak_bytes / 1e6:>10.3f}"
+            )
+        return "\n".join(lines)
+
+
+class _Executor:
+    nbytes = 0
+
+    def __init__(self, action, simulator: "Simulator"):
+        self.action = action
+        self.simulator = simulator
+
+    def process(self, metadata: dict[str, Any], values: np.ndarray) -> list[Field]:
+        return [(metadata, values)]
+
+    def close(self) -> None:
+        pass
+
+
+class _Select(_Executor):
+    def process(self, metadata, values):
+        return [(metadata, values)] if self.action.matches(metadata) else []
+
+
+class _Print(_Executor):
+    def process(self, metadata, values):
+        stream = sys.stderr if self.action.stream == "error" else sys.stdout
+        print(f"{self.action.prefix}{metadata}", file=stream)
+        return [(metadata, values)]
+
+
+class _Statistics(_Executor):
+    def __init__(self, action, simulator):
+        super().__init__(action, simulator)
+        self.windows: dict[tuple, StatisticsWindow] = {}
+        # Running total of the buffers of every window, read after every field
+        self.nbytes = 0
+
+    def process(self, metadata, values):
+        key = _field_key(metadata, self.simulator.step_key)
+        window = self.windows.get(key)
+        if window is None:
+            window = self.windows[key] = StatisticsWindow(self.action.operations, self.action.output_seconds)
+
+        outputs = []
+        held = window.nbytes
+        closed = window.add(self.simulator.seconds(metadata), values)
+        self.nbytes += window.nbytes - held
+        for end, results in closed:
+            step = end / self.simulator.step_seconds
+            step = int(step) if step.is_integer() else step
+            for operation, result in results.items():
+                outputs.append(({**metadata, self.simulator.step_key: step, "operation": operation}, result))
+        return outputs
+
+
+class _Mask(_Executor):
+    def process(self, metadata, values):
+        mask = self.simulator.masks.get(_mask_key(metadata, self.simulator.mask_keys))
+        if mask is None:
+            return [(metadata, values)]
+
+        missing_value = self.action.missing_value
+        if missing_value is None:
+            missing_value = metadata.get("missingValue", np.nan)
+
+        if metadata.get("compacted") == "mask":
+            # Rebuild fields sent as their valid points only
+            expanded = np.full(mask.shape, missing_value, dtype=values.dtype)
+            expanded[mask] = values
+            metadata = {k: v for k, v in metadata.items() if k not in ("compacted", "compactedSize")}
+            return [(metadata, expanded)]
+        if not self.action.apply_bitmap:
+            return [(metadata, values)]
+
+        masked = np.array(values, dtype=np.float64)
+        masked[~mask] = missing_value
+        return [({**metadata, "bitmapPresent": True, "missingValue": missing_value}, masked)]
+
+
+class _Aggregation(_Executor):
+    def __init__(self, action, simulator):
+        super().__init__(action, simulator)
+        self.pending: dict[tuple, dict[Any, np.ndarray]] = {}
+        # Running total of the parts pending, read after every field
+        self.nbytes = 0
+
+    def process(self, metadata, values):
+        assembler = self.simulator.assembler(metadata.get("domain"), metadata.get("globalSize"))
+
+        partition_key = self.simulator.partition_key
+        key = _field_key(metadata, partition_key)
+        parts = self.pending.setdefault(key, {})
+        values = np.asarray(values)
+        replaced = parts.get(metadata.get(partition_key))
+        self.nbytes += values.nbytes - (0 if replaced is None else replaced.nbytes)
+        parts[metadata.get(partition_key)] = values
+        if len(parts) < len(assembler):
+            return []
+
+        del self.pending[key]
+        self.nbytes -= sum(part.nbytes for part in parts.values())
+        result = assembler.assemble(parts)
+
+        metadata = {k: v for k, v in metadata.items() if k != partition_key}
+        return [(metadata, result)]
+
+
+class _Sink(_Executor):
+    def __init__(self, action, simulator):
+        super().__init__(action, simulator)
+        self.files = {}
+        for sink in getattr(action, "sinks", []):
+            if isinstance(sink, File):
+                self.files[sink.path] = open(sink.path, "ab" if sink.append else "wb")
+
+    def process(self, metadata, values):
+        for f in self.files.values():
+            f.write(np.ascontiguousarray(values).tobytes())
+        return []
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+
+EXECUTORS = {
+    Select: _Select,
+    Print: _Print,
+    Statistics: _Statistics,
+    Mask: _Mask,
+    Aggregation: _Aggregation,
+    Encode: _Executor,
+    Sink: _Sink,
+    Transport: _Sink,
+    SingleField: _Sink,
+}
+
+
+def _field_key(metadata: Mapping[str, Any], *exclude: str) -> tuple:
+    return tuple(sorted((k, v) for k, v in metadata.items() if k not in exclude))
+
+
+def _mask_key(metadata: Mapping[str, Any], keys: tuple[str, ...]) -> tuple:
+    return tuple(metadata.get(key) for key in keys)
+
+
+class Simulator:
+    """
+    Reference executor for plans.
+
+    Runs `Select`, `Statistics`, `Mask`, `Aggregation`, `Print` and raw `File` sinks
+    on (metadata, array) pairs, counting throughput and memory held by each action.
+    `Encode` passes values through unchanged, so `File` sinks always hold raw values,
+    and other sinks and `Transport` only count what reaches them.
+    `Mask` does not apply `offset_value`.
+
+    Examples
+    --------
+    ```python
+    with Simulator(config) as simulator:
+        simulator.write_mask({"domain": "ocean"}, lsm)
+        report = simulator.run(fields)
+    print(report)
+    ```
+    """
+
+    def __init__(
+        self,
+        config,
+        *,
+        step_key: str = "step",
+        step_unit: str = "h",
+        mask_keys: Iterable[str] = ("domain",),
+        partition_key: str = "partition",
+    ):
+        """
+        Create a Simulator
+
+        Parameters
+        ----------
+        config : Plan | BaseConfig
+            Plan, or config of plans, to run
+        step_key : str, optional
+            Metadata key of the time of a field, defaults to `step`
+        step_unit : str, optional
+            Unit of `step_key`, as used in output frequencies, defaults to `h`
+        mask_keys : Iterable[str], optional
+            Metadata keys pairing fields with masks, defaults to `("domain",)`
+        partition_key : str, optional
+            Metadata key of the partition a part of a field comes from, defaults to `partition`
+        """
+        plans = config.plans if hasattr(config, "plans") else [config]
+
+        self.step_key = step_key
+        self.step_seconds = FREQUENCY_UNITS[step_unit]
+        self.mask_keys = tuple(mask_keys)
+        self.partition_key = partition_key
+        self.masks: dict[tuple, np.ndarray] = {}
+        self.domains: dict[Any, dict[Any, np.ndarray]] = {}
+        self._assemblers: dict[Any, GlobalAssembler] = {}
+
+        self._plans = []
+        self.report = SimulationReport()
+        for plan in plans:
+            executors = []
+            for index, action in enumerate(plan.actions):
+                if isinstance(action, Interpolate) or type(action) not in EXECUTORS:
+                    raise ValueError(f"Simulating {action.type!r} actions is not supported")
+                executors.append((EXECUTORS[type(action)](action, self), ActionReport(plan.name, index, action.type)))
+            self.report.actions.extend(report for _, report in executors)
+            self._plans.append(executors)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        """Close the files of all sinks"""
+        for executors in self._plans:
+            for executor, _ in executors:
+                executor.close()
+
+    def seconds(self, metadata: Mapping[str, Any]) -> float:
+        """Time of a field in seconds"""
+        return float(metadata.get(self.step_key, 0)) * self.step_seconds
+
+    def write_mask(self, metadata: Mapping[str, Any], data: Any) -> None:
+        """
+        Add a mask, non-zero where points are valid
+
+        Parameters
+        ----------
+        metadata : Mapping[str, Any]
+            Metadata of the mask
+        data : Any
+            Mask values
+        """
+        self.masks[_mask_key(metadata, self.mask_keys)] = np.asarray(data) != 0
+
+    def write_domain(self, metadata: Mapping[str, Any], data: Any) -> None:
+        """
+        Add the local-to-global index map of a partition
+
+        Parameters
+        ----------
+        metadata : Mapping[str, Any]
+            Metadata of the domain, with `domain` and the partition key
+        data : Any
+            Global indices of the local points
+        """
+        domain = metadata.get("domain")
+        partitions = self.domains.setdefault(domain, {})
+        partitions[metadata.get(self.partition_key)] = np.asarray(data, dtype=np.intp)
+        self._assemblers.pop(domain, None)
+
+    def assembler(self, domain: Any, global_size: int | None = None) -> GlobalAssembler:
+        """
+        Assembler of the partitions written for a domain
+
+        Parameters
+        ----------
+        domain : Any
+            Value of `domain` in the metadata of the domain maps
+        global_size : int, optional
+            Number of global points, defaults to one more than the largest index
+        """
+        assembler = self._assemblers.get(domain)
+        if assembler is None or (global_size is not None and assembler.global_size != global_size):
+            if not self.domains.get(domain):
+                raise ValueError(f"No domain written for {domain!r}, can not aggregate")
+            assembler = self._assemblers[domain] = GlobalAssembler(self.domains[domain], global_size)
+        return assembler
+
+    def write_field(self, metadata: Mapping[str, Any], data: Any) -> None:
+        """
+        Run a field through every plan
+
+        Parameters
+        ----------
+        metadata : Mapping[str, Any]
+            Metadata of the field
+        data : Any
+            Field values
+        """
+        for executors in self._plans:
+            self._run(executors, 0, dict(metadata), np.asarray(data))
+
+    def _run(self, executors: list, start: int, metadata: dict[str, Any], values: np.ndarray) -> None:
+        for position in range(start, len(executors)):
+            executor, report = executors[position]
+
+            begin = time.perf_counter()
+            outputs = executor.process(metadata, values)
+            report.seconds += time.perf_counter() - begin
+
+            report.fields_in += 1
+            report.bytes_in += values.nbytes
+            report.fields_out += len(outputs)
+            report.peak_bytes = max(report.peak_bytes, executor.nbytes)
+
+            if len(outputs) != 1:
+                for output_metadata, output_values in outputs:
+                    self._run(executors, position + 1, output_metadata, output_values)
+                return
+            metadata, values = outputs[0]
+
+    def run(self, fields: Iterable[tuple[Mapping[str, Any], Any]]) -> SimulationReport:
+        """
+        Run a stream of fields through every plan
+
+        Parameters
+        ----------
+        fields : Iterable[tuple[Mapping[str, Any], Any]]
+            Metadata and values of each field
+
+        Returns
+        -------
+        SimulationReport
+            Counters of every action, accumulated over all runs
+        """
+        for metadata, data in fields:
+            self.write_field(metadata, data)
+        return self.report
+
+
+def simulate(config, fields: Iterable[tuple[Mapping[str, Any], Any]], **kwargs: Any) -> SimulationReport:
+    """
+    Run a stream of fields through a plan or config
+
+    Parameters
+    ----------
+    config : Plan | BaseConfig
+        Plan, or config of plans, to run
+    fields : Iterable[tuple[Mapping[str, Any], Any]]
+        Metadata and values of each field
+    kwargs : Any
+        Options of `Simulator`
+
+    Returns
+    -------
+    SimulationReport
+        Counters of every action
+    """
+    with Simulator(config, **kwargs) as simulator:
+        return simulator.run(fields)
+
+
+__all__ = ["ActionReport", "SimulationReport", "Simulator", "StatisticsWindow", "simulate"]
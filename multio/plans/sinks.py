@@ -8,7 +8,7 @@
 """
 Multio Sinks.
 """
-from typing import Literal, Union
+from typing import Literal, Optional, Union
 
 from pydantic import BaseModel, Field, FilePath, field_validator
 
@@ -72,12 +72,26 @@ class File(Sinks):
     path: str
 
 
-class Socket(Sinks):  # TO BE ADDED
-    """Socket Sink"""
+class Socket(Sinks):
+    """Socket Sink
+
+    Streams fields to a receiver listening on `host` and `port`.
+
+    The `multio.stream` framing is defined by this package, for `StreamSender` and
+    `StreamReceiver`, and is not the wire format of the socket sink of the library.
+    """
 
     type: Literal["socket"] = Field("socket", init=False)
+    host: str = "localhost"
+    port: int
+    batch_size: int = Field(1, ge=1, serialization_alias="batch-size", description="Fields sent per write")
+    send_buffer_bytes: Optional[int] = Field(
+        None, gt=0, serialization_alias="send-buffer-bytes", description="Size of the socket send buffer"
+    )
+    retries: int = 5
+    timeout: int = 60
 
 
 SINKS = Union[FDB, File, Socket, Debug]
 
-__all__ = ["Sinks", "FDB", "File", "SINKS"]
+__all__ = ["Sinks", "FDB", "File", "Socket", "SINKS"]
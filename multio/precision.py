@@ -0,0 +1,126 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Client-side precision reduction.
+
+Fields produced in double precision are often packed to far fewer bits
+downstream, so they can be sent as single precision to halve transport volume.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Iterable, Mapping
+
+import numpy as np
+
+from .plans.actions import Select
+
+
+@dataclass
+class PrecisionStatistics:
+    """Running totals of the fields reduced by a `PrecisionPolicy`"""
+
+    fields: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_in - self.bytes_out
+
+
+class PrecisionPolicy:
+    """
+    Policy deciding which double precision fields are sent as single precision.
+
+    Matching uses the same vocabulary as `multio.plans.Select`.
+    Reduced fields are converted into a pooled buffer, which is reused
+    for every field of the same shape, and are tagged with
+    `sourcePrecision: double` in their metadata.
+
+    Examples
+    --------
+    ```python
+    policy = PrecisionPolicy(params=["2t", "msl"], match=[{"levtype": "ml"}])
+    with Multio(precision_policy=policy) as mio:
+        mio.write_field({"param": "2t"}, np.ones(10))
+    print(policy.statistics.bytes_saved)
+    ```
+    """
+
+    def __init__(self, match: Iterable[Mapping[str, Any]] | None = None, params: Iterable[Any] | None = None):
+        """
+        Create a PrecisionPolicy
+
+        Parameters
+        ----------
+        match : Iterable[Mapping[str, Any]], optional
+            Metadata to match against, `[{}]` matches every field
+        params : Iterable[Any], optional
+            Shorthand for matching on `param`
+        """
+        rules = [dict(rule) for rule in match or []]
+        if params is not None:
+            rules.append({"param": list(params)})
+
+        self._select = Select(match=rules)
+        self.metadata = {"sourcePrecision": "double"}
+        self._pool: dict[tuple[int, ...], np.ndarray] = {}
+        self.statistics = PrecisionStatistics()
+
+    def applies(self, metadata: Mapping[str, Any], data: Any) -> bool:
+        """
+        Check if a field should be reduced
+
+        Parameters
+        ----------
+        metadata : Mapping[str, Any]
+            Metadata of the field
+        data : Any
+            Field values, only double precision arrays and python sequences are reduced
+
+        Returns
+        -------
+        bool
+            True if the field should be sent as single precision
+        """
+        if isinstance(data, np.ndarray) and data.dtype != np.float64:
+            return False
+        return self._select.matches(metadata)
+
+    def reduce(self, data: Any) -> np.ndarray:
+        """
+        Convert field values to single precision
+
+        The returned array is owned by the policy and is overwritten
+        by the next field of the same shape.
+
+        Parameters
+        ----------
+        data : Any
+            Field values
+
+        Returns
+        -------
+        np.ndarray
+            Single precision copy of the values
+        """
+        shape = np.shape(data)
+        buffer = self._pool.get(shape)
+        if buffer is None:
+            buffer = self._pool[shape] = np.empty(shape, dtype=np.float32)
+        np.copyto(buffer, data, casting="same_kind")
+
+        self.statistics.fields += 1
+        self.statistics.bytes_in += buffer.size * np.dtype(np.float64).itemsize
+        self.statistics.bytes_out += buffer.nbytes
+        return buffer
+
+
+__all__ = ["PrecisionPolicy", "PrecisionStatistics"]
@@ -0,0 +1,202 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Read raw fields written by a `File` sink.
+
+Without encoding, or with `Encode(format="raw")`, a `File` sink writes the values of each
+field one after the other, without any header. The size of each field is given to the reader,
+which indexes the offset of every field and maps the file, so that fields are only read from
+disk when their values are used.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Iterator, Mapping, Sequence
+
+import numpy as np
+
+INDEX_SUFFIX = ".index.json"
+
+PRECISIONS = {"single": np.float32, "double": np.float64}
+
+
+def _dtype(dtype: Any) -> np.dtype:
+    return np.dtype(PRECISIONS.get(dtype, dtype))
+
+
+class RawFieldReader:
+    """
+    Zero-copy access to the fields of a raw output file.
+
+    Each field is a view of a read-only `np.memmap` of the file, so indexing, slicing and
+    iterating do not read any values until they are used.
+
+    Examples
+    --------
+    ```python
+    reader = RawFieldReader("testFloat.bin", "single", size=6599680)
+    for values in reader:
+        assert np.isfinite(values).all()
+    reader[-1][:10]
+    reader.as_array()[:, 0]  # first point of every field
+    ```
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        dtype: Any = np.float64,
+        *,
+        size: int | Sequence[int] | None = None,
+        metadata: Sequence[Mapping[str, Any]] | None = None,
+        size_key: str = "globalSize",
+    ):
+        """
+        Create a RawFieldReader
+
+        Parameters
+        ----------
+        path : str | os.PathLike
+            File written by the sink
+        dtype : Any, optional
+            Type of the values, `single`, `double` or a numpy type. Defaults to double.
+        size : int | Sequence[int], optional
+            Number of values of every field, or of each field in order.
+            Taken from the metadata if not given, else the file is a single field.
+        metadata : Sequence[Mapping[str, Any]], optional
+            Metadata of each field in order
+        size_key : str, optional
+            Key of the metadata giving the number of values of a field
+
+        Raises
+        ------
+        ValueError
+            If the sizes do not match the size of the file
+        """
+        self.path = os.fspath(path)
+        self.dtype = _dtype(dtype)
+        self.metadata = None if metadata is None else [dict(md) for md in metadata]
+
+        nbytes = os.path.getsize(self.path)
+        if nbytes % self.dtype.itemsize:
+            raise ValueError(f"{self.path} of {nbytes} bytes does not hold {self.dtype} values")
+        nvalues = nbytes // self.dtype.itemsize
+
+        if size is None and self.metadata is not None:
+            size = [md[size_key] for md in self.metadata]
+        if size is None:
+            size = nvalues
+        if np.ndim(size) == 0:
+            if size <= 0 or nvalues % size:
+                raise ValueError(f"{self.path} of {nvalues} values is not made of fields of {size} values")
+            size = np.full(nvalues // size, size, dtype=np.int64)
+
+        sizes = np.asarray(size, dtype=np.int64)
+        self.offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=self.offsets[1:])
+        if self.offsets[-1] != nvalues:
+            raise ValueError(f"{self.path} holds {nvalues} values, but the fields add up to {self.offsets[-1]}")
+        if self.metadata is not None and len(self.metadata) != len(sizes):
+            raise ValueError(f"{len(self.metadata)} metadata given for {len(sizes)} fields")
+
+        self._values = np.memmap(self.path, dtype=self.dtype, mode="r") if nvalues else np.empty(0, self.dtype)
+
+    @classmethod
+    def from_index(cls, path: str | os.PathLike, index: str | os.PathLike | None = None) -> RawFieldReader:
+        """
+        Create a RawFieldReader from an index written by `write_index`
+
+        Parameters
+        ----------
+        path : str | os.PathLike
+            File written by the sink
+        index : str | os.PathLike, optional
+            Index of the file, defaults to the path of the file with `.index.json` appended
+        """
+        index = os.fspath(path) + INDEX_SUFFIX if index is None else index
+        with open(index) as f:
+            content = json.load(f)
+        return cls(path, content["dtype"], size=np.diff(content["offsets"]), metadata=content.get("metadata"))
+
+    def write_index(self, index: str | os.PathLike | None = None) -> str:
+        """
+        Write the offsets and metadata of every field, to reopen the file with `from_index`
+
+        Parameters
+        ----------
+        index : str | os.PathLike, optional
+            File to write, defaults to the path of the file with `.index.json` appended
+
+        Returns
+        -------
+        str
+            Path of the index
+        """
+        index = self.path + INDEX_SUFFIX if index is None else os.fspath(index)
+        content = {"dtype": self.dtype.str, "offsets": self.offsets.tolist()}
+        if self.metadata is not None:
+            content["metadata"] = self.metadata
+        with open(index, "w") as f:
+            json.dump(content, f)
+        return index
+
+    @property
+    def sizes(self) -> np.ndarray:
+        """Number of values of each field"""
+        return np.diff(self.offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def _field(self, index: int) -> np.ndarray:
+        if not -len(self) <= index < len(self):
+            raise IndexError(f"Field {index} out of range for {len(self)} fields")
+        index %= len(self)
+        return self._values[self.offsets[index] : self.offsets[index + 1]]
+
+    def __getitem__(self, key: int | slice | tuple) -> np.ndarray | list[np.ndarray]:
+        """
+        Field at an index, list of the fields of a slice, or values of a field with `reader[field, points]`
+        """
+        if isinstance(key, tuple):
+            field, points = key
+            if isinstance(field, slice):
+                return [values[points] for values in self[field]]
+            return self[field][points]
+        if isinstance(key, slice):
+            return [self._field(index) for index in range(*key.indices(len(self)))]
+        return self._field(key)
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for index in range(len(self)):
+            yield self._field(index)
+
+    def items(self) -> Iterator[tuple[dict[str, Any], np.ndarray]]:
+        """Metadata and values of every field"""
+        if self.metadata is None:
+            raise ValueError("No metadata given for the fields")
+        return zip(self.metadata, self)
+
+    def as_array(self) -> np.ndarray:
+        """
+        All fields as a `(fields, values)` view, if they are all of the same size
+
+        Raises
+        ------
+        ValueError
+            If the fields are of different sizes
+        """
+        sizes = self.sizes
+        if len(sizes) and np.any(sizes != sizes[0]):
+            raise ValueError("Fields are of different sizes")
+        return self._values.reshape(len(sizes), -1 if len(sizes) else 0)
+
+
+__all__ = ["RawFieldReader"]
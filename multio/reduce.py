@@ -0,0 +1,204 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Client-side streaming statistics.
+
+Fields only needed as statistics over a window are reduced before transport,
+so one field per operation is sent per window instead of one per step.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Iterable, Mapping
+
+import numpy as np
+
+from .plans.actions import FREQUENCY_UNITS, Select, Statistics
+from .plans.simulate import StatisticsWindow
+
+
+@dataclass
+class ReductionStatistics:
+    """Running totals of the fields reduced by a `StreamingStatistics`"""
+
+    fields_in: int = 0
+    fields_out: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    discarded: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_in - self.bytes_out
+
+
+class StreamingStatistics:
+    """
+    Statistics of fields computed on the client over output windows.
+
+    Configured like `multio.plans.Statistics`. Running sums, minima and maxima
+    are kept in preallocated buffers per field, and only the statistics are sent
+    when a window closes, tagged with the window end as step and the `operation`.
+    Windows still open when the handle is closed are discarded, unless `partial`
+    is set, in which case their statistics are sent with the step of their last field.
+
+    Examples
+    --------
+    ```python
+    reducer = StreamingStatistics(["average", "maximum"], "1d", match=[{"param": "2t"}])
+    with Multio(reducer=reducer) as mio:
+        for step in range(1, 49):
+            mio.write_field({"param": "2t", "step": step}, values[step])
+    ```
+    """
+
+    def __init__(
+        self,
+        operations: Iterable[str],
+        output_frequency: str,
+        *,
+        match: Iterable[Mapping[str, Any]] | None = None,
+        step_key: str = "step",
+        step_unit: str = "h",
+        partial: bool = False,
+    ):
+        """
+        Create a StreamingStatistics
+
+        Parameters
+        ----------
+        operations : Iterable[str]
+            Operations to compute, any of average, minimum, maximum, accumulate and instant
+        output_frequency : str
+            Length of each window, e.g. `6h` or `1d`
+        match : Iterable[Mapping[str, Any]], optional
+            Only reduce fields matching, same vocabulary as `multio.plans.Select`.
+            Defaults to every field.
+        step_key : str, optional
+            Metadata key of the time of a field, defaults to `step`
+        step_unit : str, optional
+            Unit of `step_key`, as used in output frequencies, defaults to `h`
+        partial : bool, optional
+            Send the statistics of the windows still open when closed, instead of discarding them
+        """
+        self.action = Statistics(operations=list(operations), output_frequency=output_frequency)
+        self._select = None if match is None else Select(match=[dict(rule) for rule in match])
+        self.step_key = step_key
+        self.step_seconds = FREQUENCY_UNITS[step_unit]
+        self.partial = partial
+        self._windows: dict[tuple, StatisticsWindow] = {}
+        # Metadata of the last field of each window
+        self._last: dict[tuple, dict[str, Any]] = {}
+        self.statistics = ReductionStatistics()
+
+    @classmethod
+    def from_action(cls, action: Statistics, **kwargs: Any) -> "StreamingStatistics":
+        """
+        Create a StreamingStatistics from a `Statistics` action
+
+        Parameters
+        ----------
+        action : Statistics
+            Action to compute on the client
+        kwargs : Any
+            Other options of `StreamingStatistics`
+        """
+        return cls(action.operations, action.output_frequency, **kwargs)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held in the buffers of all fields"""
+        return sum(window.nbytes for window in self._windows.values())
+
+    def applies(self, metadata: Mapping[str, Any]) -> bool:
+        """
+        Check if a field should be reduced
+
+        Parameters
+        ----------
+        metadata : Mapping[str, Any]
+            Metadata of the field
+
+        Returns
+        -------
+        bool
+            True if the field should be reduced
+        """
+        return self._select is None or self._select.matches(metadata)
+
+    def update(self, metadata: Mapping[str, Any], data: Any) -> list[tuple[dict[str, Any], np.ndarray]]:
+        """
+        Add a field to its running statistics
+
+        Parameters
+        ----------
+        metadata : Mapping[str, Any]
+            Metadata of the field
+        data : Any
+            Field values
+
+        Returns
+        -------
+        list[tuple[dict[str, Any], np.ndarray]]
+            Metadata and values of the statistics of every window closed by this field.
+            The values are only valid until the next call to `update`.
+        """
+        metadata = dict(metadata)
+        key = tuple(sorted((k, v) for k, v in metadata.items() if k != self.step_key))
+
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = StatisticsWindow(
+                self.action.operations, self.action.output_seconds, copy=False
+            )
+
+        self._last[key] = metadata
+        data = np.asarray(data)
+        self.statistics.fields_in += 1
+        self.statistics.bytes_in += data.nbytes
+
+        outputs = []
+        for end, results in window.add(float(metadata.get(self.step_key, 0)) * self.step_seconds, data):
+            step = end / self.step_seconds
+            step = int(step) if step.is_integer() else step
+            for operation, values in results.items():
+                outputs.append(({**metadata, self.step_key: step, "operation": operation}, values))
+                self.statistics.fields_out += 1
+                self.statistics.bytes_out += values.nbytes
+        return outputs
+
+    def close(self) -> list[tuple[dict[str, Any], np.ndarray]]:
+        """
+        End the windows still open, e.g. at the end of a run
+
+        Returns
+        -------
+        list[tuple[dict[str, Any], np.ndarray]]
+            With `partial`, metadata and values of the statistics of every window still open,
+            with the step of its last field. Otherwise nothing, the windows are discarded and
+            counted in `statistics.discarded`.
+        """
+        outputs = []
+        for key, window in self._windows.items():
+            if not window.count:
+                continue
+            results = window.result(copy=True)
+            if not self.partial:
+                self.statistics.discarded += 1
+                continue
+            for operation, values in results.items():
+                outputs.append(({**self._last[key], "operation": operation}, values))
+                self.statistics.fields_out += 1
+                self.statistics.bytes_out += values.nbytes
+        self._windows.clear()
+        self._last.clear()
+        return outputs
+
+
+__all__ = ["ReductionStatistics", "StreamingStatistics"]
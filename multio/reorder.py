@@ -0,0 +1,142 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Client-side reordering of the fields of a step.
+
+Fields leave a model in the order they are computed, which interleaves params and levels.
+Sending the fields of a step sorted by their metadata gives the actions and sinks of the
+servers consecutive fields of the same param and level.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Iterable
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 1024**3
+
+
+@dataclass
+class ReorderStatistics:
+    """Running totals of the fields held by a `ReorderBuffer`"""
+
+    fields: int = 0
+    bytes: int = 0
+    drains: int = 0
+    overflows: int = 0
+    peak_bytes: int = 0
+
+
+def _sort_value(value: Any) -> tuple:
+    # Numbers before strings before missing keys, so that mixed types can be compared
+    if value is None:
+        return (2,)
+    if isinstance(value, (bool, int, float, np.number)):
+        return (0, value)
+    return (1, str(value))
+
+
+class ReorderBuffer:
+    """
+    Hold the fields written to a `Multio` handle, and send them sorted by metadata keys.
+
+    Fields and their metadata are copied into the buffer, as the caller may reuse them, and
+    sent sorted on `flush` and `notify`, before a mask or domain is written, and when the
+    handle is closed.
+    Once the buffer holds more than `max_bytes`, the fields held so far are sent sorted,
+    so that a step larger than the budget is sent as several sorted runs.
+    Fields with the same values of the keys are sent in the order they were written.
+
+    Examples
+    --------
+    ```python
+    with Multio(reorder=ReorderBuffer(keys=("param", "level"), max_bytes=4 * 1024**3)) as mio:
+        for level, param in model_order:
+            mio.write_field({"param": param, "level": level, "step": step}, values)
+        mio.flush({"step": step})
+    ```
+    """
+
+    def __init__(self, keys: Iterable[str] = ("param", "level"), max_bytes: int | None = DEFAULT_MAX_BYTES):
+        """
+        Create a ReorderBuffer
+
+        Parameters
+        ----------
+        keys : Iterable[str], optional
+            Metadata keys to sort fields by, defaults to param then level
+        max_bytes : int, optional
+            Largest size of the fields held, unlimited if None
+        """
+        self.keys = tuple(keys)
+        self.max_bytes = max_bytes
+        self.statistics = ReorderStatistics()
+
+        self._fields: list[tuple[tuple, Any, np.ndarray]] = []
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    @property
+    def held_bytes(self) -> int:
+        """Size of the fields held"""
+        return self._bytes
+
+    def add(self, metadata: Any, data: Any) -> list[tuple[Any, np.ndarray]]:
+        """
+        Hold a copy of a field
+
+        Parameters
+        ----------
+        metadata : Metadata | Mapping[str, Any]
+            Metadata of the field
+        data : Any
+            Values of the field
+
+        Returns
+        -------
+        list[tuple[Any, np.ndarray]]
+            Fields to send now, sorted, if the buffer is over budget
+        """
+        # The caller may also reuse its metadata, e.g. setting the level of a single Metadata object
+        metadata = metadata.copy()
+        values = np.array(data, copy=True)
+        key = tuple(_sort_value(metadata.get(name)) for name in self.keys)
+        self._fields.append((key, metadata, values))
+        self._bytes += values.nbytes
+
+        self.statistics.fields += 1
+        self.statistics.bytes += values.nbytes
+        self.statistics.peak_bytes = max(self.statistics.peak_bytes, self._bytes)
+
+        if self.max_bytes is not None and self._bytes > self.max_bytes:
+            self.statistics.overflows += 1
+            return self.drain()
+        return []
+
+    def drain(self) -> list[tuple[Any, np.ndarray]]:
+        """
+        Remove every field held
+
+        Returns
+        -------
+        list[tuple[Any, np.ndarray]]
+            Metadata and values of the fields, sorted
+        """
+        if not self._fields:
+            return []
+        fields, self._fields, self._bytes = self._fields, [], 0
+        self.statistics.drains += 1
+        fields.sort(key=lambda field: field[0])
+        return [(metadata, values) for _, metadata, values in fields]
+
+
+__all__ = ["ReorderBuffer", "ReorderStatistics"]
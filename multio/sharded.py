@@ -0,0 +1,222 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Spread fields over several Multio handles, e.g. one per server group.
+"""
+
+from __future__ import annotations
+
+import zlib
+from contextlib import ExitStack
+from typing import Any, Callable, Hashable, Iterable, Mapping, Sequence, Union
+
+from .metadata import Metadata
+from .multio import Multio
+from .plans.plans import Client, Collection, Server
+from .utils import MultioPlan
+
+Shard = Union[Multio, MultioPlan, Mapping[str, Any], Client, Server, str, None]
+
+# Arguments of `Multio` holding the state of a single handle
+_PER_HANDLE = ("spool", "reducer", "reorder", "lanes")
+
+
+class ShardedMultio:
+    """
+    Route fields to one of several `Multio` handles by a stable hash of metadata keys.
+
+    A field is sent to the handle given by the CRC-32 of the values of `keys`, so fields
+    with the same values, e.g. the same param and level, always go to the same handle,
+    in every process and run. Flushes, notifications, masks and domains are sent to every handle.
+
+    Examples
+    --------
+    ```python
+    collection = Collection(configs={"group-a": server_a, "group-b": server_b})
+    with ShardedMultio.from_collection(collection, keys=("param", "level")) as mio:
+        mio.write_field({"param": "t", "level": 500, "step": 6}, values)
+        mio.flush({"step": 6})
+    ```
+    """
+
+    def __init__(
+        self,
+        shards: Sequence[Shard] | Mapping[Hashable, Shard],
+        keys: Iterable[str] = ("param", "level"),
+        per_shard: Callable[[Hashable], Mapping[str, Any]] | None = None,
+        **kwargs: Any,
+    ):
+        """
+        Create a ShardedMultio
+
+        Parameters
+        ----------
+        shards : Sequence[Shard] | Mapping[Hashable, Shard]
+            Handle of each shard, or the plan to create it with, as accepted by `MultioPlan`.
+            None creates a handle with the plan already set in the environment.
+        keys : Iterable[str], optional
+            Metadata keys to route fields by, defaults to param and level
+        per_shard : Callable[[Hashable], Mapping[str, Any]], optional
+            Called with the name of each shard, giving other arguments of `Multio` for its handle,
+            e.g. `lambda name: {"spool": Spool(f"/spool/{name}")}`
+        kwargs : Any
+            Other arguments of `Multio`, shared by the handles created. A spool, reducer, reorder
+            buffer or priority lanes hold the state of a single handle, and must be given per shard.
+
+        Raises
+        ------
+        ValueError
+            If an argument holding the state of a single handle is shared
+        """
+        if not isinstance(shards, Mapping):
+            shards = dict(enumerate(shards))
+        if not shards:
+            raise ValueError("At least one shard is required")
+        shared = [name for name in _PER_HANDLE if kwargs.get(name) is not None]
+        if shared:
+            raise ValueError(f"{', '.join(shared)} can not be shared by the handles, give them with per_shard")
+
+        self.keys = tuple(keys)
+        self.names = list(shards)
+        self.handles = [
+            self._handle(shard, kwargs if per_shard is None else {**kwargs, **per_shard(name)})
+            for name, shard in shards.items()
+        ]
+        self.fields = [0] * len(self.handles)
+        self._routes: dict[tuple, int] = {}
+        self._stack: ExitStack | None = None
+
+    @staticmethod
+    def _handle(shard: Shard, kwargs: dict[str, Any]) -> Multio:
+        if isinstance(shard, Multio):
+            return shard
+        if shard is None:
+            return Multio(**kwargs)
+        if isinstance(shard, Mapping):
+            shard = dict(shard)
+        with shard if isinstance(shard, MultioPlan) else MultioPlan(shard):
+            return Multio(**kwargs)
+
+    @classmethod
+    def from_collection(
+        cls,
+        collection: Collection,
+        keys: Iterable[str] = ("param", "level"),
+        per_shard: Callable[[Hashable], Mapping[str, Any]] | None = None,
+        **kwargs: Any,
+    ):
+        """
+        Create a ShardedMultio with a handle per config of a collection
+
+        Parameters
+        ----------
+        collection : Collection
+            Configs of each shard, e.g. a `Server` config per server group
+        keys : Iterable[str], optional
+            Metadata keys to route fields by
+        per_shard : Callable[[Hashable], Mapping[str, Any]], optional
+            Other arguments of `Multio` for each shard, called with the name of its config
+        kwargs : Any
+            Other arguments of `Multio`, shared by the handles
+        """
+        return cls(dict(collection.configs), keys, per_shard, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.handles)
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for handle in self.handles:
+            self._stack.enter_context(handle)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        stack, self._stack = self._stack, None
+        return stack.__exit__(exc_type, exc_value, traceback)
+
+    def shard(self, metadata: Mapping[str, Any] | Metadata) -> int:
+        """
+        Index of the handle a field is sent to
+
+        Parameters
+        ----------
+        metadata : Mapping[str, Any] | Metadata
+            Metadata of the field
+
+        Returns
+        -------
+        int
+            Index of the handle in `handles`
+        """
+        values = tuple(metadata.get(key) for key in self.keys)
+        index = self._routes.get(values)
+        if index is None:
+            encoded = "\x1f".join(f"{key}={value}" for key, value in zip(self.keys, values)).encode()
+            index = self._routes[values] = zlib.crc32(encoded) % len(self.handles)
+        return index
+
+    @staticmethod
+    def _for(handle: Multio, metadata: Any) -> Any:
+        # Metadata is created on a single handle, so it is copied for the others
+        if isinstance(metadata, Metadata) and metadata._parent is not handle:
+            return metadata.to_dict()
+        return metadata
+
+    def write_field(self, metadata: Mapping[str, Any] | Metadata, data: Any):
+        """Write a field to the handle chosen by its metadata"""
+        index = self.shard(metadata)
+        self.fields[index] += 1
+        handle = self.handles[index]
+        handle.write_field(self._for(handle, metadata), data)
+
+    def field_accepted(self, metadata: Mapping[str, Any] | Metadata) -> bool:
+        """Check if the handle chosen by the metadata accepts the field"""
+        handle = self.handles[self.shard(metadata)]
+        return handle.field_accepted(self._for(handle, metadata))
+
+    def write_grib(self, data: Any, metadata: Mapping[str, Any] | None = None):
+        """
+        Write encoded GRIB messages
+
+        Parameters
+        ----------
+        data : Any
+            Encoded messages
+        metadata : Mapping[str, Any], optional
+            Values of the keys to route by, decoded by the caller. Sent to the first handle if not given.
+        """
+        index = 0 if metadata is None else self.shard(metadata)
+        self.fields[index] += 1
+        self.handles[index].write_grib(data)
+
+    def flush(self, metadata: Mapping[str, Any] | Metadata | None = None):
+        """Flush every handle"""
+        for handle in self.handles:
+            handle.flush(self._for(handle, metadata))
+
+    def notify(self, metadata: Mapping[str, Any] | Metadata):
+        """Notify every handle"""
+        for handle in self.handles:
+            handle.notify(self._for(handle, metadata))
+
+    def write_mask(self, metadata: Mapping[str, Any] | Metadata, data: Any):
+        """Write a mask to every handle"""
+        for handle in self.handles:
+            handle.write_mask(self._for(handle, metadata), data)
+
+    def write_domain(self, metadata: Mapping[str, Any] | Metadata, data: Any):
+        """Write a domain to every handle"""
+        for handle in self.handles:
+            handle.write_domain(self._for(handle, metadata), data)
+
+    def metrics(self) -> dict[Hashable, dict[str, Any]]:
+        """Metrics of every handle, by shard name"""
+        return {name: handle.metrics() for name, handle in zip(self.names, self.handles)}
+
+
+__all__ = ["ShardedMultio"]
@@ -0,0 +1,330 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Store-and-forward spooling of the calls made to a `Multio` handle.
+
+Once a call to the library takes longer than a threshold, fields, GRIB messages, flushes and
+notifications are appended to memory-mapped segment files instead, and replayed in order into the handle
+by a background thread, so that the model keeps stepping while the servers catch up.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+SPOOL_ENVIRON_VAR = "MULTIO_SPOOL_DIR"
+DEFAULT_SEGMENT_BYTES = 256 * 1024**2
+
+KINDS = ("write_field", "flush", "notify", "write_grib")
+
+# kind, metadata length, data length, dtype
+_HEADER = struct.Struct("<BIQ8s")
+_ALIGNMENT = 8
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+@dataclass
+class SpoolStatistics:
+    """Running totals of the calls spooled by a `Spool`"""
+
+    activations: int = 0
+    spooled: int = 0
+    replayed: int = 0
+    bytes_spooled: int = 0
+    segments: int = 0
+    peak_backlog_bytes: int = 0
+
+
+class _Segment:
+    """A memory-mapped file of consecutive records"""
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, size)
+            self.mmap = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self.offset = 0
+        self.pending = 0
+        self.sealed = False
+
+    def fits(self, nbytes: int) -> bool:
+        return self.offset + nbytes <= self.size
+
+    def append(self, kind: int, metadata: bytes, data: np.ndarray | None) -> int:
+        start = self.offset
+        data_bytes = 0 if data is None else data.nbytes
+        dtype = b"" if data is None else data.dtype.str.encode()
+
+        _HEADER.pack_into(self.mmap, start, kind, len(metadata), data_bytes, dtype)
+        position = start + _HEADER.size
+        self.mmap[position : position + len(metadata)] = metadata
+        position += len(metadata)
+        if data is not None:
+            position = _aligned(position)
+            np.frombuffer(self.mmap, dtype=data.dtype, count=data.size, offset=position)[:] = data.ravel()
+            position += data_bytes
+
+        self.offset = _aligned(position)
+        self.pending += 1
+        return start
+
+    def read(self, start: int) -> tuple[str, dict[str, Any], np.ndarray | None]:
+        kind, metadata_bytes, data_bytes, dtype = _HEADER.unpack_from(self.mmap, start)
+        position = start + _HEADER.size
+        metadata = json.loads(self.mmap[position : position + metadata_bytes])
+
+        data = None
+        if dtype.rstrip(b"\0"):
+            dtype = np.dtype(dtype.rstrip(b"\0").decode())
+            position = _aligned(position + metadata_bytes)
+            data = np.frombuffer(self.mmap, dtype=dtype, count=data_bytes // dtype.itemsize, offset=position)
+        return KINDS[kind], metadata, data
+
+    def close(self):
+        os.unlink(self.path)
+        try:
+            self.mmap.close()
+        except BufferError:
+            # Still viewed by an array, unmapped once that is released
+            pass
+
+
+class Spool:
+    """
+    Spool calls to a `Multio` handle to disk while the servers fall behind.
+
+    A call to the library taking longer than `latency` starts spooling. From then on
+    `write_field`, `write_grib`, `flush` and `notify` are appended to memory-mapped segments
+    and replayed in their original order by a background thread, until the backlog is drained.
+    `write_mask` and `write_domain` wait for the backlog to drain, so fields are always
+    replayed with the masks and domains they were written with, as does `field_accepted`.
+
+    Examples
+    --------
+    ```python
+    with Multio(spool=Spool(latency=0.5, max_bytes=32 * 1024**3)) as mio:
+        for step in steps:
+            mio.write_field(metadata, values)
+            mio.flush({"step": step})
+    ```
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike | None = None,
+        latency: float = 1.0,
+        segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+        max_bytes: int | None = None,
+    ):
+        """
+        Create a Spool
+
+        Parameters
+        ----------
+        directory : str | os.PathLike, optional
+            Directory to create the segments in, defaults to a new temporary directory
+            in $MULTIO_SPOOL_DIR, or the system temporary directory
+        latency : float, optional
+            Seconds a call to the library may take before spooling starts
+        segment_bytes : int, optional
+            Size of each segment file, larger records get a segment of their own
+        max_bytes : int, optional
+            Largest backlog on disk, calls block once it is reached. Unlimited by default.
+        """
+        self.directory = None if directory is None else os.fspath(directory)
+        self.latency = latency
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+
+        self.active = False
+        self.backlog_bytes = 0
+        self.statistics = SpoolStatistics()
+
+        self._replay: Optional[Callable[[str, dict[str, Any], Any], None]] = None
+        self._records: deque[tuple[_Segment, int, int]] = deque()
+        self._temporary: str | None = None
+        self._segment: _Segment | None = None
+        self._condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._closing = False
+        self._error: BaseException | None = None
+
+    def attach(self, replay: Callable[[str, dict[str, Any], Any], None]):
+        """
+        Set the function replaying spooled calls
+
+        Parameters
+        ----------
+        replay : Callable[[str, dict[str, Any], Any], None]
+            Called with the kind of call, its metadata and its data
+        """
+        self._replay = replay
+
+    def observe(self, seconds: float):
+        """Record the time taken by a call to the library, starting to spool if too slow"""
+        if seconds > self.latency and not self.active:
+            with self._condition:
+                self.active = True
+                self.statistics.activations += 1
+
+    def _check(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError("Replaying spooled calls failed") from error
+
+    def submit(self, kind: str, metadata: Any, data: Any = None) -> int | None:
+        """
+        Spool a call if spooling
+
+        Parameters
+        ----------
+        kind : str
+            One of write_field, flush, notify and write_grib
+        metadata : Any
+            Metadata of the call
+        data : Any, optional
+            Field values, or the bytes of GRIB messages
+
+        Returns
+        -------
+        int | None
+            Bytes of data spooled, None if not spooling and the call should be made directly
+        """
+        self._check()
+        if not self.active:
+            return None
+
+        encoded = json.dumps(dict(metadata.items()) if metadata is not None else {}).encode()
+        values = None if data is None else np.ascontiguousarray(data)
+        nbytes = _aligned(_HEADER.size + len(encoded)) + _aligned(0 if values is None else values.nbytes)
+
+        with self._condition:
+            if not self.active:
+                # The backlog drained in the meantime
+                return None
+            if self.max_bytes is not None:
+                self._condition.wait_for(
+                    lambda: self.backlog_bytes == 0 or self.backlog_bytes + nbytes <= self.max_bytes
+                )
+                self._check()
+
+            segment = self._segment
+            if segment is not None and segment.pending == 0:
+                # Fully replayed, so the segment can be reused from the start
+                segment.offset = 0
+            if segment is None or not segment.fits(nbytes):
+                if segment is not None:
+                    segment.sealed = True
+                    if segment.pending == 0:
+                        segment.close()
+                path = os.path.join(self._segment_directory(), f"segment-{self.statistics.segments:06d}.spool")
+                segment = self._segment = _Segment(path, max(self.segment_bytes, nbytes))
+                self.statistics.segments += 1
+
+            self._records.append((segment, segment.append(KINDS.index(kind), encoded, values), nbytes))
+            self.backlog_bytes += nbytes
+            self.statistics.spooled += 1
+            self.statistics.bytes_spooled += nbytes
+            self.statistics.peak_backlog_bytes = max(self.statistics.peak_backlog_bytes, self.backlog_bytes)
+
+            if self._thread is None:
+                self._closing = False
+                self._thread = threading.Thread(target=self._drain, name="multio-spool", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+        return 0 if values is None else values.nbytes
+
+    def _segment_directory(self) -> str:
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            return self.directory
+        if self._temporary is None:
+            self._temporary = tempfile.mkdtemp(prefix="multio-spool-", dir=os.environ.get(SPOOL_ENVIRON_VAR))
+        return self._temporary
+
+    def _drain(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._records or self._closing)
+                if not self._records:
+                    return
+                segment, start, nbytes = self._records[0]
+
+            try:
+                kind, metadata, data = segment.read(start)
+                self._replay(kind, metadata, data)
+                del data
+            except BaseException as e:
+                # Release the views of the segment held by the frames of the traceback
+                traceback.clear_frames(e.__traceback__)
+                self._error = e
+
+            with self._condition:
+                self._records.popleft()
+                segment.pending -= 1
+                self.backlog_bytes -= nbytes
+                self.statistics.replayed += 1
+                if not self._records:
+                    # Caught up, calls go to the library directly again
+                    self.active = False
+                self._condition.notify_all()
+                if segment.sealed and segment.pending == 0:
+                    segment.close()
+
+    def wait(self):
+        """Block until every spooled call has been replayed"""
+        with self._condition:
+            self._condition.wait_for(lambda: not self._records)
+        self._check()
+
+    def close(self):
+        """
+        Replay every spooled call, stop the background thread and remove the segments
+
+        The thread is stopped and the segments removed even if a replay failed,
+        the error is raised after.
+        """
+        try:
+            self.wait()
+        finally:
+            with self._condition:
+                self._closing = True
+                self._condition.notify_all()
+                thread, self._thread = self._thread, None
+            if thread is not None:
+                thread.join()
+
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+            if self._temporary is not None:
+                shutil.rmtree(self._temporary, ignore_errors=True)
+                self._temporary = None
+
+
+__all__ = ["Spool", "SpoolStatistics"]
@@ -0,0 +1,304 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Stream of fields in the MIOS framing, sent with the settings of a `Socket` sink.
+
+The MIOS framing is defined here, by this package, and not by the library: it is not
+the wire format of the socket sink of the library, so a `StreamReceiver` only receives
+fields sent by a `StreamSender`, or by any other sender following this framing.
+
+The stream is a sequence of frames, each made of
+
+- a header: the magic `MIOS`, the length of the metadata as a 32-bit unsigned integer,
+  the length of the data as a 64-bit unsigned integer and the numpy type string of the data,
+  padded with zeros to 8 bytes, all little-endian,
+- the metadata, as UTF-8 JSON,
+- the data, raw values of the type given, or encoded messages if the type is empty.
+
+A batch of fields is sent as consecutive frames.
+"""
+
+from __future__ import annotations
+
+import json
+import selectors
+import socket
+import struct
+import time
+from typing import Any, Iterator, Mapping
+
+import numpy as np
+
+from .plans.sinks import Socket
+
+MAGIC = b"MIOS"
+HEADER = struct.Struct("<4sIQ8s")
+
+# Below the smallest limit on the number of buffers per system call
+_MAX_BUFFERS = 512
+
+
+def _recv_into(sock: socket.socket, view: memoryview) -> bool:
+    """Fill a buffer from a socket, False if the stream ended before any byte was read"""
+    received = 0
+    while received < len(view):
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            if received == 0:
+                return False
+            raise ConnectionError(f"Stream ended within a frame, {received} of {len(view)} bytes received")
+        received += count
+    return True
+
+
+def _sendall(sock: socket.socket, buffers: list[memoryview]):
+    """Send buffers with as few system calls as possible, and without joining them"""
+    while buffers:
+        sent = sock.sendmsg(buffers[:_MAX_BUFFERS])
+        while buffers and sent >= len(buffers[0]):
+            sent -= len(buffers[0])
+            buffers.pop(0)
+        if buffers and sent:
+            buffers[0] = buffers[0][sent:]
+
+
+class StreamSender:
+    """
+    Send fields in the MIOS framing, configured like a `Socket` sink, e.g. in tests.
+
+    Examples
+    --------
+    ```python
+    with StreamSender.from_sink(Socket(host="localhost", port=4000, batch_size=8)) as sender:
+        sender.send({"param": "2t", "step": 0}, values)
+    ```
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 0,
+        batch_size: int = 1,
+        send_buffer_bytes: int | None = None,
+        timeout: float | None = 60,
+        retries: int = 0,
+    ):
+        """
+        Create a StreamSender connected to a receiver
+
+        Parameters
+        ----------
+        host : str, optional
+            Host of the receiver
+        port : int, optional
+            Port of the receiver
+        batch_size : int, optional
+            Fields sent per write
+        send_buffer_bytes : int, optional
+            Size of the socket send buffer
+        timeout : float, optional
+            Seconds to wait for the connection
+        retries : int, optional
+            Attempts to connect again after the connection fails, e.g. while the receiver starts
+        """
+        self.batch_size = batch_size
+        for attempt in range(retries + 1):
+            try:
+                self.socket = socket.create_connection((host, port), timeout=timeout)
+                break
+            except OSError:
+                if attempt == retries:
+                    raise
+                time.sleep(min(0.1 * 2**attempt, 5.0))
+        self.socket.settimeout(None)
+        if send_buffer_bytes is not None:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, send_buffer_bytes)
+        self._pending: list[memoryview] = []
+        self._fields = 0
+
+    @classmethod
+    def from_sink(cls, sink: Socket | Mapping[str, Any]) -> StreamSender:
+        """Create a StreamSender configured as a `Socket` sink"""
+        if isinstance(sink, Mapping):
+            sink = Socket(**sink)
+        return cls(sink.host, sink.port, sink.batch_size, sink.send_buffer_bytes, sink.timeout, sink.retries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def send(self, metadata: Mapping[str, Any], data: Any):
+        """
+        Send a field, once `batch_size` fields are pending
+
+        Parameters
+        ----------
+        metadata : Mapping[str, Any]
+            Metadata of the field
+        data : Any
+            Values of the field, or bytes of encoded messages
+        """
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data, dtype = memoryview(data).cast("B"), b""
+        else:
+            data = np.ascontiguousarray(data)
+            data, dtype = memoryview(data.reshape(-1).view(np.uint8)), data.dtype.str.encode()
+        encoded = json.dumps(dict(metadata)).encode()
+
+        self._pending += [memoryview(HEADER.pack(MAGIC, len(encoded), len(data), dtype)), memoryview(encoded), data]
+        self._fields += 1
+        if self._fields >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Send the pending fields"""
+        _sendall(self.socket, [buffer for buffer in self._pending if len(buffer)])
+        self._pending = []
+        self._fields = 0
+
+    def close(self):
+        """Send the pending fields and close the connection"""
+        try:
+            self.flush()
+        finally:
+            self.socket.close()
+
+
+class StreamReceiver:
+    """
+    Receive the fields sent in the MIOS framing, e.g. by `StreamSender`s.
+
+    Listens on a port that the senders connect to, and yields the `(metadata, array)` of
+    each field as it arrives. Data is received with `recv_into` straight into a numpy
+    buffer, which by default is reused for every field, so an array is only valid until
+    the next field is received.
+
+    Examples
+    --------
+    ```python
+    with StreamReceiver(port=4000, connections=4) as receiver:
+        for metadata, values in receiver:
+            consume(metadata, values)
+    ```
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 0,
+        connections: int = 1,
+        receive_buffer_bytes: int | None = None,
+        reuse: bool = True,
+    ):
+        """
+        Create a StreamReceiver listening for connections
+
+        Parameters
+        ----------
+        host : str, optional
+            Address to listen on
+        port : int, optional
+            Port to listen on, an unused one if 0
+        connections : int, optional
+            Number of senders, iteration stops once all have closed their connection
+        receive_buffer_bytes : int, optional
+            Size of the socket receive buffers
+        reuse : bool, optional
+            Receive every field into the same buffer, otherwise into a new array each
+        """
+        self.connections = connections
+        self.receive_buffer_bytes = receive_buffer_bytes
+        self.reuse = reuse
+
+        self.socket = socket.create_server((host, port), backlog=connections)
+        self._header = bytearray(HEADER.size)
+        self._metadata = bytearray(4096)
+        self._data = np.empty(0, dtype=np.uint8)
+
+    @property
+    def address(self) -> tuple[str, int]:
+        """Address listened on"""
+        return self.socket.getsockname()[:2]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _buffer(self, nbytes: int) -> np.ndarray:
+        if not self.reuse:
+            return np.empty(nbytes, dtype=np.uint8)
+        if self._data.nbytes < nbytes:
+            self._data = np.empty(nbytes, dtype=np.uint8)
+        return self._data[:nbytes]
+
+    def read(self, connection: socket.socket) -> tuple[dict[str, Any], np.ndarray] | None:
+        """
+        Read a frame from a connection
+
+        Returns
+        -------
+        tuple[dict[str, Any], np.ndarray] | None
+            Metadata and values of the field, values are bytes of encoded messages if not typed.
+            None once the connection is closed.
+        """
+        if not _recv_into(connection, memoryview(self._header)):
+            return None
+        magic, metadata_bytes, data_bytes, dtype = HEADER.unpack(self._header)
+        if magic != MAGIC:
+            raise ConnectionError(f"Invalid frame, expected {MAGIC!r} and got {magic!r}")
+
+        if len(self._metadata) < metadata_bytes:
+            self._metadata = bytearray(metadata_bytes)
+        view = memoryview(self._metadata)[:metadata_bytes]
+        if metadata_bytes and not _recv_into(connection, view):
+            raise ConnectionError("Stream ended within a frame")
+        metadata = json.loads(view.tobytes()) if metadata_bytes else {}
+
+        data = self._buffer(data_bytes)
+        if data_bytes and not _recv_into(connection, memoryview(data)):
+            raise ConnectionError("Stream ended within a frame")
+        dtype = dtype.rstrip(b"\0")
+        if dtype:
+            data = data.view(np.dtype(dtype.decode()))
+        return metadata, data
+
+    def __iter__(self) -> Iterator[tuple[dict[str, Any], np.ndarray]]:
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.socket, selectors.EVENT_READ)
+            accepted = closed = 0
+            while closed < self.connections:
+                for key, _ in selector.select():
+                    if key.fileobj is self.socket:
+                        connection, _ = self.socket.accept()
+                        if self.receive_buffer_bytes is not None:
+                            connection.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.receive_buffer_bytes)
+                        selector.register(connection, selectors.EVENT_READ)
+                        accepted += 1
+                        if accepted == self.connections:
+                            selector.unregister(self.socket)
+                        continue
+
+                    # A whole frame is read once it starts arriving, the sender completes it
+                    field = self.read(key.fileobj)
+                    if field is None:
+                        selector.unregister(key.fileobj)
+                        key.fileobj.close()
+                        closed += 1
+                    else:
+                        yield field
+
+    def close(self):
+        """Stop listening"""
+        self.socket.close()
+
+
+__all__ = ["StreamReceiver", "StreamSender"]
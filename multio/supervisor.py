@@ -0,0 +1,253 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Supervise local Multio server processes.
+
+Each server runs `python -m multio.supervisor`, which starts a server with the plan
+set in MULTIO_PLANS, and reports that it is ready once the server has been running for
+a short delay without failing.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Mapping, Optional, Sequence
+
+from .plans.plans import Server
+
+SERVER_INDEX_ENVIRON_VAR = "MULTIO_SERVER_INDEX"
+
+
+@dataclass
+class ServerStatus:
+    """State of a supervised server process"""
+
+    index: int
+    pid: int
+    alive: bool
+    returncode: Optional[int] = None
+    read_bytes: Optional[int] = None
+    write_bytes: Optional[int] = None
+    read_rate: Optional[float] = None
+    write_rate: Optional[float] = None
+
+
+def _proc_io(pid: int) -> tuple[int, int] | None:
+    """Bytes read and written by a process, from /proc where available"""
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+    except (OSError, ValueError):
+        return None
+    return int(counters["read_bytes"]), int(counters["write_bytes"])
+
+
+class ServerSupervisor:
+    """
+    Start, watch and stop local Multio server processes.
+
+    Examples
+    --------
+    ```python
+    server = Server(transport="tcp", plans=[...])
+    with ServerSupervisor(server, count=4) as supervisor:
+        with MultioPlan(client), Multio() as mio:
+            ...
+        print(supervisor.status())
+    ```
+    """
+
+    def __init__(
+        self,
+        server: Server | Mapping[str, Any],
+        count: int = 1,
+        *,
+        env: Mapping[str, str] | None = None,
+        command: Sequence[str] | None = None,
+        ready_timeout: float = 60.0,
+        stop_timeout: float = 10.0,
+    ):
+        """
+        Create a ServerSupervisor
+
+        Parameters
+        ----------
+        server : Server | Mapping[str, Any]
+            Plan of every server
+        count : int, optional
+            Number of server processes
+        env : Mapping[str, str], optional
+            Extra environment variables of the servers
+        command : Sequence[str], optional
+            Command running a server, given `--ready <path>` to create once ready.
+            Defaults to `python -m multio.supervisor`.
+        ready_timeout : float, optional
+            Seconds to wait for every server to be ready
+        stop_timeout : float, optional
+            Seconds to wait for each server to exit before it is killed
+        """
+        if isinstance(server, Mapping):
+            server = Server(**server)
+        self.server = server
+        self.count = count
+        self.env = dict(env or {})
+        self.command = list(command or [sys.executable, "-m", "multio.supervisor"])
+        self.ready_timeout = ready_timeout
+        self.stop_timeout = stop_timeout
+
+        self.processes: list[subprocess.Popen] = []
+        self._directory: str | None = None
+        self._samples: dict[int, tuple[float, int, int]] = {}
+
+    def __enter__(self):
+        self.start()
+        try:
+            self.wait_ready()
+        except BaseException:
+            self.stop()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _ready_path(self, index: int) -> str:
+        return os.path.join(self._directory, f"ready-{index}")
+
+    def start(self):
+        """Start the server processes"""
+        if self.processes:
+            raise RuntimeError("Servers already started")
+
+        self._directory = tempfile.mkdtemp(prefix="multio-servers-")
+        env = {**os.environ, **self.env, "MULTIO_PLANS": self.server.dump_json()}
+        for index in range(self.count):
+            self.processes.append(
+                subprocess.Popen(
+                    self.command + ["--ready", self._ready_path(index)],
+                    env={**env, SERVER_INDEX_ENVIRON_VAR: str(index)},
+                    start_new_session=True,
+                )
+            )
+
+    def wait_ready(self, timeout: float | None = None):
+        """
+        Wait until every server is ready
+
+        Raises
+        ------
+        RuntimeError
+            If a server exits before being ready
+        TimeoutError
+            If the servers are not all ready in time
+        """
+        deadline = time.monotonic() + (self.ready_timeout if timeout is None else timeout)
+        pending = set(range(len(self.processes)))
+        while pending:
+            for index in list(pending):
+                if os.path.exists(self._ready_path(index)):
+                    pending.discard(index)
+                elif self.processes[index].poll() is not None:
+                    returncode = self.processes[index].returncode
+                    raise RuntimeError(f"Server {index} exited with {returncode} before being ready")
+            if pending and time.monotonic() > deadline:
+                raise TimeoutError(f"Servers {sorted(pending)} not ready in time")
+            if pending:
+                time.sleep(0.05)
+
+    def alive(self) -> bool:
+        """Check if every server is still running"""
+        return bool(self.processes) and all(process.poll() is None for process in self.processes)
+
+    def status(self) -> list[ServerStatus]:
+        """
+        State of every server
+
+        Read and write rates are in bytes per second since the previous call, from /proc
+        """
+        now = time.monotonic()
+        statuses = []
+        for index, process in enumerate(self.processes):
+            status = ServerStatus(index, process.pid, process.poll() is None, process.returncode)
+            counters = _proc_io(process.pid) if status.alive else None
+            if counters is not None:
+                status.read_bytes, status.write_bytes = counters
+                previous = self._samples.get(index)
+                if previous is not None and now > previous[0]:
+                    status.read_rate = (status.read_bytes - previous[1]) / (now - previous[0])
+                    status.write_rate = (status.write_bytes - previous[2]) / (now - previous[0])
+                self._samples[index] = (now, *counters)
+            statuses.append(status)
+        return statuses
+
+    def stop(self):
+        """Stop every server, with SIGTERM then SIGKILL if they do not exit in time"""
+        for process in self.processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+        for process in self.processes:
+            try:
+                process.wait(self.stop_timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+        self.processes = []
+        self._samples.clear()
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+
+def _report_ready(path: str):
+    with open(path, "w"):
+        pass
+
+
+def main(argv: Sequence[str] | None = None):
+    """
+    Run a server with the plan set in MULTIO_PLANS
+
+    The library does not report when a server is listening, as starting it blocks until it is
+    shut down. The ready file is created once the server has been started for `--ready-delay`
+    seconds, so a server failing to set up its transport exits before being reported ready.
+    Clients connecting right after may still race the server, so the delay should cover the
+    setup of the transport.
+    """
+    parser = argparse.ArgumentParser(description="Run a Multio server")
+    parser.add_argument("--ready", help="File to create once the server is started")
+    parser.add_argument(
+        "--ready-delay", type=float, default=1.0, help="Seconds the server runs before it is reported ready"
+    )
+    args = parser.parse_args(argv)
+
+    from .lib import lib
+    from .multio import _Config
+
+    config = _Config(config_path=None, allow_world=None, parent_comm=None, client_comm=None, server_comm=None)
+    if args.ready is not None:
+        timer = threading.Timer(args.ready_delay, _report_ready, (args.ready,))
+        timer.daemon = True
+        timer.start()
+    lib.multio_start_server(config.config_pointer)
+
+
+__all__ = ["ServerStatus", "ServerSupervisor"]
+
+
+if __name__ == "__main__":
+    main()
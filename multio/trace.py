@@ -0,0 +1,213 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Chrome trace-event export of the calls made to Multio.
+
+Traces can be opened with Perfetto (https://ui.perfetto.dev) or chrome://tracing.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Iterable
+
+DEFAULT_MAX_EVENTS = 1_000_000
+
+
+class Tracer:
+    """
+    Record a span per call to a `Multio` handle, and per call into the C library.
+
+    Spans are kept in a bounded buffer, dropping the oldest once full, and written
+    as Chrome trace-event JSON when closed and at exit. The span of each `Multio` call
+    carries the time spent in the library separately from the time spent in python,
+    e.g. converting data and metadata.
+
+    Examples
+    --------
+    ```python
+    tracer = Tracer("multio-trace.json")
+    with Multio(observers=[tracer]) as mio:
+        mio.write_field(metadata, values)
+    ```
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike | None = None,
+        max_events: int = DEFAULT_MAX_EVENTS,
+        native: bool = True,
+    ):
+        """
+        Create a Tracer
+
+        Parameters
+        ----------
+        path : str | os.PathLike, optional
+            File to write the trace to, at exit and when closed
+        max_events : int, optional
+            Number of spans kept in memory
+        native : bool, optional
+            Also trace every call into the C library
+        """
+        self.path = None if path is None else os.fspath(path)
+        self.events: deque[dict[str, Any]] = deque(maxlen=max_events)
+        self.recorded = 0
+
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._threads: dict[int, str] = {}
+        self._local = threading.local()
+        self._lib: Any = None
+
+        if native:
+            self.install()
+        if self.path is not None:
+            atexit.register(self.write)
+
+    @property
+    def dropped(self) -> int:
+        """Number of spans dropped from the buffer"""
+        return self.recorded - len(self.events)
+
+    def _span(self, name: str, category: str, start: float, end: float, args: dict[str, Any] | None = None):
+        tid = threading.get_ident()
+        if tid not in self._threads:
+            self._threads[tid] = threading.current_thread().name
+
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "pid": self._pid,
+            "tid": tid,
+            "ts": (start - self._origin) * 1e6,
+            "dur": (end - start) * 1e6,
+        }
+        if args:
+            event["args"] = args
+        self.events.append(event)
+        self.recorded += 1
+
+    def install(self, lib: Any = None):
+        """
+        Trace the calls into the C library
+
+        Parameters
+        ----------
+        lib : PatchedLib, optional
+            Library to trace, defaults to the one loaded by multio
+        """
+        if lib is None:
+            from .lib import lib
+        if hasattr(lib, "tracer"):
+            lib.tracer = self
+            self._lib = lib
+
+    def uninstall(self, lib: Any = None):
+        """Stop tracing the calls into the C library"""
+        if lib is None:
+            lib = self._lib
+        if lib is None:
+            from .lib import lib
+        if getattr(lib, "tracer", None) is self:
+            lib.tracer = None
+        if lib is self._lib:
+            self._lib = None
+
+    def native(self, name: str, start: float, end: float):
+        """
+        Record a call into the C library
+
+        Parameters
+        ----------
+        name : str
+            Name of the C function
+        start : float
+            `time.perf_counter()` before the call
+        end : float
+            `time.perf_counter()` after the call
+        """
+        pending = getattr(self._local, "native", None)
+        if pending is None:
+            pending = self._local.native = deque(maxlen=1024)
+        pending.append((start, end))
+        self._span(name, "native", start, end)
+
+    def record(self, method: str, metadata: Any, seconds: float, sent: Iterable[tuple[int, bool]] = ()):
+        """Record a call to a `Multio` handle, see `Metrics.record`"""
+        end = time.perf_counter()
+        start = end - seconds
+
+        pending = getattr(self._local, "native", None)
+        native = 0.0
+        if pending:
+            native = sum(call_end - call_start for call_start, call_end in pending if call_start >= start)
+            pending.clear()
+
+        sent = list(sent)
+        self._span(
+            method,
+            "multio",
+            start,
+            end,
+            {
+                "native_us": native * 1e6,
+                "python_us": (seconds - native) * 1e6,
+                "fields": len(sent),
+                "bytes": sum(nbytes for nbytes, _ in sent),
+                "copies": sum(1 for _, zero_copy in sent if not zero_copy),
+            },
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        """Trace in the Chrome trace-event format"""
+        threads = [
+            {"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": name}}
+            for tid, name in list(self._threads.items())
+        ]
+        return {
+            "traceEvents": threads + list(self.events),
+            "displayTimeUnit": "ms",
+            "otherData": {"dropped": self.dropped},
+        }
+
+    def write(self, path: str | os.PathLike | None = None):
+        """
+        Write the trace
+
+        Parameters
+        ----------
+        path : str | os.PathLike, optional
+            File to write to, defaults to the path of the tracer
+        """
+        path = self.path if path is None else path
+        if path is None:
+            return
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+
+    def close(self):
+        """
+        Stop tracing the calls into the C library and write the trace
+
+        The buffer is kept, so that later writes contain all spans.
+        """
+        if self._lib is not None:
+            self.uninstall(self._lib)
+        if self.path is not None:
+            atexit.unregister(self.write)
+        self.write()
+
+
+__all__ = ["Tracer"]
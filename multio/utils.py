@@ -7,7 +7,9 @@
 
 from __future__ import annotations
 
+import hashlib
 import os
+from collections import OrderedDict
 from contextlib import ContextDecorator
 
 from .plans.plans import Client, Collection, Server
@@ -15,37 +17,81 @@ from .plans.plans import Client, Collection, Server
 FILE = os.PathLike
 
 
-def parse_plan_from_str(plan: str) -> dict:
+def _yaml_loader():
+    """Fastest available safe YAML loader, libyaml if present"""
+    import yaml
+
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def _read_plan(plan: FILE | str) -> tuple[str, str]:
+    """
+    Read a plan given as a path or a string
+
+    Returns
+    -------
+    tuple[str, str]
+        Text of the plan, and its format, 'json' or 'yaml'
+    """
+    if isinstance(plan, os.PathLike) or ("\n" not in plan and os.path.isfile(plan)):
+        with open(plan) as f:
+            text = f.read()
+        return text, "json" if os.fspath(plan).endswith(".json") else "yaml"
+
+    return plan, "json" if plan.lstrip().startswith(("{", "[")) else "yaml"
+
+
+def _load_plan(text: str, kind: str) -> dict:
+    import json
+
+    import yaml
+
+    parsed = None
+    if kind == "json":
+        try:
+            parsed = json.loads(text)
+        except json.JSONDecodeError:
+            # Flow style YAML also starts with a brace
+            pass
+    if parsed is None:
+        parsed = yaml.load(text, Loader=_yaml_loader())
+
+    if not isinstance(parsed, dict):
+        raise ValueError(f"Plan must be a mapping, not {type(parsed).__name__}")
+    return parsed
+
+
+def parse_plan_from_str(plan: FILE | str) -> dict:
     """
     Parse a plan from a string
 
     Parameters
     ----------
-    plan : str
-        Plan to be parsed
+    plan : FILE | str
+        Plan to be parsed, a path to a YAML or JSON file, or a YAML or JSON string
 
     Returns
     -------
     dict
         Parsed plan
     """
-    import json
+    try:
+        return _load_plan(*_read_plan(plan))
+    except Exception as e:
+        raise ValueError(f"Invalid plan, could not parse {plan}") from e
 
-    import yaml
 
-    methods = [
-        lambda x: yaml.safe_load(open(x)),
-        lambda x: json.load(open(x)),
-        lambda x: yaml.safe_load(x),
-        lambda x: json.load(x),
-    ]
-    for method in methods:
-        try:
-            return method(plan)
-        except Exception:
-            pass
+def _config_from_dict(plan: dict) -> Client | Server | Collection:
+    if "transport" in plan:
+        return Server(**plan)
+    elif "plans" in plan:
+        return Client(**plan)
+    return Collection(**plan)
 
-    raise ValueError(f"Invalid plan, could not parse {plan}")
+
+# Plans given as text, keyed by a hash of the text, holding the validated config and its JSON
+_PLAN_CACHE: OrderedDict[str, tuple[Client | Server | Collection, str]] = OrderedDict()
+_PLAN_CACHE_SIZE = 32
 
 
 class MultioPlan(ContextDecorator):
@@ -54,10 +100,18 @@ class MultioPlan(ContextDecorator):
 
     Will record state of the MULTIO_PLANS environment variable
     and revert it to its original state when exiting the context.
+
+    The plan is serialised on first entry, and reused on later entries as long as the
+    plan is unchanged. Plans given as text are also cached across instances by content,
+    so the same plan is only parsed, validated and serialised once, and each instance
+    gets its own copy of the plan.
     """
 
     _prior_plan = None
     _config = None
+    _json = None
+    # Plan as it was serialised to `_json`, never modified
+    _serialised = None
 
     _environ_var = "MULTIO_PLANS"
 
@@ -78,22 +132,39 @@ class MultioPlan(ContextDecorator):
         self._environ_var = "MULTIO_PLANS"
 
         if isinstance(plan, (os.PathLike, str)):
-            plan = parse_plan_from_str(plan)
+            text, kind = _read_plan(plan)
+            key = hashlib.sha256(text.encode()).hexdigest()
 
-        if isinstance(plan, dict):
-            if "transport" in plan:
-                plan = Server(**plan)
-            elif "plans" in plan:
-                plan = Client(**plan)
+            if key in _PLAN_CACHE:
+                _PLAN_CACHE.move_to_end(key)
             else:
-                plan = Collection(**plan)
+                try:
+                    parsed = _load_plan(text, kind)
+                except Exception as e:
+                    raise ValueError(f"Invalid plan, could not parse {plan}") from e
+
+                config = _config_from_dict(parsed)
+                _PLAN_CACHE[key] = (config, config.dump_json())
+                if len(_PLAN_CACHE) > _PLAN_CACHE_SIZE:
+                    _PLAN_CACHE.popitem(last=False)
+
+            self._serialised, self._json = _PLAN_CACHE[key]
+            self._config = self._serialised.model_copy(deep=True)
+            return
+
+        if isinstance(plan, dict):
+            plan = _config_from_dict(plan)
 
         self._config = plan
 
     def set_plan(self):
         """Set plan in the environment"""
+        if self._json is None or self._config != self._serialised:
+            self._serialised = self._config.model_copy(deep=True)
+            self._json = self._serialised.dump_json()
+
         self._prior_plan = os.environ.get(self._environ_var, None)
-        os.environ[self._environ_var] = self._config.dump_json()
+        os.environ[self._environ_var] = self._json
 
     def revert_plan(self):
         """Revert plan to the original state"""
@@ -0,0 +1,39 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import pytest
+
+
+class Calls:
+    """Observer recording the method and metadata of every call to a handle"""
+
+    def __init__(self):
+        self.calls = []
+
+    def record(self, method, metadata, seconds, sent=()):
+        self.calls.append((method, None if metadata is None else metadata.to_dict()))
+
+    def values(self, key):
+        """Method and value of a metadata key of every call"""
+        return [(method, None if metadata is None else metadata.get(key)) for method, metadata in self.calls]
+
+
+@pytest.fixture
+def calls():
+    return Calls()
+
+
+@pytest.fixture
+def handle(calls):
+    """Create handles without plans, observed by `calls`"""
+    import multio
+
+    def create(**kwargs):
+        with multio.MultioPlan({"plans": []}):
+            return multio.Multio(observers=[calls], **kwargs)
+
+    return create
@@ -0,0 +1,49 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import numpy as np
+import pytest
+
+from multio import GlobalAssembler
+
+MAPS = {0: [0, 2, 4], 1: [1, 3], 2: [5]}
+FIELD = np.arange(6, dtype=np.float64)
+
+
+def test_assemble():
+    assembler = GlobalAssembler(MAPS)
+    assert assembler.global_size == 6
+    assert assembler.complete
+
+    parts = {partition: FIELD[indices] for partition, indices in MAPS.items()}
+    np.testing.assert_array_equal(assembler.assemble(parts), FIELD)
+
+
+def test_assemble_into_preallocated():
+    assembler = GlobalAssembler(list(MAPS.values()))
+    out = np.zeros(6, dtype=np.float32)
+    result = assembler.assemble([FIELD[indices] for indices in MAPS.values()], out=out)
+    assert result is out
+    np.testing.assert_array_equal(out, FIELD)
+
+    with pytest.raises(ValueError):
+        assembler.assemble([FIELD[indices] for indices in MAPS.values()], out=np.zeros(5))
+
+
+def test_scatter_and_concatenated_roundtrip():
+    assembler = GlobalAssembler(MAPS)
+    parts = assembler.scatter(FIELD)
+    np.testing.assert_array_equal(parts[0], [0.0, 2.0, 4.0])
+    np.testing.assert_array_equal(assembler.assemble_concatenated(np.concatenate(list(parts.values()))), FIELD)
+
+
+def test_incomplete_and_overlapping_maps():
+    assert not GlobalAssembler({0: [0, 1]}, global_size=4).complete
+    with pytest.raises(ValueError):
+        GlobalAssembler({0: [0, 1], 1: [1, 2]})
+    with pytest.raises(ValueError):
+        GlobalAssembler({0: [0, 5]}, global_size=4)
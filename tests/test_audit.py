@@ -0,0 +1,100 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import warnings
+
+import numpy as np
+import pytest
+
+import multio
+from multio import CopyAudit, CopyWarning, audit
+
+
+@pytest.fixture
+def mio():
+    with multio.MultioPlan({"plans": []}):
+        yield multio.Multio(copy_audit=CopyAudit(warn=False))
+
+
+def reasons(mio):
+    return [record.reason for record in mio._copy_audit.records.values()]
+
+
+def test_zero_copy_not_recorded(mio):
+    mio.write_field({"param": "2t"}, np.zeros(10))
+    mio.write_field({"param": "2t"}, np.zeros(10, dtype=np.float32))
+    mio.write_domain({"name": "grid"}, np.arange(10, dtype=np.intc))
+    mio.write_grib(b"GRIB7777")
+    mio.write_grib(np.frombuffer(b"GRIB7777", dtype=np.uint8))
+    assert mio._copy_audit.copies == 0
+    assert mio.metrics()["methods"]["write_grib"]["bytes"] == 16
+
+
+@pytest.mark.parametrize(
+    "data, reason",
+    [
+        ([0.0] * 10, "container list"),
+        (np.zeros(10, dtype=np.int64), "dtype int64 instead of float64"),
+        (np.zeros(20)[::2], "non-contiguous array"),
+    ],
+)
+def test_copy_reasons(mio, data, reason):
+    mio.write_field({"param": "2t"}, data)
+    assert reasons(mio) == [reason]
+    assert mio._copy_audit.bytes == 80
+
+
+def test_domain_dtype(mio):
+    mio.write_domain({"name": "grid"}, np.arange(10, dtype=np.int64))
+    assert reasons(mio) == ["dtype int64 instead of int32"]
+
+
+def test_grib_copies(mio):
+    mio.write_grib(np.frombuffer(b"GRIB7777GRIB7777", dtype=np.uint8)[::2])
+    mio.write_grib([71, 82, 73, 66])
+    assert reasons(mio) == ["non-contiguous buffer", "container list"]
+    assert mio._copy_audit.bytes == 12
+
+
+def test_counts_per_call_site(mio):
+    for _ in range(3):
+        mio.write_field({"param": "2t"}, [0.0] * 10)
+    (record,) = mio._copy_audit.records.values()
+    assert record.count == 3
+    assert record.filename == __file__
+    assert "test_audit.py" in mio._copy_audit.report()
+
+
+def test_call_site_next_to_package():
+    # A directory named like the package, e.g. multio-scripts, is not part of it
+    filename = audit._PACKAGE_DIRECTORY + "-scripts/run.py"
+    namespace = {"_call_site": audit._call_site}
+    exec(compile("site = _call_site()", filename, "exec"), namespace)
+    assert namespace["site"] == (filename, 1)
+
+
+def test_warns_once_per_call_site():
+    with multio.MultioPlan({"plans": []}):
+        mio = multio.Multio(copy_audit=True)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            for _ in range(3):
+                mio.write_field({"param": "2t"}, [0.0] * 10)
+
+    assert len(caught) == 1
+    assert caught[0].category is CopyWarning
+    assert caught[0].filename == __file__
+    assert "80 bytes" in str(caught[0].message)
+
+
+def test_from_environ(monkeypatch):
+    monkeypatch.delenv("MULTIO_COPY_AUDIT", raising=False)
+    assert CopyAudit.from_environ() is None
+    monkeypatch.setenv("MULTIO_COPY_AUDIT", "count")
+    assert CopyAudit.from_environ().warn is False
+    monkeypatch.setenv("MULTIO_COPY_AUDIT", "warn")
+    assert CopyAudit.from_environ().warn is True
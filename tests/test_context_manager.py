@@ -5,6 +5,11 @@
 # granted to it by virtue of its status as an intergovernmental organisation
 # nor does it submit to any jurisdiction.
 
+import json
+import os
+
+import pytest
+
 from multio import MultioPlan, plans
 
 
@@ -46,3 +51,59 @@ def test_from_file(tmp_path):
     test_plan = MultioPlan(str(tmp_path))
     assert isinstance(test_plan, MultioPlan)
     assert test_plan._config == test_config
+
+
+def test_from_json_file(tmp_path):
+    test_config = plans.Client(plans=[plans.Plan(name="test")])
+
+    tmp_path = tmp_path / "test.json"
+    test_config.write(str(tmp_path), format="json")
+
+    test_plan = MultioPlan(tmp_path)
+    assert test_plan._config == test_config
+
+
+def test_invalid_plan():
+    with pytest.raises(ValueError):
+        MultioPlan("- not\n- a plan\n")
+
+
+def test_text_plan_cached():
+    test_config = plans.Client(plans=[plans.Plan(name="cached")])
+    first = MultioPlan(test_config.dump_yaml())
+    second = MultioPlan(test_config.dump_yaml())
+    assert second._json is first._json
+    # Each instance may modify its own plan
+    assert second._config == first._config
+    assert second._config is not first._config
+
+    second._config.plans[0].name = "changed"
+    assert MultioPlan(test_config.dump_yaml())._config == test_config
+
+
+def test_plan_serialised_once():
+    test_config = plans.Client(plans=[plans.Plan(name="test")])
+    test_plan = MultioPlan(test_config)
+    with test_plan:
+        serialised = test_plan._json
+        assert os.environ["MULTIO_PLANS"] == serialised
+    with test_plan:
+        assert test_plan._json is serialised
+    assert json.loads(serialised) == test_config.dump()
+
+
+def test_plan_serialised_again_when_changed():
+    test_config = plans.Client(plans=[plans.Plan(name="test")])
+    test_plan = MultioPlan(test_config)
+    with test_plan:
+        pass
+    test_config.plans[0].name = "changed"
+    with test_plan:
+        assert json.loads(os.environ["MULTIO_PLANS"])["plans"][0]["name"] == "changed"
+
+
+def test_plan_serialised_as_json():
+    # NaN is kept, where pydantic would write null
+    plan = plans.Plan(name="test", actions=[{"type": "mask", "missing_value": float("nan")}])
+    test_config = plans.Client(plans=[plan])
+    assert test_config.dump_json() == json.dumps(test_config.dump())
@@ -0,0 +1,109 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import numpy as np
+import pytest
+
+from multio.dataset import DatasetMapping, DatasetWriter
+
+xr = pytest.importorskip("xarray")
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def write_field(self, metadata, data):
+        self.calls.append(("write_field", metadata, np.array(data)))
+
+    def flush(self, metadata):
+        self.calls.append(("flush", metadata, None))
+
+
+MAPPING = DatasetMapping(
+    metadata={"category": "ml"},
+    variables={"t": {"param": "t"}, "z": {"param": "z"}},
+    coords={"step": "step", "level": ("levelist", int)},
+    attrs={"units": "units"},
+    field_dims=("values",),
+)
+
+
+@pytest.fixture
+def dataset():
+    return xr.Dataset(
+        {
+            "t": (("step", "level", "values"), np.arange(30, dtype=np.float64).reshape(3, 2, 5), {"units": "K"}),
+            "z": (("values",), np.ones(5)),
+            "unmapped": (("values",), np.zeros(5)),
+        },
+        coords={"step": [0, 6, 12], "level": [500, 850]},
+        attrs={"units": "1"},
+    )
+
+
+def check(calls):
+    fields = [call for call in calls if call[0] == "write_field"]
+    assert [call[1].get("param") for call in fields] == ["t", "z"] + ["t"] * 5
+    assert fields[0][1] == {"category": "ml", "units": "K", "param": "t", "step": 0, "levelist": 500, "globalSize": 5}
+    assert fields[1][1] == {"category": "ml", "units": "1", "param": "z", "globalSize": 5}
+    np.testing.assert_array_equal(fields[-1][2], np.arange(25, 30))
+
+    flushes = [call[1] for call in calls if call[0] == "flush"]
+    assert flushes == [{"category": "ml", "step": step} for step in (0, 6, 12)]
+    # Every flush follows the fields of its step
+    assert calls[3] == ("flush", {"category": "ml", "step": 0}, None)
+
+
+@pytest.mark.parametrize("prefetch", (0, 1, 2))
+def test_in_memory(dataset, prefetch):
+    mio = Recorder()
+    DatasetWriter(mio, MAPPING, prefetch=prefetch).write(dataset, flush_dim="step")
+    check(mio.calls)
+
+
+def test_chunked(dataset):
+    pytest.importorskip("dask")
+    mio = Recorder()
+    writer = DatasetWriter(mio, MAPPING)
+    writer.write(dataset.chunk({"step": 1, "level": 1}), flush_dim="step")
+    check(mio.calls)
+    assert writer.fields == 7
+
+
+@pytest.mark.parametrize("chunks", ({"step": 2, "level": 1}, {"step": 2}, {"level": 1}))
+def test_mixed_chunks(dataset, chunks):
+    pytest.importorskip("dask")
+    mio = Recorder()
+    DatasetWriter(mio, MAPPING).write(dataset.chunk(chunks), flush_dim="step")
+    check(mio.calls)
+
+    steps = [call[1]["step"] for call in mio.calls if call[0] == "write_field" and "step" in call[1]]
+    assert steps == [0, 0, 6, 6, 12, 12]
+
+
+def test_all_variables_by_default(dataset):
+    mio = Recorder()
+    DatasetWriter(mio, {"field_dims": ["values"]}).write(dataset)
+    assert len(mio.calls) == 8
+    assert all(call[1] == {"globalSize": 5} for call in mio.calls)
+
+
+def test_variables_without_field_dims(dataset):
+    dataset["step_bounds"] = (("step", "nb"), np.zeros((3, 2)))
+
+    mio = Recorder()
+    DatasetWriter(mio, {"field_dims": ["values"]}).write(dataset)
+    assert len(mio.calls) == 8
+
+    with pytest.raises(ValueError, match="step_bounds does not have the field dimensions"):
+        DatasetWriter(Recorder(), {"variables": {"step_bounds": {}}, "field_dims": ["values"]}).write(dataset)
+
+
+def test_flush_dim_must_be_written(dataset):
+    with pytest.raises(ValueError, match="Can not flush by time"):
+        DatasetWriter(Recorder(), MAPPING).write(dataset, flush_dim="time")
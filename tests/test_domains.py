@@ -0,0 +1,94 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import os
+
+import numpy as np
+import pytest
+
+from multio import DecompositionCache, GlobalAssembler, local_to_global
+from multio.domains import decompose, grid_pl
+
+
+def test_grid_pl():
+    name, pl = grid_pl("O4")
+    assert name == "O4"
+    np.testing.assert_array_equal(pl, [20, 24, 28, 32, 32, 28, 24, 20])
+
+    name, pl = grid_pl("F2")
+    assert pl.tolist() == [8, 8, 8, 8]
+
+    name, pl = grid_pl((3, 5))
+    assert name == "LL3x5"
+    assert pl.sum() == 15
+
+    with pytest.raises(ValueError):
+        grid_pl("N320")
+
+
+@pytest.mark.parametrize("grid", ["O16", "F8", (19, 36), [4, 8, 12, 8, 4]])
+@pytest.mark.parametrize("scheme", ["bands", "checkerboard"])
+@pytest.mark.parametrize("nparts", [1, 3, 4, 7])
+def test_partitions_cover_grid(grid, scheme, nparts):
+    maps = [decompose(grid, nparts, rank, scheme) for rank in range(nparts)]
+    assert all(indices.dtype == np.intc for indices in maps)
+
+    assembler = GlobalAssembler(maps, global_size=int(grid_pl(grid)[1].sum()))
+    assert assembler.complete
+
+
+def test_balance():
+    # Partitions differ by at most a row either side
+    widest = grid_pl("O80")[1].max()
+    for scheme in ("bands", "checkerboard"):
+        sizes = [decompose("O80", 9, rank, scheme).size for rank in range(9)]
+        assert max(sizes) - min(sizes) <= 2 * widest
+
+
+def test_checkerboard_splits_rows():
+    indices = decompose((4, 8), 4, 0, "checkerboard")
+    assert indices.tolist() == [0, 1, 2, 3, 8, 9, 10, 11]
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        decompose("O16", 4, 4)
+    with pytest.raises(ValueError):
+        decompose("O16", 4, 0, "spiral")
+
+
+def test_cache(tmp_path):
+    cache = DecompositionCache(tmp_path)
+    indices = cache.get("O16", 4, 1, "checkerboard")
+
+    path = cache.path("O16", 4, 1, "checkerboard")
+    assert os.path.exists(path)
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+    cached = local_to_global("O16", 4, 1, "checkerboard", cache=cache)
+    np.testing.assert_array_equal(cached, indices)
+    assert cached.dtype == np.intc
+
+
+def test_no_cache_by_default(tmp_path, monkeypatch):
+    monkeypatch.delenv("MULTIO_DECOMPOSITION_CACHE", raising=False)
+    monkeypatch.setenv("HOME", str(tmp_path))
+    local_to_global("F4", 2, 0)
+    assert os.listdir(tmp_path) == []
+
+
+def test_write_domain_int64(handle, calls):
+    # Indices of another integer type are converted for the library
+    with handle() as mio:
+        mio.write_domain({"name": "grid"}, local_to_global("F4", 2, 0).astype(np.int64))
+    assert calls.values("name") == [("write_domain", "grid")]
+
+
+def test_cache_directory_from_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("MULTIO_DECOMPOSITION_CACHE", str(tmp_path))
+    local_to_global("F4", 2, 0)
+    assert os.listdir(tmp_path) == ["F4-bands-2-0.npy"]
@@ -0,0 +1,68 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import pytest
+
+from multio.plans import Client, Collection, FieldSpec, Plan, Server
+from multio.plans.actions import frequency_to_seconds
+
+CATALOGUE = [
+    FieldSpec({"param": "2t", "levtype": "sfc"}, points=100),
+    FieldSpec({"param": "t", "levtype": "ml"}, points=100, levels=[1, 2, 3]),
+]
+
+STATISTICS_PLAN = Plan(
+    name="daily",
+    actions=[
+        {"type": "select", "match": [{"levtype": "ml"}]},
+        {"type": "statistics", "operations": ["average", "maximum"], "output_frequency": "1d"},
+        {"type": "encode", "format": "raw"},
+        {"type": "sink", "sinks": [{"type": "file", "path": "daily.bin", "append": True}]},
+    ],
+)
+
+INSTANT_PLAN = Plan(
+    name="instant",
+    actions=[
+        {"type": "select", "match": [{"param": "2t"}]},
+        {"type": "sink", "sinks": [{"type": "file", "path": "2t.bin", "append": True}]},
+    ],
+)
+
+
+@pytest.mark.parametrize(("frequency", "seconds"), (("5h", 18000), ("10d", 864000), ("1w", 604800)))
+def test_frequency_to_seconds(frequency, seconds):
+    assert frequency_to_seconds(frequency) == seconds
+
+
+def test_invalid_frequency():
+    with pytest.raises(ValueError):
+        frequency_to_seconds("5y")
+
+
+def test_estimate_statistics_plan():
+    result = STATISTICS_PLAN.estimate(CATALOGUE)
+
+    assert result.buffered_fields == 3 * 2
+    assert result.peak_bytes == 3 * 2 * 100 * 8
+    assert result.sinks["file:daily.bin"] == pytest.approx(3 * 2 * 100 * 8 / 24)
+    assert [action.fields_per_step for action in result.actions] == pytest.approx([4, 3, 6 / 24, 6 / 24])
+
+
+def test_estimate_client():
+    result = Client(plans=[STATISTICS_PLAN, INSTANT_PLAN]).estimate([dict(metadata={"param": "2t"}, points=10)])
+    assert result.buffered_fields == 0
+    assert result.sinks == {"file:daily.bin": 0.0, "file:2t.bin": 80.0}
+
+
+def test_estimate_collection():
+    collection = Collection(
+        **{"client": Client(plans=[INSTANT_PLAN]).dump(), "server": Server(transport="mpi").model_dump()}
+    )
+    result = collection.estimate(CATALOGUE, step="2h")
+    assert set(result) == {"client", "server"}
+    assert result["client"].sinks["file:2t.bin"] == 2 * 100 * 8
@@ -0,0 +1,116 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import multiprocessing
+
+import numpy as np
+import pytest
+
+import multio
+from multio import CopyAudit, FanIn
+
+CONTEXT = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+class Recorder:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.views = []
+        self.fail = fail
+
+    def write_field(self, metadata, data):
+        if self.fail:
+            raise ValueError("rejected")
+        self.views.append(not data.flags.owndata)
+        self.calls.append(("write_field", metadata, data.copy()))
+
+    def flush(self, metadata):
+        self.calls.append(("flush", metadata, None))
+
+    def notify(self, metadata):
+        self.calls.append(("notify", metadata, None))
+
+
+def produce(worker, rank, count):
+    for level in range(count):
+        if level % 2:
+            with worker.reserve({"rank": rank, "level": level}, 16, np.float32) as values:
+                values[:] = rank * 100 + level
+        else:
+            worker.write_field({"rank": rank, "level": level}, np.full(16, rank * 100 + level, dtype=np.float64))
+    worker.close()
+
+
+def run(fan_in, processes=3, count=10):
+    context = multiprocessing.get_context(CONTEXT)
+    workers = [context.Process(target=produce, args=(fan_in.worker(), rank, count)) for rank in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+
+def test_fields_from_workers():
+    mio = Recorder()
+    with FanIn(mio, slots=2, slot_bytes=4096, context=CONTEXT) as fan_in:
+        run(fan_in)
+        fan_in.flush({"step": 1})
+        fan_in.wait()
+        assert mio.calls[-1] == ("flush", {"step": 1}, None)
+
+    fields = [call for call in mio.calls if call[0] == "write_field"]
+    assert len(fields) == 30
+    for _, metadata, data in fields:
+        assert data.dtype == (np.float32 if metadata["level"] % 2 else np.float64)
+        assert np.all(data == metadata["rank"] * 100 + metadata["level"])
+    assert all(mio.views)
+    assert fan_in.statistics.fields == 30
+    assert fan_in.statistics.flushes == 1
+
+
+@pytest.mark.filterwarnings("error::pytest.PytestUnraisableExceptionWarning")
+def test_zero_copy_to_library():
+    with multio.MultioPlan({"plans": []}):
+        mio = multio.Multio(copy_audit=CopyAudit(warn=False))
+    with mio, FanIn(mio, slots=4, slot_bytes=4096, context=CONTEXT) as fan_in:
+        run(fan_in, processes=2, count=4)
+        fan_in.notify({"step": 1})
+    write_field = mio.metrics()["methods"]["write_field"]
+    assert write_field["calls"] == 8
+    assert write_field["zero_copies"] == 8
+    assert mio._copy_audit.copies == 0
+
+
+def test_oversized_field():
+    with FanIn(Recorder(), slots=1, slot_bytes=256) as fan_in:
+        with pytest.raises(ValueError, match="does not fit"):
+            fan_in.worker().write_field({"param": "t"}, np.zeros(1024))
+
+
+def test_failed_reserve_frees_slot():
+    mio = Recorder()
+    with FanIn(mio, slots=1, slot_bytes=1024) as fan_in:
+        worker = fan_in.worker()
+        with pytest.raises(KeyError):
+            with worker.reserve({"param": "t"}, 4):
+                raise KeyError("param")
+        # The only slot was freed again, so this does not block
+        worker.write_field({"param": "u"}, np.ones(4))
+        worker.close()
+    assert [call[1] for call in mio.calls] == [{"param": "u"}]
+
+
+def test_writer_error_raised():
+    fan_in = FanIn(Recorder(fail=True), slots=1, slot_bytes=1024)
+    fan_in.start()
+    worker = fan_in.worker()
+    worker.write_field({"param": "t"}, np.ones(4))
+    worker.write_field({"param": "u"}, np.ones(4))
+    worker.close()
+    with pytest.raises(RuntimeError, match="Writing fields"):
+        fan_in.close()
@@ -0,0 +1,106 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import os
+
+import pytest
+
+import multio
+from multio import CopyAudit, GribIngester
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), "..", "example", "test.grib")
+
+
+def grib2(index, size=40):
+    body = bytes([index % 256]) * size
+    return b"GRIB\0\0\0\x02" + (16 + size + 4).to_bytes(8, "big") + body + b"7777"
+
+
+def grib1(index, size=40):
+    body = bytes([index % 256]) * size
+    return b"GRIB" + (8 + size + 4).to_bytes(3, "big") + b"\x01" + body + b"7777"
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def write_grib(self, data):
+        assert isinstance(data, memoryview)
+        self.calls.append(("write_grib", bytes(data)))
+
+    def flush(self, metadata):
+        self.calls.append(("flush", metadata))
+
+
+@pytest.fixture
+def archive(tmp_path):
+    messages = {}
+    for day in range(3):
+        path = tmp_path / f"2024-01-0{day + 1}.grib"
+        messages[path] = [(grib1 if i % 3 == 0 else grib2)(day * 10 + i, size=20 + i) for i in range(10)]
+        # Padding between messages is skipped
+        path.write_bytes(b"".join(message + b"\0" * (i % 2) for i, message in enumerate(messages[path])))
+    return tmp_path, [message for path in sorted(messages) for message in messages[path]]
+
+
+@pytest.mark.parametrize("chunk_bytes", (1, 200, 1 << 20))
+def test_messages_in_order(archive, chunk_bytes):
+    directory, expected = archive
+    mio = Recorder()
+    progress = GribIngester(mio, workers=3, prefetch=2, chunk_bytes=chunk_bytes).run(str(directory / "*.grib"))
+
+    assert [data for kind, data in mio.calls if kind == "write_grib"] == expected
+    assert mio.calls[-1] == ("flush", None)
+    assert progress.files == 3
+    assert progress.messages == 30
+    assert progress.bytes == sum(map(len, expected))
+    assert progress.flushes == 1
+
+
+def test_periodic_flush_and_progress(archive):
+    directory, expected = archive
+    mio = Recorder()
+    reports = []
+    ingester = GribIngester(mio, flush_every=12, flush_metadata={"step": 0}, progress=reports.append, interval=0)
+    progress = ingester.run([directory / "2024-01-01.grib", str(directory / "2024-01-0[23].grib")])
+
+    flushes = [index for index, call in enumerate(mio.calls) if call[0] == "flush"]
+    assert flushes == [12, 25, 32]
+    assert mio.calls[12] == ("flush", {"step": 0})
+    assert progress.flushes == 3
+    assert reports and reports[-1] is progress
+    assert "30 message(s)" in str(progress)
+
+
+def test_truncated_message(tmp_path):
+    path = tmp_path / "truncated.grib"
+    path.write_bytes(grib2(0) + grib2(1)[:-10])
+    with pytest.raises(ValueError, match="truncated GRIB message at 60"):
+        GribIngester(Recorder()).run(path)
+
+
+def test_missing_end(tmp_path):
+    path = tmp_path / "corrupt.grib"
+    path.write_bytes(grib2(0)[:-4] + b"0000")
+    with pytest.raises(ValueError, match="does not end with 7777"):
+        GribIngester(Recorder()).run(path)
+
+
+def test_no_match(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        GribIngester(Recorder()).run(str(tmp_path / "*.grib"))
+
+
+def test_zero_copy_to_library():
+    with multio.MultioPlan({"plans": []}):
+        mio = multio.Multio(copy_audit=CopyAudit(warn=False))
+    with mio:
+        progress = GribIngester(mio).run(EXAMPLE)
+    assert progress.messages == 1
+    assert mio.metrics()["methods"]["write_grib"]["zero_copies"] == 1
+    assert mio._copy_audit.copies == 0
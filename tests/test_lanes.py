@@ -0,0 +1,91 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import time
+
+import numpy as np
+
+import multio
+from multio import PriorityLanes, ReorderBuffer
+
+URGENT = ["2t", "10u", "10v", "msl"]
+
+
+def test_priority_sent_first(handle, calls):
+    lanes = PriorityLanes(params=URGENT, match=[{"levtype": "sfc", "param": "tp"}])
+    mio = handle(lanes=lanes)
+    with mio:
+        for param, levtype in [("t", "ml"), ("2t", "sfc"), ("q", "ml"), ("tp", "sfc"), ("tp", "ml"), ("msl", "sfc")]:
+            mio.write_field({"param": param, "levtype": levtype}, np.ones(8))
+        assert [param for _, param in calls.values("param")] == ["2t", "tp", "msl"]
+        assert len(lanes) == 3
+        mio.flush({"step": 6})
+
+    assert calls.values("param")[3:] == [
+        ("write_field", "t"),
+        ("write_field", "q"),
+        ("write_field", "tp"),
+        ("flush", None),
+    ]
+    assert lanes.statistics.priority == 3
+    assert lanes.statistics.bulk == 3
+    assert lanes.held_bytes == 0
+
+
+def test_bulk_copied():
+    lanes = PriorityLanes(params=URGENT)
+    values = np.zeros(4)
+    assert not lanes.applies({"param": "t"})
+    lanes.add({"param": "t"}, values)
+    values[:] = 1
+    assert np.all(lanes.drain()[0][1] == 0)
+
+
+def test_starvation_by_budget():
+    lanes = PriorityLanes(params=URGENT, max_bytes=2 * 80)
+    released = []
+    for level in range(4):
+        released += lanes.add({"param": "t", "level": level}, np.zeros(10))
+    assert [metadata["level"] for metadata, _ in released] == [0, 1]
+    assert lanes.statistics.starved == 2
+    assert [metadata["level"] for metadata, _ in lanes.drain()] == [2, 3]
+
+
+def test_starvation_by_delay(handle, calls):
+    lanes = PriorityLanes(params=URGENT, max_delay=0.05)
+    mio = handle(lanes=lanes)
+    mio.write_field({"param": "t"}, np.ones(4))
+    mio.write_field({"param": "2t"}, np.ones(4))
+    assert calls.values("param") == [("write_field", "2t")]
+
+    time.sleep(0.06)
+    mio.write_field({"param": "msl"}, np.ones(4))
+    # The bulk field is sent after the priority field that found it starved
+    assert calls.values("param") == [("write_field", "2t"), ("write_field", "msl"), ("write_field", "t")]
+    assert lanes.statistics.starved == 1
+
+
+def test_with_reorder_buffer(handle, calls):
+    lanes = PriorityLanes(params=URGENT)
+    mio = handle(lanes=lanes, reorder=ReorderBuffer(keys=("param",)))
+    for param in ["v", "2t", "u", "msl", "t"]:
+        mio.write_field({"param": param}, np.ones(4))
+    mio.notify({"step": 6})
+    assert [param for _, param in calls.values("param")] == ["2t", "msl", "t", "u", "v", None]
+    # Bulk fields are only held by the reorder buffer
+    assert lanes.statistics.peak_bytes == 0
+
+
+def test_reused_metadata(handle, calls):
+    mio = handle(lanes=PriorityLanes(params=URGENT))
+    md = multio.Metadata(mio, md={"param": "t"})
+    for level in (3, 1, 2):
+        md["level"] = level
+        mio.write_field(md, np.full(4, level))
+    mio.flush()
+
+    assert calls.values("level") == [("write_field", 3), ("write_field", 1), ("write_field", 2), ("flush", None)]
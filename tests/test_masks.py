@@ -0,0 +1,132 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import numpy as np
+import pytest
+
+import multio
+from multio.masks import MaskCache, compact, expand
+
+MASK = np.array([1.0, 0.0, 1.0, 0.0, 0.0, 1.0])
+FIELD = np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+
+
+def test_compact_expand_roundtrip():
+    valid = MASK != 0
+    values = compact(FIELD, valid)
+    np.testing.assert_array_equal(values, [1.0, 3.0, 6.0])
+
+    full = expand(values, valid, missing_value=-1.0)
+    np.testing.assert_array_equal(full, [1.0, -1.0, 3.0, -1.0, -1.0, 6.0])
+
+
+def test_expand_integers():
+    valid = MASK != 0
+    values = np.array([1, 3, 6], dtype=np.int32)
+    with pytest.raises(ValueError, match="can not be stored as int32"):
+        expand(values, valid)
+    np.testing.assert_array_equal(expand(values, valid, missing_value=-1), [1, -1, 3, -1, -1, 6])
+
+
+def test_compaction_requires_keys():
+    compaction = multio.MaskCompaction(keys=("domain",))
+    compaction.register({"name": "lsm"}, MASK)
+    assert not compaction.applies({"param": "2t"}, FIELD)
+
+    compaction.register({"domain": "ocean"}, MASK)
+    assert not compaction.applies({"param": "2t"}, FIELD)
+    assert compaction.applies({"domain": "ocean"}, FIELD)
+
+
+def test_compaction_pairs_mask_by_keys():
+    compaction = multio.MaskCompaction(keys=("domain",))
+    compaction.register({"domain": "ocean"}, MASK)
+
+    assert compaction.applies({"domain": "ocean", "param": "sst"}, FIELD)
+    assert not compaction.applies({"domain": "land"}, FIELD)
+    assert not compaction.applies({"domain": "ocean"}, FIELD[:3])
+
+    values, metadata = compaction.compact({"domain": "ocean"}, FIELD)
+    np.testing.assert_array_equal(values, [1.0, 3.0, 6.0])
+    assert metadata == {"compacted": "mask", "compactedSize": 3}
+    assert compaction.statistics.bytes_saved == 3 * 8
+
+
+def test_compaction_unpacks_mask_once(monkeypatch):
+    compaction = multio.MaskCompaction()
+    compaction.register({"domain": "ocean"}, multio.PackedMask(MASK))
+    monkeypatch.setattr(np, "unpackbits", None)
+    for _ in range(2):
+        values, _ = compaction.compact({"domain": "ocean"}, FIELD)
+        np.testing.assert_array_equal(values, [1.0, 3.0, 6.0])
+
+
+def test_compaction_match():
+    compaction = multio.MaskCompaction(match=[{"param": "sst"}])
+    compaction.register({"domain": "ocean"}, MASK)
+    assert compaction.applies({"domain": "ocean", "param": "sst"}, FIELD)
+    assert not compaction.applies({"domain": "ocean", "param": "2t"}, FIELD)
+
+
+def test_write_field_with_compaction():
+    compaction = multio.MaskCompaction()
+    with multio.Multio(compaction=compaction) as multio_object:
+        multio_object.write_mask({"domain": "ocean"}, MASK)
+        multio_object.write_field({"domain": "ocean"}, FIELD)
+    assert compaction.statistics.fields == 1
+
+
+def test_packed_mask():
+    mask = multio.PackedMask(np.array([True, False, True, False, False, True]))
+    assert len(mask) == 6
+    assert mask.bits.nbytes == 1
+    np.testing.assert_array_equal(mask.valid(), MASK != 0)
+    np.testing.assert_array_equal(mask.as_float(), MASK.astype(np.float32))
+
+
+def test_compaction_2d():
+    compaction = multio.MaskCompaction()
+    compaction.register({"domain": "ocean"}, MASK.reshape(2, 3))
+    assert compaction.applies({"domain": "ocean"}, FIELD.reshape(2, 3))
+    assert not compaction.applies({"domain": "ocean"}, FIELD)
+
+    values, _ = compaction.compact({"domain": "ocean"}, FIELD.reshape(2, 3))
+    np.testing.assert_array_equal(values, [1.0, 3.0, 6.0])
+    assert multio.PackedMask(MASK.reshape(2, 3)).as_float().shape == (6,)
+
+
+def test_mask_cache_reuses_content():
+    cache = MaskCache(maxsize=2)
+    first = cache.get(np.array([1, 0, 1], dtype=np.uint8))
+    assert cache.get(np.array([True, False, True])) is first
+
+    cache.get(np.array([0, 0, 1], dtype=np.uint8))
+    cache.get(np.array([0, 1, 1], dtype=np.uint8))
+    assert len(cache) == 2
+    assert cache.get(np.array([1, 0, 1], dtype=np.uint8)) is not first
+
+
+def test_resent_mask_expanded_once(handle, monkeypatch):
+    unpacked = []
+    unpackbits = np.unpackbits
+    monkeypatch.setattr(np, "unpackbits", lambda *args, **kwargs: unpacked.append(args) or unpackbits(*args, **kwargs))
+
+    sent = []
+    mio = handle()
+    convert = mio._convert
+    monkeypatch.setattr(mio, "_convert", lambda method, ctype, data: sent.append(data) or convert(method, ctype, data))
+    mio.write_mask({"domain": "ocean"}, MASK != 0)
+    mio.write_mask({"domain": "ocean"}, MASK.astype(np.uint8))
+    assert sent[1] is sent[0]
+    assert len(unpacked) == 1
+
+
+def test_write_bool_mask():
+    with multio.Multio() as multio_object:
+        multio_object.write_mask({"domain": "ocean"}, MASK != 0)
+        multio_object.write_mask({"domain": "ocean"}, MASK.astype(np.uint8))
+        multio_object.write_mask({"domain": "ocean"}, multio.PackedMask(MASK))
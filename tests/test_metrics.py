@@ -0,0 +1,149 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import io
+import json
+import urllib.request
+
+import numpy as np
+import pytest
+
+import multio
+from multio import Metrics, PrometheusExporter, StepTracker
+from multio.metrics import Histogram
+
+
+def test_histogram():
+    histogram = Histogram([0.1, 1.0])
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+    assert histogram.cumulative() == [(0.1, 2), (1.0, 3), (float("inf"), 4)]
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(2.65)
+
+
+def test_record():
+    metrics = Metrics()
+    metrics.record("write_field", None, 0.001, [(800, True)])
+    metrics.record("write_field", None, 0.002, [(800, False), (400, True)])
+    metrics.record("write_domain", None, 0.001, [(40, True)])
+
+    snapshot = metrics.snapshot()["methods"]
+    assert snapshot["write_field"]["calls"] == 2
+    assert snapshot["write_field"]["fields"] == 3
+    assert snapshot["write_field"]["bytes"] == 2000
+    assert snapshot["write_field"]["copies"] == 1
+    assert snapshot["write_field"]["zero_copies"] == 2
+    assert snapshot["write_field"]["latency"]["count"] == 2
+    assert "latency" not in snapshot["write_domain"]
+
+
+def test_prometheus_text():
+    metrics = Metrics()
+    metrics.record("write_field", None, 0.001, [(800, True)])
+    metrics.record("flush", None, 0.01)
+
+    text = metrics.to_prometheus(labels={"rank": "3"})
+    assert "# TYPE multio_calls_total counter" in text
+    assert 'multio_bytes_total{rank="3",method="write_field"} 800' in text
+    assert 'multio_buffers_total{rank="3",method="write_field",mode="zero_copy"} 1' in text
+    assert 'multio_latency_seconds_bucket{rank="3",method="flush",le="+Inf"} 1' in text
+    assert 'multio_latency_seconds_count{rank="3",method="write_field"} 1' in text
+
+
+def test_export_to_file(tmp_path):
+    metrics = Metrics()
+    metrics.record("notify", None, 0.001)
+
+    path = tmp_path / "multio.prom"
+    with PrometheusExporter(metrics, path=path, interval=60):
+        pass
+    assert 'multio_calls_total{method="notify"} 1' in path.read_text()
+    assert [p.name for p in tmp_path.iterdir()] == ["multio.prom"]
+
+
+def test_export_over_http():
+    metrics = Metrics()
+    metrics.record("flush", None, 0.001)
+
+    with PrometheusExporter(metrics, port=0) as exporter:
+        host, port = exporter.address
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert 'multio_calls_total{method="flush"} 1' in response.read().decode()
+
+
+def test_exporter_requires_target():
+    with pytest.raises(ValueError):
+        PrometheusExporter(Metrics())
+
+
+def test_multio_metrics():
+    with multio.MultioPlan({"plans": []}):
+        mio = multio.Multio()
+        mio.write_field({"param": "2t"}, np.zeros(10))
+        mio.write_field({"param": "2t"}, [0.0] * 10)
+        mio.flush()
+
+        methods = mio.metrics()["methods"]
+        assert methods["write_field"]["calls"] == 2
+        assert methods["write_field"]["bytes"] == 160
+        assert methods["write_field"]["zero_copies"] == 1
+        assert methods["write_field"]["copies"] == 1
+        assert methods["flush"]["latency"]["count"] == 1
+
+
+def test_step_tracker(tmp_path):
+    path = tmp_path / "steps.jsonl"
+    tracker = StepTracker("step", output=path)
+
+    tracker.record("write_field", {"step": 0}, 0.01, [(800, True)])
+    tracker.record("write_field", {"step": 0}, 0.01, [(800, True)])
+    tracker.record("write_field", {"step": 6}, 0.01, [(400, False)])
+    tracker.record("notify", {"step": 0}, 0.001)
+    tracker.record("flush", {"step": 0}, 0.02)
+
+    assert list(tracker.open) == [6]
+    timeline = tracker.timelines[0]
+    assert timeline.fields == 2
+    assert timeline.bytes == 1600
+    assert timeline.write_seconds == pytest.approx(0.02)
+    assert timeline.flush_seconds == pytest.approx(0.02)
+    assert timeline.notify is not None
+
+    # A flush without the key completes every open step
+    tracker.record("flush", None, 0.01)
+    tracker.close()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["step"] for line in lines] == [0, 6]
+    assert lines[1]["bytes"] == 400
+
+
+def test_step_tracker_close_emits_open_steps():
+    stream = io.StringIO()
+    tracker = StepTracker("step", output=stream)
+    tracker.record("write_field", {"step": 12}, 0.01, [(80, True)])
+    tracker.record("write_field", {"param": "2t"}, 0.01, [(80, True)])
+    tracker.close()
+
+    line = json.loads(stream.getvalue())
+    assert line["step"] == 12
+    assert line["flush_end"] is None
+    assert line["latency"] is None
+
+
+def test_multio_step_tracker():
+    stream = io.StringIO()
+    with multio.MultioPlan({"plans": []}):
+        with multio.Multio(observers=[StepTracker(output=stream)]) as mio:
+            mio.write_field({"step": 1, "param": "2t"}, np.zeros(10))
+            mio.flush({"step": 1})
+
+    line = json.loads(stream.getvalue())
+    assert line["step"] == 1
+    assert line["bytes"] == 80
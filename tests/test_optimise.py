@@ -0,0 +1,73 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import pytest
+
+from multio.plans import Client, Plan, Select, optimise
+from multio.plans.optimise import merge_matches
+
+FILE_SINK = {"type": "file", "path": "output.grib", "append": False}
+
+
+def per_param_plan(param, sinks=(FILE_SINK,)):
+    return Plan(
+        name=f"plan-{param}",
+        actions=[
+            {"type": "print"},
+            {"type": "select", "match": [{"param": param, "levtype": "sfc"}]},
+            {"type": "sink", "sinks": list(sinks)},
+        ],
+    )
+
+
+@pytest.mark.parametrize(
+    ("match", "expected"),
+    (
+        ([{"param": 1}, {"param": 1}], [{"param": 1}]),
+        ([{"param": 1, "level": 1}, {"param": 2, "level": 1}], [{"param": [1, 2], "level": 1}]),
+        ([{"param": [1, 2]}, {"param": 1, "level": 1}], [{"param": [1, 2]}]),
+        ([{"param": 1, "level": 1}, {"param": 2, "level": 2}], [{"param": 1, "level": 1}, {"param": 2, "level": 2}]),
+    ),
+)
+def test_merge_matches(match, expected):
+    assert merge_matches(match) == expected
+
+
+def test_fuse_plans_differing_in_select():
+    config = Client(plans=[per_param_plan(param) for param in ("2t", "msl", "10u")])
+    optimised, report = optimise(config)
+
+    assert len(optimised.plans) == 1
+    assert optimised.plans[0].actions[1].match == [{"param": ["2t", "msl", "10u"], "levtype": "sfc"}]
+    assert report.fused_plans == [["plan-2t", "plan-msl", "plan-10u"]]
+    assert report.actions_before == 9
+    assert report.actions_after == 3
+    assert len(config.plans) == 3
+
+
+def test_plans_with_different_sinks_not_fused():
+    other_sink = {"type": "file", "path": "other.grib", "append": False}
+    config = Client(plans=[per_param_plan("2t"), per_param_plan("msl", sinks=(other_sink,))])
+    optimised, report = config.optimise()
+    assert len(optimised.plans) == 2
+    assert report.fused_plans == []
+
+
+def test_duplicate_sinks_removed():
+    optimised, report = optimise(Client(plans=[per_param_plan("2t", sinks=(FILE_SINK, FILE_SINK))]))
+    assert len(optimised.plans[0].actions[2].sinks) == 1
+    assert report.removed_sinks == 1
+
+
+def test_fused_plan_selects_the_same_fields():
+    config = Client(plans=[per_param_plan(param) for param in ("2t", "msl")])
+    optimised, _ = optimise(config)
+    select = optimised.plans[0].actions[1]
+    assert isinstance(select, Select)
+    for metadata in ({"param": "2t", "levtype": "sfc"}, {"param": "msl", "levtype": "sfc"}, {"param": "2t"}):
+        expected = any(plan.actions[1].matches(metadata) for plan in config.plans)
+        assert select.matches(metadata) is expected
@@ -9,7 +9,7 @@ import pytest
 from pydantic import ValidationError
 
 import multio
-from multio.plans import Client, Plan, Server, actions
+from multio.plans import Client, Plan, PlanBuilder, Server, actions
 
 sample_plan = {
     "plans": [
@@ -95,3 +95,36 @@ def test_action_conversion():
         name="testing", actions=[{"type": "print", "stream": "cout", "prefix": " ++ MULTIO-PRINT-ALL-DEBUG :: "}]
     )
     assert isinstance(plan.actions[0], actions.Print)
+
+
+def test_builder_validates_once():
+    builder = PlanBuilder()
+    for param in range(3):
+        builder.add_plan(f"plan-{param}", [{"type": "select", "match": [{"param": param}]}, {"type": "print"}])
+    config = builder.build()
+
+    assert isinstance(config, Client)
+    assert len(config.plans) == 3
+    assert isinstance(config.plans[2].actions[0], actions.Select)
+
+
+def test_builder_invalid_action():
+    builder = PlanBuilder().add_plan("testing", [{"type": "invalid"}])
+    with pytest.raises(ValidationError):
+        builder.build()
+
+
+def test_builder_trusted():
+    builder = PlanBuilder(Server).add_plan("testing", [actions.Print()])
+    config = builder.build(validate=False, transport="mpi")
+    assert isinstance(config, Server)
+    assert config.transport == "mpi"
+    assert config.dump() == Server(transport="mpi", plans=[Plan(name="testing", actions=[actions.Print()])]).dump()
+
+    with pytest.raises(TypeError):
+        PlanBuilder().add_plan("testing", [{"type": "print"}]).build(validate=False)
+
+
+def test_build_from_rows():
+    config = Client.build_from_rows([{"name": "testing", "actions": [{"type": "print"}]}])
+    assert config == Client(plans=[Plan(name="testing", actions=[{"type": "print"}])])
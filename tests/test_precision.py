@@ -0,0 +1,57 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import numpy as np
+import pytest
+
+import multio
+from multio.plans import Select
+
+
+@pytest.mark.parametrize(
+    ("match", "metadata", "expected"),
+    (
+        ([{"param": "2t"}], {"param": "2t", "level": 0}, True),
+        ([{"param": "2t"}], {"param": "msl"}, False),
+        ([{"param": ["2t", "msl"]}], {"param": "msl"}, True),
+        ([{"param": "2t", "level": 1}], {"param": "2t"}, False),
+        ([{"param": "2t"}, {"level": 1}], {"level": 1}, True),
+        ([{}], {"param": "2t"}, True),
+        ([], {"param": "2t"}, False),
+    ),
+)
+def test_select_matches(match, metadata, expected):
+    assert Select(match=match).matches(metadata) is expected
+
+
+def test_policy_applies():
+    policy = multio.PrecisionPolicy(params=["2t"])
+    assert policy.applies({"param": "2t"}, np.ones(4))
+    assert policy.applies({"param": "2t"}, [1.0, 2.0])
+    assert not policy.applies({"param": "2t"}, np.ones(4, dtype=np.float32))
+    assert not policy.applies({"param": "msl"}, np.ones(4))
+
+
+def test_policy_reduce_pools_buffer():
+    policy = multio.PrecisionPolicy(match=[{}])
+    first = policy.reduce(np.array([1.0, 2.0, 3.0]))
+    assert first.dtype == np.float32
+    np.testing.assert_array_equal(first, [1.0, 2.0, 3.0])
+
+    second = policy.reduce(np.array([4.0, 5.0, 6.0]))
+    assert second is first
+    assert policy.statistics.fields == 2
+    assert policy.statistics.bytes_saved == 2 * 3 * 4
+
+
+def test_write_field_with_policy():
+    policy = multio.PrecisionPolicy(match=[{"category": "custom"}])
+    with multio.Multio(precision_policy=policy) as multio_object:
+        multio_object.write_field({"category": "custom"}, np.array([1.0, 2.0, 3.0, 4.0]))
+        multio_object.write_field({"category": "other"}, np.array([1.0, 2.0, 3.0, 4.0]))
+    assert policy.statistics.fields == 1
+    assert policy.statistics.bytes_saved == 16
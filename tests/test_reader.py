@@ -0,0 +1,91 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import numpy as np
+import pytest
+
+from multio import RawFieldReader
+
+
+@pytest.fixture
+def uniform(tmp_path):
+    fields = np.arange(5 * 8, dtype=np.float32).reshape(5, 8)
+    path = tmp_path / "testFloat.bin"
+    fields.tofile(path)
+    return path, fields
+
+
+def test_uniform_fields(uniform):
+    path, fields = uniform
+    reader = RawFieldReader(path, "single", size=8)
+    assert len(reader) == 5
+    assert isinstance(reader[0], np.memmap)
+    np.testing.assert_array_equal(reader[-1], fields[-1])
+    np.testing.assert_array_equal(reader[1:4], fields[1:4])
+    np.testing.assert_array_equal(reader[2, 3:5], fields[2, 3:5])
+    np.testing.assert_array_equal(reader[::2, 0], fields[::2, 0])
+    np.testing.assert_array_equal(list(reader), fields)
+    np.testing.assert_array_equal(reader.as_array()[:, 1], fields[:, 1])
+    with pytest.raises(IndexError):
+        reader[5]
+
+
+def test_sizes_from_metadata(tmp_path):
+    fields = [np.arange(n, dtype=np.float64) for n in (3, 10, 1)]
+    path = tmp_path / "testDouble.bin"
+    np.concatenate(fields).tofile(path)
+    metadata = [{"name": f"f{i}", "globalSize": len(field)} for i, field in enumerate(fields)]
+
+    reader = RawFieldReader(path, "double", metadata=metadata)
+    np.testing.assert_array_equal(reader.sizes, [3, 10, 1])
+    for (md, values), expected, field in zip(reader.items(), metadata, fields):
+        assert md == expected
+        np.testing.assert_array_equal(values, field)
+    with pytest.raises(ValueError, match="different sizes"):
+        reader.as_array()
+
+
+def test_index_round_trip(uniform):
+    path, fields = uniform
+    reader = RawFieldReader(path, np.float32, size=[16, 8, 16], metadata=[{"step": step} for step in range(3)])
+    index = reader.write_index()
+    assert index == str(path) + ".index.json"
+
+    reopened = RawFieldReader.from_index(path)
+    assert reopened.dtype == np.float32
+    np.testing.assert_array_equal(reopened.offsets, [0, 16, 24, 40])
+    assert reopened.metadata == reader.metadata
+    np.testing.assert_array_equal(reopened[1], fields[2])
+
+
+def test_whole_file_single_field(uniform):
+    path, fields = uniform
+    reader = RawFieldReader(path, "single")
+    assert len(reader) == 1
+    np.testing.assert_array_equal(reader[0], fields.ravel())
+
+
+@pytest.mark.parametrize(
+    ("dtype", "kwargs", "match"),
+    (
+        ("single", {"size": 7}, "not made of fields"),
+        ("single", {"size": [8, 8]}, "add up to 16"),
+        ("single", {"size": 8, "metadata": [{}]}, "1 metadata given for 5 fields"),
+        (np.dtype("S3"), {}, "does not hold"),
+    ),
+)
+def test_mismatched_sizes(uniform, dtype, kwargs, match):
+    with pytest.raises(ValueError, match=match):
+        RawFieldReader(uniform[0], dtype, **kwargs)
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.bin"
+    path.touch()
+    reader = RawFieldReader(path, size=[])
+    assert len(reader) == 0
+    assert reader.as_array().shape == (0, 0)
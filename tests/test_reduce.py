@@ -0,0 +1,77 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+import multio
+from multio.plans import Statistics
+
+
+def test_reduce_daily():
+    reducer = multio.StreamingStatistics(["average", "maximum"], "1d")
+    outputs = []
+    for step in range(1, 49):
+        outputs.extend(
+            (metadata, values.copy()) for metadata, values in reducer.update({"param": "2t", "step": step}, [step, 0.0])
+        )
+
+    assert [metadata["step"] for metadata, _ in outputs] == [24, 24, 48, 48]
+    assert [metadata["operation"] for metadata, _ in outputs] == ["average", "maximum"] * 2
+    np.testing.assert_array_equal(outputs[0][1], [12.5, 0.0])
+    np.testing.assert_array_equal(outputs[3][1], [48.0, 0.0])
+    assert reducer.statistics.fields_in == 48
+    assert reducer.statistics.fields_out == 4
+    assert reducer.nbytes == 2 * 2 * 8
+
+
+def test_reduce_fields_separately():
+    reducer = multio.StreamingStatistics(["accumulate"], "2h")
+    reducer.update({"param": "tp", "step": 1}, [1.0])
+    reducer.update({"param": "cp", "step": 1}, [10.0])
+    [(metadata, values)] = reducer.update({"param": "tp", "step": 2}, [2.0])
+    assert metadata == {"param": "tp", "step": 2, "operation": "accumulate"}
+    np.testing.assert_array_equal(values, [3.0])
+
+
+def test_reduce_from_action():
+    reducer = multio.StreamingStatistics.from_action(
+        Statistics(operations=["minimum"], output_frequency="6h"), match=[{"param": "2t"}]
+    )
+    assert reducer.applies({"param": "2t"})
+    assert not reducer.applies({"param": "msl"})
+
+
+def test_reduce_invalid_operation():
+    with pytest.raises(ValidationError):
+        multio.StreamingStatistics(["median"], "1d")
+
+
+def test_write_field_with_reducer():
+    reducer = multio.StreamingStatistics(["average"], "2h", match=[{"category": "custom"}])
+    with multio.Multio(reducer=reducer) as multio_object:
+        for step in (1, 2):
+            multio_object.write_field({"category": "custom", "step": step}, np.array([1.0, 2.0, 3.0, 4.0]))
+    assert reducer.statistics.fields_out == 1
+
+
+@pytest.mark.parametrize("partial", (False, True))
+def test_partial_window_on_close(handle, calls, partial):
+    reducer = multio.StreamingStatistics(["average"], "6h", partial=partial)
+    with handle(reducer=reducer) as mio:
+        for step in range(1, 10):
+            mio.write_field({"param": "2t", "step": step}, np.full(4, float(step)))
+
+    if partial:
+        assert reducer.statistics.fields_out == 2
+        assert calls.calls[-1] == ("write_field", {"param": "2t", "step": 9, "operation": "average"})
+        assert reducer.statistics.discarded == 0
+    else:
+        assert reducer.statistics.fields_out == 1
+        assert reducer.statistics.discarded == 1
+    assert reducer.nbytes == 0
@@ -0,0 +1,92 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import numpy as np
+import pytest
+
+import multio
+from multio import ReorderBuffer
+
+
+def test_sorted_by_keys():
+    buffer = ReorderBuffer(keys=("param", "level"))
+    order = [("t", 850), ("u", 500), ("t", 500), (None, 1), ("2t", None), ("u", 500)]
+    for index, (param, level) in enumerate(order):
+        assert buffer.add({"param": param, "level": level, "index": index}, np.full(4, index)) == []
+
+    assert len(buffer) == 6
+    assert buffer.held_bytes == 6 * 4 * 8
+    drained = buffer.drain()
+    assert [metadata["index"] for metadata, _ in drained] == [4, 2, 0, 1, 5, 3]
+    assert all(np.all(values == metadata["index"]) for metadata, values in drained)
+    assert len(buffer) == 0
+    assert buffer.drain() == []
+
+
+def test_copies_data():
+    buffer = ReorderBuffer()
+    values = np.zeros(4)
+    buffer.add({"param": "t"}, values)
+    values[:] = 1
+    assert np.all(buffer.drain()[0][1] == 0)
+
+
+def test_over_budget():
+    buffer = ReorderBuffer(keys=("level",), max_bytes=3 * 80)
+    released = []
+    for level in (5, 4, 3, 2, 1):
+        released += buffer.add({"level": level}, np.zeros(10))
+    assert [metadata["level"] for metadata, _ in released] == [2, 3, 4, 5]
+    assert [metadata["level"] for metadata, _ in buffer.drain()] == [1]
+    assert buffer.statistics.overflows == 1
+    assert buffer.statistics.peak_bytes == 4 * 80
+
+
+def test_handle_sends_sorted_on_flush(handle, calls):
+    mio = handle(reorder=ReorderBuffer(keys=("param", "level")))
+    with mio:
+        for param, level in [("v", 1), ("t", 2), ("v", 0), ("t", 1)]:
+            mio.write_field({"param": param, "level": level, "step": 6}, np.ones(8))
+        assert calls.calls == []
+        mio.flush({"step": 6})
+        mio.write_field({"param": "t", "level": 0, "step": 12}, np.ones(8))
+
+    sent = [(method, metadata.get("param"), metadata.get("level")) for method, metadata in calls.calls]
+    assert sent == [
+        ("write_field", "t", 1),
+        ("write_field", "t", 2),
+        ("write_field", "v", 0),
+        ("write_field", "v", 1),
+        ("flush", None, None),
+        # Sent when the handle is closed
+        ("write_field", "t", 0),
+    ]
+    assert mio.metrics()["methods"]["write_field"]["calls"] == 5
+
+
+@pytest.mark.parametrize("method", ("notify", "write_mask", "write_domain"))
+def test_sent_before(handle, calls, method):
+    mio = handle(reorder=ReorderBuffer())
+    mio.write_field({"param": "t"}, np.ones(4))
+    data = np.ones(4, dtype=np.intc) if method == "write_domain" else np.ones(4)
+    if method == "notify":
+        mio.notify({"step": 1})
+    else:
+        getattr(mio, method)({"name": "grid"}, data)
+    assert [call[0] for call in calls.calls] == ["write_field", method]
+
+
+def test_reused_metadata(handle, calls):
+    mio = handle(reorder=ReorderBuffer(keys=("level",)))
+    md = multio.Metadata(mio, md={"param": "t"})
+    for level in (3, 1, 2):
+        md["level"] = level
+        mio.write_field(md, np.full(4, level))
+    mio.flush()
+
+    sent = [metadata for method, metadata in calls.calls if method == "write_field"]
+    assert [metadata["level"] for metadata in sent] == [1, 2, 3]
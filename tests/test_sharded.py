@@ -0,0 +1,86 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import numpy as np
+import pytest
+
+import multio
+from multio import ShardedMultio
+from multio.plans import Collection, Server
+
+NO_PLANS = {"plans": []}
+
+
+@pytest.fixture
+def sharded():
+    return ShardedMultio([NO_PLANS] * 4, keys=("param", "level"))
+
+
+def test_routing_is_stable(sharded):
+    other = ShardedMultio([NO_PLANS] * 4, keys=("param", "level"))
+    for level in range(1, 138):
+        metadata = {"param": "t", "level": level, "step": 6}
+        index = sharded.shard(metadata)
+        assert index == sharded.shard({**metadata, "step": 12})
+        assert index == other.shard(metadata)
+
+
+def test_routing_spreads_fields(sharded):
+    counts = np.bincount([sharded.shard({"param": "t", "level": level}) for level in range(1, 138)], minlength=4)
+    assert counts.min() > 137 / 4 / 2
+
+
+def test_write_field_routed(sharded):
+    for level in range(1, 21):
+        sharded.write_field({"param": "t", "level": level}, np.zeros(10))
+
+    metrics = sharded.metrics()
+    calls = [metrics[index]["methods"].get("write_field", {}).get("calls", 0) for index in range(4)]
+    assert calls == sharded.fields
+    assert sum(calls) == 20
+
+
+def test_broadcast(sharded):
+    sharded.flush({"step": 6})
+    sharded.notify({"step": 6})
+    for metrics in sharded.metrics().values():
+        assert metrics["methods"]["flush"]["calls"] == 1
+        assert metrics["methods"]["notify"]["calls"] == 1
+
+
+def test_metadata_of_another_handle(sharded):
+    metadata = multio.Metadata(sharded.handles[0], md={"param": "t", "level": 1})
+    assert sharded._for(sharded.handles[0], metadata) is metadata
+    assert sharded._for(sharded.handles[1], metadata) == {"param": "t", "level": 1}
+
+
+def test_from_collection():
+    collection = Collection(
+        **{
+            "group-a": {"transport": "mpi", "group": "a", "plans": []},
+            "group-b": {"transport": "mpi", "group": "b", "plans": []},
+        }
+    )
+    assert all(isinstance(config, Server) for config in collection.configs.values())
+    with ShardedMultio.from_collection(collection, keys=("param",)) as sharded:
+        assert sharded.names == ["group-a", "group-b"]
+        assert len(sharded) == 2
+
+
+def test_requires_shards():
+    with pytest.raises(ValueError):
+        ShardedMultio([])
+
+
+def test_stateful_arguments_per_shard():
+    with pytest.raises(ValueError, match="reorder"):
+        ShardedMultio([NO_PLANS] * 2, reorder=multio.ReorderBuffer())
+
+    sharded = ShardedMultio({"a": NO_PLANS, "b": NO_PLANS}, per_shard=lambda name: {"reorder": multio.ReorderBuffer()})
+    first, second = (handle._reorder for handle in sharded.handles)
+    assert isinstance(first, multio.ReorderBuffer)
+    assert first is not second
@@ -0,0 +1,103 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import numpy as np
+import pytest
+
+from multio.plans import Client, Plan, Simulator, simulate
+from multio.plans.simulate import StatisticsWindow
+
+
+def file_plan(path, *actions):
+    return Plan(
+        name="simulated",
+        actions=[*actions, {"type": "sink", "sinks": [{"type": "file", "path": str(path), "append": False}]}],
+    )
+
+
+def test_statistics_window():
+    window = StatisticsWindow(["average", "minimum", "maximum", "accumulate", "instant"], output_seconds=3)
+    assert window.add(1, np.array([1.0, 4.0])) == []
+    assert window.add(2, np.array([2.0, 6.0])) == []
+
+    [(end, results)] = window.add(3, np.array([3.0, 2.0]))
+    assert end == 3
+    np.testing.assert_array_equal(results["average"], [2.0, 4.0])
+    np.testing.assert_array_equal(results["minimum"], [1.0, 2.0])
+    np.testing.assert_array_equal(results["maximum"], [3.0, 6.0])
+    np.testing.assert_array_equal(results["accumulate"], [6.0, 12.0])
+    np.testing.assert_array_equal(results["instant"], [3.0, 2.0])
+    assert window.count == 0
+
+
+def test_statistics_window_skipped_boundary():
+    window = StatisticsWindow(["maximum"], output_seconds=2)
+    window.add(1, np.array([1.0]))
+    [(end, results)] = window.add(3, np.array([5.0]))
+    assert end == 2
+    np.testing.assert_array_equal(results["maximum"], [1.0])
+
+
+def test_simulate_select_statistics_file(tmp_path):
+    output = tmp_path / "daily.bin"
+    plan = file_plan(
+        output,
+        {"type": "select", "match": [{"param": "2t"}]},
+        {"type": "statistics", "operations": ["average"], "output_frequency": "2h"},
+    )
+    fields = [
+        ({"param": param, "step": step}, np.full(4, float(step))) for step in range(1, 5) for param in ("2t", "msl")
+    ]
+
+    report = simulate(plan, fields)
+
+    np.testing.assert_array_equal(np.fromfile(output), [1.5] * 4 + [3.5] * 4)
+    select, statistics, sink = report.actions
+    assert (select.fields_in, select.fields_out) == (8, 4)
+    assert (statistics.fields_in, statistics.fields_out) == (4, 2)
+    assert statistics.peak_bytes == 4 * 8
+    assert sink.fields_in == 2
+
+
+def test_statistics_bytes_held(tmp_path):
+    plan = file_plan(
+        tmp_path / "out.bin", {"type": "statistics", "operations": ["average", "maximum"], "output_frequency": "2h"}
+    )
+    with Simulator(plan) as simulator:
+        (executor, _), _ = simulator._plans[0]
+        for step in (1, 2):
+            for level in range(50):
+                simulator.write_field({"param": "t", "level": level, "step": step}, np.zeros(10))
+                assert executor.nbytes == sum(window.nbytes for window in executor.windows.values())
+        assert executor.nbytes == 50 * 2 * 10 * 8
+
+
+def test_simulate_mask(tmp_path):
+    output = tmp_path / "masked.bin"
+    plan = file_plan(output, {"type": "mask", "missing_value": -1.0})
+    with Simulator(plan) as simulator:
+        simulator.write_mask({"domain": "ocean"}, [1, 0, 1])
+        simulator.write_field({"domain": "ocean"}, np.array([1.0, 2.0, 3.0]))
+        simulator.write_field({"domain": "ocean", "compacted": "mask", "compactedSize": 2}, np.array([4.0, 5.0]))
+    np.testing.assert_array_equal(np.fromfile(output), [1.0, -1.0, 3.0, 4.0, -1.0, 5.0])
+
+
+def test_simulate_aggregation(tmp_path):
+    output = tmp_path / "global.bin"
+    with Simulator(Client(plans=[file_plan(output, {"type": "aggregation"})])) as simulator:
+        simulator.write_domain({"domain": "grid", "partition": 0}, [0, 2])
+        simulator.write_domain({"domain": "grid", "partition": 1}, [1, 3])
+        simulator.write_field({"domain": "grid", "partition": 0}, np.array([0.0, 2.0]))
+        assert simulator.report.actions[0].peak_bytes == 16
+        simulator.write_field({"domain": "grid", "partition": 1}, np.array([1.0, 3.0]))
+        assert simulator._plans[0][0][0].nbytes == 0
+    np.testing.assert_array_equal(np.fromfile(output), [0.0, 1.0, 2.0, 3.0])
+
+
+def test_simulate_unsupported_action():
+    with pytest.raises(ValueError, match="'interpolate' actions is not supported"):
+        Simulator(Plan(name="interpolate", actions=[{"type": "interpolate"}]))
@@ -0,0 +1,221 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import os
+import threading
+
+import numpy as np
+import pytest
+
+import multio
+from multio import Spool
+
+
+def recording_spool(tmp_path, **kwargs):
+    calls = []
+    spool = Spool(tmp_path, **kwargs)
+    spool.attach(lambda kind, metadata, data: calls.append((kind, metadata, None if data is None else data.copy())))
+    return spool, calls
+
+
+def test_direct_until_slow(tmp_path):
+    spool, calls = recording_spool(tmp_path, latency=0.5)
+    assert spool.submit("write_field", {"step": 0}, np.zeros(4)) is None
+
+    spool.observe(0.1)
+    assert spool.submit("write_field", {"step": 0}, np.zeros(4)) is None
+
+    spool.observe(1.0)
+    assert spool.submit("write_field", {"step": 1}, np.zeros(4)) == 32
+    spool.wait()
+    assert calls == [("write_field", {"step": 1}, pytest.approx(np.zeros(4)))]
+
+    # Drained, so calls go direct again
+    assert not spool.active
+    assert spool.submit("flush", {"step": 1}) is None
+    spool.close()
+
+
+def test_order_preserved(tmp_path):
+    release = threading.Event()
+    calls = []
+
+    def replay(kind, metadata, data):
+        release.wait()
+        calls.append((kind, metadata, None if data is None else data.copy()))
+
+    spool = Spool(tmp_path, latency=0.0, segment_bytes=256)
+    spool.attach(replay)
+    spool.observe(1.0)
+
+    expected = []
+    for step in range(5):
+        for param in ("2t", "msl"):
+            values = np.arange(10, dtype=np.float32) + step
+            spool.submit("write_field", {"step": step, "param": param}, values)
+            expected.append(("write_field", {"step": step, "param": param}))
+        spool.submit("flush", {"step": step})
+        spool.submit("notify", {"step": step, "trigger": "step"})
+        expected += [("flush", {"step": step}), ("notify", {"step": step, "trigger": "step"})]
+    release.set()
+    spool.close()
+
+    assert [(kind, metadata) for kind, metadata, _ in calls] == expected
+    np.testing.assert_array_equal(calls[-3][2], np.arange(10, dtype=np.float32) + 4)
+    assert calls[-3][2].dtype == np.float32
+    assert spool.statistics.replayed == spool.statistics.spooled == len(expected)
+    assert spool.statistics.segments > 1
+    assert os.listdir(tmp_path) == []
+
+
+def test_large_record_gets_own_segment(tmp_path):
+    spool, calls = recording_spool(tmp_path, latency=0.0, segment_bytes=64)
+    spool.observe(1.0)
+    spool.submit("write_field", {"param": "2t"}, np.ones(1000))
+    spool.close()
+    np.testing.assert_array_equal(calls[0][2], np.ones(1000))
+
+
+def test_backlog_limit_blocks(tmp_path):
+    release = threading.Event()
+    spool = Spool(tmp_path, latency=0.0, max_bytes=1024)
+    spool.attach(lambda kind, metadata, data: release.wait())
+    spool.observe(1.0)
+
+    spool.submit("write_field", {"step": 0}, np.zeros(64))
+    blocked = threading.Thread(target=spool.submit, args=("write_field", {"step": 1}, np.zeros(64)))
+    blocked.start()
+    blocked.join(0.2)
+    assert blocked.is_alive()
+
+    release.set()
+    blocked.join()
+    spool.close()
+    assert spool.statistics.replayed == 2
+    assert spool.statistics.peak_backlog_bytes <= 1024
+
+
+def test_replay_error_raised(tmp_path):
+    def replay(kind, metadata, data):
+        raise ValueError("server gone")
+
+    spool = Spool(tmp_path, latency=0.0)
+    spool.attach(replay)
+    spool.observe(1.0)
+    spool.submit("flush", {"step": 0})
+    with pytest.raises(RuntimeError):
+        spool.wait()
+    spool.close()
+
+
+def test_close_after_replay_error():
+    def replay(kind, metadata, data):
+        raise ValueError("server gone")
+
+    spool = Spool(latency=0.0)
+    spool.attach(replay)
+    spool.observe(1.0)
+    spool.submit("flush", {"step": 0})
+    thread, directory = spool._thread, spool._temporary
+    with pytest.raises(RuntimeError, match="Replaying spooled calls failed"):
+        spool.close()
+    assert not thread.is_alive()
+    assert not os.path.exists(directory)
+
+
+def test_multio_closed_after_replay_error(tmp_path):
+    class Observer:
+        closed = False
+
+        def record(self, method, metadata, seconds, sent=()):
+            pass
+
+        def close(self):
+            self.closed = True
+
+    def replay(kind, metadata, data):
+        raise ValueError("server gone")
+
+    observer = Observer()
+    spool = Spool(tmp_path, latency=0.0)
+    with multio.MultioPlan({"plans": []}):
+        mio = multio.Multio(spool=spool, observers=[observer])
+    spool.attach(replay)
+    with pytest.raises(RuntimeError, match="Replaying spooled calls failed"):
+        with mio:
+            spool.observe(1.0)
+            mio.flush({"step": 0})
+    assert observer.closed
+    assert spool._thread is None
+
+
+def test_temporary_directory_removed():
+    spool = Spool(latency=0.0)
+    spool.attach(lambda kind, metadata, data: None)
+    spool.observe(1.0)
+    spool.submit("notify", {"step": 0})
+    directory = spool._temporary
+    assert os.path.isdir(directory)
+    spool.close()
+    assert not os.path.exists(directory)
+
+
+def test_multio_spool(tmp_path):
+    release = threading.Event()
+    replayed = []
+
+    spool = Spool(tmp_path, latency=10.0)
+    with multio.MultioPlan({"plans": []}):
+        with multio.Multio(spool=spool) as mio:
+
+            def replay(kind, metadata, data):
+                release.wait()
+                replayed.append((kind, metadata.get("step")))
+                mio._replay(kind, metadata, data)
+
+            spool.attach(replay)
+            spool.observe(60.0)
+            for step in range(3):
+                mio.write_field({"step": step, "param": "2t"}, np.zeros(10))
+                mio.flush({"step": step})
+            release.set()
+
+    assert replayed == [
+        ("write_field", 0),
+        ("flush", 0),
+        ("write_field", 1),
+        ("flush", 1),
+        ("write_field", 2),
+        ("flush", 2),
+    ]
+    assert spool.statistics.replayed == 6
+    assert mio.metrics()["methods"]["write_field"]["copies"] == 3
+
+
+def test_multio_spool_grib(tmp_path):
+    release = threading.Event()
+    replayed = []
+
+    spool = Spool(tmp_path, latency=10.0)
+    with multio.MultioPlan({"plans": []}):
+        with multio.Multio(spool=spool) as mio:
+
+            def replay(kind, metadata, data):
+                release.wait()
+                replayed.append((kind, None if data is None else bytes(data)))
+                mio._replay(kind, metadata, data)
+
+            spool.attach(replay)
+            spool.observe(60.0)
+            mio.write_grib(b"GRIB0")
+            mio.write_grib(memoryview(bytearray(b"GRIB1")))
+            mio.flush({"step": 0})
+            release.set()
+            mio.field_accepted({"param": "2t"})
+            assert spool.statistics.replayed == 3
+
+    assert replayed == [("write_grib", b"GRIB0"), ("write_grib", b"GRIB1"), ("flush", None)]
@@ -0,0 +1,122 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import socket
+import threading
+
+import numpy as np
+import pytest
+
+from multio.plans.actions import Sink
+from multio.plans.sinks import Socket
+from multio.stream import StreamReceiver, StreamSender
+
+
+def send(port, fields, **kwargs):
+    with StreamSender.from_sink(Socket(port=port, **kwargs)) as sender:
+        for metadata, data in fields:
+            sender.send(metadata, data)
+
+
+def in_thread(target, *args, **kwargs):
+    thread = threading.Thread(target=target, args=args, kwargs=kwargs)
+    thread.start()
+    return thread
+
+
+def test_socket_sink_config():
+    sink = Sink(sinks=[{"type": "socket", "host": "node1", "port": 4000, "batch_size": 8}])
+    assert isinstance(sink.sinks[0], Socket)
+    dumped = sink.sinks[0].model_dump(by_alias=True)
+    assert dumped["batch-size"] == 8
+    assert dumped["port"] == 4000
+
+
+@pytest.mark.parametrize("batch_size", (1, 3))
+def test_loopback(batch_size):
+    fields = [({"param": "2t", "step": step}, np.arange(1000, dtype=np.float64) * step) for step in range(5)]
+    fields.append(({"param": "tp"}, np.ones(7, dtype=np.float32)))
+    fields.append(({"format": "grib"}, b"GRIB" + bytes(60) + b"7777"))
+
+    with StreamReceiver(reuse=False) as receiver:
+        thread = in_thread(send, receiver.address[1], fields, batch_size=batch_size)
+        received = list(receiver)
+        thread.join()
+
+    assert [metadata for metadata, _ in received] == [metadata for metadata, _ in fields]
+    for (_, expected), (_, data) in zip(fields[:-1], received[:-1]):
+        assert data.dtype == expected.dtype
+        np.testing.assert_array_equal(data, expected)
+    assert received[-1][1].tobytes() == fields[-1][1]
+
+
+def test_buffer_reused():
+    fields = [({"step": step}, np.full(100, step, dtype=np.float64)) for step in range(3)]
+    with StreamReceiver() as receiver:
+        thread = in_thread(send, receiver.address[1], fields)
+        arrays = []
+        for metadata, data in receiver:
+            assert np.all(data == metadata["step"])
+            arrays.append(data)
+        thread.join()
+    assert arrays[0].base is arrays[1].base
+
+
+def test_several_connections():
+    with StreamReceiver(connections=3, receive_buffer_bytes=1 << 16) as receiver:
+        threads = [
+            in_thread(send, receiver.address[1], [({"rank": rank, "i": i}, np.full(5000, rank)) for i in range(20)])
+            for rank in range(3)
+        ]
+        received = [(metadata["rank"], metadata["i"], data[0]) for metadata, data in receiver]
+        for thread in threads:
+            thread.join()
+
+    assert len(received) == 60
+    for rank in range(3):
+        assert [i for r, i, _ in received if r == rank] == list(range(20))
+    assert all(value == rank for rank, _, value in received)
+
+
+def test_truncated_frame():
+    with StreamReceiver() as receiver:
+        with socket.create_connection(receiver.address) as connection:
+            connection.sendall(b"MIOS" + bytes(4))
+        with pytest.raises(ConnectionError, match="ended within a frame"):
+            list(receiver)
+
+
+def test_invalid_frame():
+    with StreamReceiver() as receiver:
+        with socket.create_connection(receiver.address) as connection:
+            connection.sendall(bytes(24))
+        with pytest.raises(ConnectionError, match="Invalid frame"):
+            list(receiver)
+
+
+def test_connect_retried(monkeypatch):
+    attempts = []
+    create_connection = socket.create_connection
+
+    def flaky(*args, **kwargs):
+        attempts.append(args)
+        if len(attempts) < 3:
+            raise ConnectionRefusedError
+        return create_connection(*args, **kwargs)
+
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+    with StreamReceiver() as receiver:
+        monkeypatch.setattr(socket, "create_connection", flaky)
+        with pytest.raises(ConnectionRefusedError):
+            StreamSender.from_sink(Socket(port=receiver.address[1], retries=1))
+
+        attempts.clear()
+        thread = in_thread(send, receiver.address[1], [({"step": 0}, np.zeros(4))], retries=2)
+        received = [metadata for metadata, _ in receiver]
+        thread.join()
+    assert received == [{"step": 0}]
+    assert len(attempts) == 3
@@ -0,0 +1,77 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import sys
+
+import pytest
+
+from multio import ServerSupervisor
+
+SERVER = {"transport": "thread", "plans": []}
+
+# Stands in for a server: reports ready, checks its environment, then runs until stopped
+FAKE_SERVER = """
+import json, os, sys, time
+assert json.loads(os.environ["MULTIO_PLANS"])["transport"] == "thread"
+open(sys.argv[-1], "w").close()
+while True:
+    time.sleep(0.05)
+"""
+
+FAILING_SERVER = "import sys; sys.exit(3)"
+
+
+def test_start_ready_stop():
+    supervisor = ServerSupervisor(SERVER, count=3, command=[sys.executable, "-c", FAKE_SERVER])
+    with supervisor:
+        assert supervisor.alive()
+        statuses = supervisor.status()
+        assert [status.index for status in statuses] == [0, 1, 2]
+        assert all(status.alive for status in statuses)
+
+        processes = list(supervisor.processes)
+    assert not supervisor.processes
+    assert all(process.returncode is not None for process in processes)
+
+
+def test_throughput_sampled():
+    with ServerSupervisor(SERVER, command=[sys.executable, "-c", FAKE_SERVER]) as supervisor:
+        first = supervisor.status()[0]
+        second = supervisor.status()[0]
+    if first.read_bytes is None:
+        pytest.skip("/proc/<pid>/io not available")
+    assert first.read_rate is None
+    assert second.read_rate is not None
+
+
+def test_server_exiting_before_ready():
+    supervisor = ServerSupervisor(SERVER, count=2, command=[sys.executable, "-c", FAILING_SERVER])
+    with pytest.raises(RuntimeError, match="exited with 3"):
+        with supervisor:
+            pass
+    assert not supervisor.processes
+
+
+def test_ready_timeout_stops_servers():
+    supervisor = ServerSupervisor(
+        SERVER, command=[sys.executable, "-c", "import time; time.sleep(60)"], ready_timeout=0.2
+    )
+    with pytest.raises(TimeoutError):
+        with supervisor:
+            pass
+    assert not supervisor.processes
+
+
+def test_ready_timeout():
+    supervisor = ServerSupervisor(SERVER, command=[sys.executable, "-c", "import time; time.sleep(60)"])
+    supervisor.start()
+    try:
+        with pytest.raises(TimeoutError):
+            supervisor.wait_ready(timeout=0.2)
+    finally:
+        supervisor.stop()
+    assert not supervisor.alive()
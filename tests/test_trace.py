@@ -0,0 +1,90 @@
+# (C) Copyright 2024 European Centre for Medium-Range Weather Forecasts.
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import multio
+from multio import Tracer
+
+
+class _Lib:
+    tracer = None
+
+
+def test_native_time_separated():
+    tracer = Tracer(native=False)
+
+    start = time.perf_counter()
+    tracer.native("multio_write_field_double", start + 0.001, start + 0.003)
+    time.sleep(0.005)
+    tracer.record("write_field", None, time.perf_counter() - start, [(800, True)])
+
+    native, span = tracer.events
+    assert native["cat"] == "native"
+    assert span["name"] == "write_field"
+    assert span["tid"] == threading.get_ident()
+    assert span["args"]["native_us"] == pytest.approx(2000)
+    assert span["args"]["python_us"] == pytest.approx(span["dur"] - 2000)
+    assert span["args"]["bytes"] == 800
+
+
+def test_native_calls_before_span_ignored():
+    tracer = Tracer(native=False)
+    now = time.perf_counter()
+    tracer.native("multio_new_metadata", now - 1.0, now - 0.9)
+    tracer.record("flush", None, 0.01)
+    assert tracer.events[-1]["args"]["native_us"] == 0
+
+
+def test_bounded_buffer():
+    tracer = Tracer(max_events=3, native=False)
+    for _ in range(5):
+        tracer.record("notify", None, 0.001)
+    assert len(tracer.events) == 3
+    assert tracer.dropped == 2
+    assert tracer.to_dict()["otherData"]["dropped"] == 2
+
+
+def test_install():
+    lib = _Lib()
+    tracer = Tracer(native=False)
+    tracer.install(lib)
+    assert lib.tracer is tracer
+    tracer.uninstall(lib)
+    assert lib.tracer is None
+
+
+def test_close_uninstalls(tmp_path, monkeypatch):
+    unregistered = []
+    monkeypatch.setattr("atexit.unregister", unregistered.append)
+    lib = _Lib()
+    tracer = Tracer(tmp_path / "trace.json", native=False)
+    tracer.install(lib)
+    tracer.close()
+    assert lib.tracer is None
+    assert unregistered == [tracer.write]
+    assert (tmp_path / "trace.json").exists()
+
+
+def test_multio_trace(tmp_path):
+    path = tmp_path / "trace.json"
+    tracer = Tracer(path, native=False)
+    with multio.MultioPlan({"plans": []}):
+        with multio.Multio(observers=[tracer]) as mio:
+            mio.write_field({"step": 1}, np.zeros(10))
+            mio.flush({"step": 1})
+            mio.notify({"step": 1})
+
+    trace = json.loads(path.read_text())
+    spans = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    assert [span["name"] for span in spans] == ["write_field", "flush", "notify"]
+    assert any(event["ph"] == "M" and event["name"] == "thread_name" for event in trace["traceEvents"])